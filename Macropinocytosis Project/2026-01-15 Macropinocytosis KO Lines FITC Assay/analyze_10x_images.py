@@ -1,24 +1,48 @@
 import os
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
-import matplotlib.image as mpimg
-from scipy.stats import ttest_ind
+
+# uptake_engine lives in the "Macropinocytosis Project" folder
+PROJECT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_FOLDER)
+from uptake_engine.results import condition_results
+from uptake_engine.intensity import intensity_distribution
+from uptake_engine.qc import image_qc, apply_qc
+from uptake_engine.discovery import discover, manifest_groups, check_groups
+from uptake_engine.plots import create_beautiful_plot
 
 ## ================= CONFIGURATION ================= ##
 green_threshold = 50
 black_threshold = 50
+metric = "ratio"  # Any key of METRIC_LABELS; switching reuses the stored per-image results
+exclude_failed_qc = True  # Drop blurry, saturated or empty fields before statistics (False = only flag them)
 
-# EXPERIMENT 1: KO Lines (with color scheme)
-groups_exp1 = [
-    ("SafeGuide", "SafeGuide 10x", "#808080"),      # Grey
-    ("PELP1", "PELP1 10x", "#44b875"),                # Green
-    ("AMBRA1", "AMBRA1 10x", "#c0392b"),              # Dark Red
-    ("SNAP23", "SNAP23 10x", "#c0392b"),               # Dark Red
-]
+METRIC_LABELS = {
+    "ratio": "Green Area / Total Cell Area",
+    "mean_intensity": "Mean FITC Intensity in Cells",
+    "integrated_intensity": "Integrated FITC Intensity in Cells",
+    "signal_integrated_intensity": "Integrated FITC Intensity above Threshold",
+    "intensity_p50": "Median FITC Intensity in Cells",
+    "intensity_p90": "90th Percentile FITC Intensity in Cells",
+    "intensity_p99": "99th Percentile FITC Intensity in Cells",
+}
 
-BASE_FOLDER_EXP1 = "Macropinocytosis Project/2026-01-15 Macropinocytosis KO Lines FITC Assay/10x"
+# EXPERIMENT 1: KO Lines (with color scheme)
+# Groups are built from the discovery manifest (uptake_engine.discovery): every
+# condition folder with images in the experiment's 10x folder, in the order
+# below (SafeGuide first, as the control); new conditions are appended.
+EXPERIMENT_1 = "2026-01-15 Macropinocytosis KO Lines FITC Assay"
+MAGNIFICATION = "10x"
+COLORS_EXP1 = {
+    "SafeGuide": "#808080",   # Grey
+    "PELP1": "#44b875",       # Green
+    "AMBRA1": "#c0392b",      # Dark Red
+    "SNAP23": "#c0392b",      # Dark Red
+}
 
 # EXPERIMENT 2: Dose Response (add your folder configuration)
+# Hand-written groups; they are checked against the manifest before analysis
 groups_exp2 = [
     ("WT/FITC only", "WT_FITC_only", "#808080"),     # Grey
     ("500 µM", "500uM", "#90ee90"),                  # Light Green
@@ -28,146 +52,23 @@ groups_exp2 = [
 BASE_FOLDER_EXP2 = "Macropinocytosis Project/Dose_Response/10x"  # Update this path
 
 ## ================= FUNCTIONS ================= ##
-def compute_green_area(img, green_threshold):
-    return np.sum(img[:, :, 1] > green_threshold)
-
-def compute_total_cell_area(img, black_threshold):
-    black_pixels = np.all(img[:, :, :3] < black_threshold, axis=2)
-    total_pixels = img.shape[0] * img.shape[1]
-    return total_pixels - np.sum(black_pixels)
-
 def analyze_condition(folder_path):
-    ratios = []
-    green_areas = []
-    cell_areas = []
-    
-    if not os.path.exists(folder_path):
-        print(f"⚠️  Missing folder: {folder_path}")
-        return ratios, green_areas, cell_areas
-    
-    for filename in os.listdir(folder_path):
-        if filename.lower().endswith(".tif"):
-            img = mpimg.imread(os.path.join(folder_path, filename))
-            green_area = compute_green_area(img, green_threshold)
-            total_cell_area = compute_total_cell_area(img, black_threshold)
-            ratio = green_area / total_cell_area if total_cell_area != 0 else 0
-            
-            ratios.append(ratio)
-            green_areas.append(green_area)
-            cell_areas.append(total_cell_area)
-    
-    return ratios, green_areas, cell_areas
-
-def create_beautiful_plot(labels, means, sems, all_scores, colors, title, control_idx=0):
     """
-    Creates a beautiful bar plot with error bars, significance markers, and a data table.
-    
-    Parameters:
-    - labels: list of group names
-    - means: list of mean values
-    - sems: list of SEM values
-    - all_scores: list of lists containing individual measurements
-    - colors: list of colors for each bar
-    - title: plot title
-    - control_idx: index of control group for statistical comparison
+    Per-image scores (the configured metric), green areas and cell areas.
+    Results are kept in the uptake_engine result store, so unchanged images
+    are not re-read.
     """
-    fig = plt.figure(figsize=(12, 8))
-    
-    # Create gridspec for plot and table
-    gs = fig.add_gridspec(3, 1, height_ratios=[3, 0.1, 1], hspace=0.3)
-    ax_plot = fig.add_subplot(gs[0])
-    ax_table = fig.add_subplot(gs[2])
-    
-    # -------- BAR PLOT --------
-    x_pos = np.arange(len(labels))
-    bars = ax_plot.bar(x_pos, means, yerr=sems, capsize=8, 
-                       color=colors, edgecolor='black', linewidth=1.5,
-                       error_kw={'linewidth': 2, 'ecolor': 'black'})
-    
-    ax_plot.set_ylabel("Green Area / Total Cell Area", fontsize=16, weight='bold')
-    ax_plot.set_title(title, fontsize=16, weight='bold', pad=20)
-    ax_plot.set_xticks(x_pos)
-    ax_plot.set_xticklabels(labels, fontsize=14, weight='bold')
-    ax_plot.spines['top'].set_visible(False)
-    ax_plot.spines['right'].set_visible(False)
-    ax_plot.grid(axis='y', alpha=0.3, linestyle='--')
-    
-    # -------- SIGNIFICANCE TESTING --------
-    control_scores = all_scores[control_idx]
-    y_max = max(m + s for m, s in zip(means, sems)) * 1.15
-    
-    for i in range(len(labels)):
-        if i == control_idx:
-            continue
-        if not all_scores[i] or not control_scores:
-            continue
-        
-        _, p = ttest_ind(all_scores[i], control_scores, equal_var=False)
-        
-        if p < 0.001:
-            sig = "***"
-        elif p < 0.01:
-            sig = "**"
-        elif p < 0.05:
-            sig = "*"
-        else:
-            sig = "ns"
-        
-        if sig != "ns":
-            ax_plot.text(i, means[i] + sems[i] + 0.03 * y_max,
-                        sig, ha="center", fontsize=16, weight='bold')
-    
-    # -------- DATA TABLE --------
-    ax_table.axis('off')
-    
-    # Prepare table data
-    table_data = []
-    table_data.append(['Group', 'n', 'Mean ± SEM', 'p-value vs Control'])
-    
-    for i, label in enumerate(labels):
-        n = len(all_scores[i]) if all_scores[i] else 0
-        mean_sem = f"{means[i]:.4f} ± {sems[i]:.4f}" if n > 0 else "N/A"
-        
-        if i == control_idx:
-            p_val = "—"
-        elif all_scores[i] and control_scores:
-            _, p = ttest_ind(all_scores[i], control_scores, equal_var=False)
-            if p < 0.001:
-                p_val = "< 0.001"
-            else:
-                p_val = f"{p:.3f}"
-        else:
-            p_val = "N/A"
-        
-        table_data.append([label, str(n), mean_sem, p_val])
-    
-    # Create table
-    table = ax_table.table(cellText=table_data, cellLoc='center', loc='center',
-                          colWidths=[0.25, 0.15, 0.35, 0.25])
-    table.auto_set_font_size(False)
-    table.set_fontsize(10)
-    table.scale(1, 2)
-    
-    # Style header row
-    for i in range(4):
-        cell = table[(0, i)]
-        cell.set_facecolor('#34495e')
-        cell.set_text_props(weight='bold', color='white')
-    
-    # Alternate row colors and bold group names
-    for i in range(1, len(table_data)):
-        for j in range(4):
-            cell = table[(i, j)]
-            if i % 2 == 0:
-                cell.set_facecolor('#ecf0f1')
-            else:
-                cell.set_facecolor('white')
-            # Bold the group names (first column)
-            if j == 0:
-                cell.set_text_props(weight='bold')
-    
-    plt.tight_layout()
-    return fig
+    if not os.path.exists(folder_path):
+        print(f"⚠️  Missing folder: {folder_path}")
+        return [], [], []
+    
+    rows = condition_results(folder_path, "green", green_threshold, black_threshold,
+                             stages=(intensity_distribution, image_qc))
+    rows = apply_qc(rows, exclude_failed_qc, label=os.path.basename(folder_path))
+    scores = [row[metric] for row in rows]
+    green_areas = [row["signal_area"] for row in rows]
+    cell_areas = [row["cell_area"] for row in rows]
+    return scores, green_areas, cell_areas
 
 def print_summary_table(labels, avg_green, avg_cell_area, all_scores):
     """Print a detailed summary table to console"""
@@ -207,15 +108,15 @@ def analyze_experiment(groups, base_folder, experiment_name, control_idx=0):
         colors.append(color)
         folder_path = os.path.join(base_folder, folder)
         
-        ratios, green_areas, cell_areas = analyze_condition(folder_path)
-        all_scores.append(ratios)
+        scores, green_areas, cell_areas = analyze_condition(folder_path)
+        all_scores.append(scores)
         
-        if ratios:
-            means.append(np.mean(ratios))
-            sems.append(np.std(ratios, ddof=1) / np.sqrt(len(ratios)))
+        if scores:
+            means.append(np.mean(scores))
+            sems.append(np.std(scores, ddof=1) / np.sqrt(len(scores)))
             avg_green.append(np.mean(green_areas))
             avg_cell_area.append(np.mean(cell_areas))
-            print(f"✓ {label}: {len(ratios)} images analyzed")
+            print(f"✓ {label}: {len(scores)} images analyzed")
         else:
             means.append(0)
             sems.append(0)
@@ -228,22 +129,27 @@ def analyze_experiment(groups, base_folder, experiment_name, control_idx=0):
     
     # Create beautiful plot
     fig = create_beautiful_plot(labels, means, sems, all_scores, colors, 
-                                experiment_name, control_idx)
+                                experiment_name, control_idx, METRIC_LABELS[metric])
     
     return fig
 
 ## ================= MAIN ================= ##
 if __name__ == "__main__":
+    manifest = discover(PROJECT_FOLDER)
+    
     # Experiment 1: KO Lines
+    base_folder_exp1, groups_exp1 = manifest_groups(manifest, EXPERIMENT_1, MAGNIFICATION,
+                                                    colors=COLORS_EXP1, order=list(COLORS_EXP1))
     fig1 = analyze_experiment(
         groups_exp1, 
-        BASE_FOLDER_EXP1,
+        base_folder_exp1,
         "Macropinocytosis FITC Uptake - KO Lines (10x)",
         control_idx=0  # SafeGuide is control
     )
     
     # Experiment 2: Dose Response
     # Uncomment when you have the correct folder path
+    # check_groups(manifest, BASE_FOLDER_EXP2, groups_exp2)  # Reports groups without images
     # fig2 = analyze_experiment(
     #     groups_exp2, 
     #     BASE_FOLDER_EXP2,
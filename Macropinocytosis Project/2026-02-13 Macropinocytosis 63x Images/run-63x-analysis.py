@@ -1,74 +1,80 @@
 import os
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
-import matplotlib.image as mpimg
 from scipy.stats import ttest_ind
 
+# uptake_engine lives in the "Macropinocytosis Project" folder
+PROJECT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_FOLDER)
+from uptake_engine.dataset import folder_images
+from uptake_engine.results import condition_results
+from uptake_engine.colocalization import colocalization
+from uptake_engine.intensity import intensity_distribution
+from uptake_engine.qc import image_qc, apply_qc
+from uptake_engine.discovery import discover, manifest_groups
+
 ## ================= CONFIGURATION ================= ##
 yellow_threshold = 50  # Threshold for TMR dye detection
 black_threshold = 50   # Threshold for background detection
+metric = "ratio"       # Any key of METRIC_LABELS; switching reuses the stored per-image results
+exclude_failed_qc = True  # Drop blurry, saturated or empty fields before statistics (False = only flag them)
+
+METRIC_LABELS = {
+    "ratio": "Yellow Area / Total Cell Area (TMR)",
+    "mean_intensity": "Mean TMR Intensity in Cells",
+    "integrated_intensity": "Integrated TMR Intensity in Cells",
+    "signal_integrated_intensity": "Integrated TMR Intensity above Threshold",
+    "intensity_p50": "Median TMR Intensity in Cells",
+    "intensity_p90": "90th Percentile TMR Intensity in Cells",
+    "intensity_p99": "99th Percentile TMR Intensity in Cells",
+}
 
 # EXPERIMENT: 63x Images (2026-02-13)
-# Updated for the three cell lines in your project
+# Groups are built from the discovery manifest (uptake_engine.discovery): every
+# condition folder with images in the experiment, in the order below; cell
+# lines without images yet are left out, new ones are appended.
 # Order: SF188 WT (control), Pancreatic 8988T, Lung H1299
-groups_63x = [
-    ("SF188 WT", "SF188 WT", "#808080"),              # Grey (Control)
-    ("Pancreatic 8988T", "Pancreatic 8988T", "#e67e22"),  # Orange
-    ("Lung H1299", "Lung H1299", "#e67e22"),          # Dark Orange
-]
+EXPERIMENT_63X = "2026-02-13 Macropinocytosis 63x Images"
+MAGNIFICATION = "63x"
+COLORS_63X = {
+    "SF188 WT": "#808080",          # Grey (Control)
+    "Pancreatic 8988T": "#e67e22",  # Orange
+    "Lung H1299": "#e67e22",        # Dark Orange
+}
+CONTROL_63X = "SF188 WT"
 
-BASE_FOLDER_63X = "Macropinocytosis Project/2026-02-13 Macropinocytosis 63x Images"
+COLOC_METRICS = ["pearson", "manders_m1", "manders_m2", "overlap_coefficient"]
 
 ## ================= FUNCTIONS ================= ##
-def compute_yellow_area(img, yellow_threshold):
-    """Calculate the total area of yellow pixels above threshold (TMR dye)"""
-    # Yellow is combination of Red + Green channels
-    # We'll sum both R and G channels and check if above threshold
-    yellow_intensity = (img[:, :, 0].astype(float) + img[:, :, 1].astype(float)) / 2
-    return np.sum(yellow_intensity > yellow_threshold)
-
-def compute_total_cell_area(img, black_threshold):
-    """Calculate total cell area by excluding black background pixels"""
-    black_pixels = np.all(img[:, :, :3] < black_threshold, axis=2)
-    total_pixels = img.shape[0] * img.shape[1]
-    return total_pixels - np.sum(black_pixels)
-
 def analyze_condition(folder_path):
     """
-    Analyze all TIFF images in a folder and compute yellow/cell area ratios.
+    Analyze all TIFF images in a folder and compute the configured metric
+    (yellow/cell area ratio by default) and red/green colocalization. Per-image results are kept in the
+    uptake_engine result store, so unchanged images are not re-read.
     
     Returns:
-        ratios: list of yellow_area/total_cell_area for each image
+        scores: list of the configured metric for each image
         yellow_areas: list of yellow pixel counts
         cell_areas: list of total cell pixel counts
+        coloc: list of dicts (pearson, manders_m1, manders_m2, overlap_coefficient)
     """
-    ratios = []
-    yellow_areas = []
-    cell_areas = []
-    
     if not os.path.exists(folder_path):
         print(f"⚠️  Missing folder: {folder_path}")
-        return ratios, yellow_areas, cell_areas
-    
-    # Look for both .tif and .tiff extensions
-    image_files = [f for f in os.listdir(folder_path) 
-                   if f.lower().endswith(('.tif', '.tiff'))]
+        return [], [], [], []
     
-    if not image_files:
+    if not folder_images(folder_path):
         print(f"⚠️  No TIFF images found in: {folder_path}")
-        return ratios, yellow_areas, cell_areas
-    
-    for filename in image_files:
-        img = mpimg.imread(os.path.join(folder_path, filename))
-        yellow_area = compute_yellow_area(img, yellow_threshold)
-        total_cell_area = compute_total_cell_area(img, black_threshold)
-        ratio = yellow_area / total_cell_area if total_cell_area != 0 else 0
-        
-        ratios.append(ratio)
-        yellow_areas.append(yellow_area)
-        cell_areas.append(total_cell_area)
-    
-    return ratios, yellow_areas, cell_areas
+        return [], [], [], []
+    
+    rows = condition_results(folder_path, "yellow", yellow_threshold, black_threshold,
+                             stages=(colocalization, intensity_distribution, image_qc))
+    rows = apply_qc(rows, exclude_failed_qc, label=os.path.basename(folder_path))
+    scores = [row[metric] for row in rows]
+    yellow_areas = [row["signal_area"] for row in rows]
+    cell_areas = [row["cell_area"] for row in rows]
+    coloc = [{key: row[key] for key in COLOC_METRICS} for row in rows]
+    return scores, yellow_areas, cell_areas, coloc
 
 def create_beautiful_plot(labels, means, sems, all_scores, colors, title, control_idx=None):
     """
@@ -96,7 +102,7 @@ def create_beautiful_plot(labels, means, sems, all_scores, colors, title, contro
                        color=colors, edgecolor='black', linewidth=1.5,
                        error_kw={'linewidth': 2, 'ecolor': 'black'})
     
-    ax_plot.set_ylabel("Yellow Area / Total Cell Area (TMR)", fontsize=16, weight='bold')
+    ax_plot.set_ylabel(METRIC_LABELS[metric], fontsize=16, weight='bold')
     ax_plot.set_title(title, fontsize=18, weight='bold', pad=20)
     ax_plot.set_xticks(x_pos)
     ax_plot.set_xticklabels(labels, fontsize=14, weight='bold')
@@ -202,19 +208,21 @@ def create_beautiful_plot(labels, means, sems, all_scores, colors, title, contro
     plt.tight_layout()
     return fig
 
-def print_summary_table(labels, avg_yellow, avg_cell_area, all_scores):
+def print_summary_table(labels, avg_yellow, avg_cell_area, all_scores, avg_coloc):
     """Print a detailed summary table to console"""
-    print("\n" + "="*80)
+    print("\n" + "="*113)
     print("DETAILED SUMMARY TABLE")
-    print("="*80)
-    print(f"{'Group':<20}{'n':>5}{'Avg Yellow Area':>18}{'Avg Cell Area':>18}{'Ratio':>12}")
-    print("-" * 80)
+    print("="*113)
+    print(f"{'Group':<20}{'n':>5}{'Avg Yellow Area':>18}{'Avg Cell Area':>18}{'Ratio':>12}"
+          f"{'Pearson':>10}{'M1':>10}{'M2':>10}{'Overlap':>10}")
+    print("-" * 113)
     
     for i, label in enumerate(labels):
         n = len(all_scores[i]) if all_scores[i] else 0
         ratio = avg_yellow[i] / avg_cell_area[i] if avg_cell_area[i] != 0 else 0
-        print(f"{label:<20}{n:>5}{avg_yellow[i]:>18.1f}{avg_cell_area[i]:>18.1f}{ratio:>12.4f}")
-    print("="*80 + "\n")
+        coloc = "".join(f"{avg_coloc[i][key]:>10.3f}" for key in COLOC_METRICS)
+        print(f"{label:<20}{n:>5}{avg_yellow[i]:>18.1f}{avg_cell_area[i]:>18.1f}{ratio:>12.4f}{coloc}")
+    print("="*113 + "\n")
 
 def print_pairwise_comparisons(labels, all_scores):
     """Print all pairwise statistical comparisons"""
@@ -255,7 +263,7 @@ def analyze_experiment(groups, base_folder, experiment_name, control_idx=None):
     print(f"{'='*80}")
     
     means, sems, all_scores = [], [], []
-    avg_yellow, avg_cell_area = [], []
+    avg_yellow, avg_cell_area, avg_coloc = [], [], []
     labels, colors = [], []
     
     for label, folder, color in groups:
@@ -263,24 +271,26 @@ def analyze_experiment(groups, base_folder, experiment_name, control_idx=None):
         colors.append(color)
         folder_path = os.path.join(base_folder, folder)
         
-        ratios, yellow_areas, cell_areas = analyze_condition(folder_path)
-        all_scores.append(ratios)
+        scores, yellow_areas, cell_areas, coloc = analyze_condition(folder_path)
+        all_scores.append(scores)
         
-        if ratios:
-            means.append(np.mean(ratios))
-            sems.append(np.std(ratios, ddof=1) / np.sqrt(len(ratios)))
+        if scores:
+            means.append(np.mean(scores))
+            sems.append(np.std(scores, ddof=1) / np.sqrt(len(scores)))
             avg_yellow.append(np.mean(yellow_areas))
             avg_cell_area.append(np.mean(cell_areas))
-            print(f"✓ {label}: {len(ratios)} images analyzed")
+            avg_coloc.append({key: np.mean([c[key] for c in coloc]) for key in COLOC_METRICS})
+            print(f"✓ {label}: {len(scores)} images analyzed")
         else:
             means.append(0)
             sems.append(0)
             avg_yellow.append(0)
             avg_cell_area.append(0)
+            avg_coloc.append({key: 0 for key in COLOC_METRICS})
             print(f"✗ {label}: No data found")
     
     # Print summary table
-    print_summary_table(labels, avg_yellow, avg_cell_area, all_scores)
+    print_summary_table(labels, avg_yellow, avg_cell_area, all_scores, avg_coloc)
     
     # Print pairwise comparisons
     print_pairwise_comparisons(labels, all_scores)
@@ -298,13 +308,19 @@ if __name__ == "__main__":
     print("2026-02-13 Dataset")
     print("="*80)
     
-    # Analyze 63x Images comparing three cell lines
-    # SF188 WT is the control (index 0)
+    # Analyze 63x Images comparing the cell lines
+    base_folder_63x, groups_63x = manifest_groups(discover(PROJECT_FOLDER), EXPERIMENT_63X, MAGNIFICATION,
+                                                  colors=COLORS_63X, order=list(COLORS_63X))
+    if not groups_63x:
+        print(f"⚠️  No condition folders with images in {EXPERIMENT_63X} ({MAGNIFICATION})")
+        sys.exit(1)
+    labels_63x = [label for label, _, _ in groups_63x]
     fig_63x = analyze_experiment(
         groups_63x, 
-        BASE_FOLDER_63X,
+        base_folder_63x,
         "Macropinocytosis TMR Uptake - 63x Imaging (Cell Line Comparison)",
-        control_idx=0  # SF188 WT is the control
+        # SF188 WT is the control; without its images the first group is compared against
+        control_idx=labels_63x.index(CONTROL_63X) if CONTROL_63X in labels_63x else None
     )
     
     # Save the figure
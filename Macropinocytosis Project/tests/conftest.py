@@ -0,0 +1,49 @@
+"""
+Shared fixtures: the uptake_engine package on the path, small synthetic
+8-bit RGB fields written as TIFFs and minimal Leica metadata XML files.
+"""
+import os
+import sys
+import numpy as np
+import pytest
+from PIL import Image
+
+# uptake_engine lives in the "Macropinocytosis Project" folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def synthetic_field(rng, shape=(64, 80)):
+    """Cells (bright blobs over a dark background) with some green uptake"""
+    h, w = shape
+    img = rng.integers(0, 40, (h, w, 3), dtype=np.uint8)
+    yy, xx = np.mgrid[:h, :w]
+    for _ in range(4):
+        cy, cx, r = rng.integers(8, h - 8), rng.integers(8, w - 8), rng.integers(5, 12)
+        inside = (yy - cy) ** 2 + (xx - cx) ** 2 < r * r
+        img[inside] = rng.integers(40, 256, (np.count_nonzero(inside), 3), dtype=np.uint8)
+    return img
+
+def write_tiff(path, img):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.fromarray(img).save(path)
+    return path
+
+def leica_xml(path, image, luts=("Green",), size=100, length_m=1e-5):
+    channels = "".join(f'<ChannelDescription LUTName="{lut}" Resolution="12"/>' for lut in luts)
+    dimensions = "".join(f'<DimensionDescription DimID="{dim}" NumberOfElements="{size}" '
+                         f'Length="{length_m}" Unit="m"/>' for dim in ("1", "2"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(f'<Data><Image TextDescription="{image}"><ImageDescription><Channels>{channels}'
+                f'</Channels><Dimensions>{dimensions}</Dimensions></ImageDescription></Image></Data>')
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+@pytest.fixture
+def condition(tmp_path, rng):
+    """A condition folder ("10x/A 10x") with four synthetic fields"""
+    folder = tmp_path / "10x" / "A 10x"
+    for i in range(4):
+        write_tiff(str(folder / f"field{i}.tif"), synthetic_field(rng))
+    return str(folder)
@@ -0,0 +1,26 @@
+import os
+import numpy as np
+
+from uptake_engine.archive import build_archives, retire_tiff, verify_archive
+from uptake_engine.engine import load_image
+from uptake_engine.representatives import export_representatives
+from uptake_engine.tiles import archive_path
+
+def test_retired_images_export_and_verify(condition, tmp_path):
+    path = os.path.join(condition, "field0.tif")
+    original = load_image(path)
+    build_archives(condition, workers=1)
+    assert retire_tiff(path) > 0 and not os.path.exists(path)
+    assert verify_archive(path)
+
+    export_representatives({condition: [(0.0, {"filename": "field0.tif", "ratio": 0.5})]},
+                           str(tmp_path / "out"))
+    exported = str(tmp_path / "out" / "A 10x" / "field0.tif")
+    assert np.array_equal(load_image(exported), original)
+
+    with open(archive_path(path), "r+b") as f:
+        f.seek(os.path.getsize(archive_path(path)) // 2)
+        byte = f.read(1)
+        f.seek(-1, os.SEEK_CUR)
+        f.write(bytes([byte[0] ^ 0xFF]))
+    assert not verify_archive(path)
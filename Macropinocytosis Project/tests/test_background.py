@@ -0,0 +1,16 @@
+import numpy as np
+
+from uptake_engine.background import BackgroundSubtraction, subtract_background
+
+def test_name_keys_on_every_parameter():
+    names = {BackgroundSubtraction(25, 4).name, BackgroundSubtraction(25, 8).name,
+             BackgroundSubtraction(50, 4).name, BackgroundSubtraction(25, 4, channels=(1,)).name}
+    assert len(names) == 4
+
+def test_full_range_uint16_does_not_wrap():
+    img = np.full((64, 64, 3), 1000, dtype=np.uint16)
+    img[20:24, 20:24] = 60000
+    corrected = subtract_background(img, radius=8, downsample=2)
+    assert corrected.dtype == np.uint16
+    assert corrected[22, 22, 1] > 55000
+    assert corrected[5, 5, 1] < 50
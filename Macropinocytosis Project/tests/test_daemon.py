@@ -0,0 +1,65 @@
+import os
+import time
+import threading
+import numpy as np
+import pytest
+
+from uptake_engine.daemon import (Engine, threshold_histograms, areas_from_histograms,
+                                  qc_from_histograms, absolute_paths, serve, request)
+from uptake_engine.engine import analyze_image
+from uptake_engine.qc import image_qc
+
+from conftest import synthetic_field, write_tiff
+
+QC_FIELDS = ("focus", "saturated_fraction", "foreground_fraction", "qc_flags", "qc_pass")
+
+@pytest.mark.parametrize("channel", ["green", "yellow"])
+@pytest.mark.parametrize("threshold, black_threshold", [(50, 50), (37.5, 12.3), (0, 0), (255, 255)])
+def test_histogram_areas_and_qc_match_analyze_image(rng, channel, threshold, black_threshold):
+    img = synthetic_field(rng)
+    img[:10, :10, 1] = 255  # Some saturated pixels
+    hists = threshold_histograms(img)
+    expected = analyze_image(img, channel, threshold, black_threshold, stages=(image_qc,))
+    assert areas_from_histograms(hists, channel, threshold, black_threshold) == (
+        expected["signal_area"], expected["cell_area"])
+    qc = qc_from_histograms(hists, black_threshold)
+    assert {key: qc[key] for key in QC_FIELDS} == {key: expected[key] for key in QC_FIELDS}
+
+def test_ratios_drop_failed_qc_like_the_scripts(condition):
+    write_tiff(os.path.join(condition, "empty.tif"), np.zeros((64, 80, 3), np.uint8))
+    engine = Engine(workers=1)
+    try:
+        kept = engine.ratios([condition], exclude_failed_qc=False)[condition]
+        excluded = engine.ratios([condition])[condition]
+        stored = engine.results([condition])[condition]
+    finally:
+        engine.close()
+    assert [row["filename"] for row in kept if not row["qc_pass"]] == ["empty.tif"]
+    assert "empty.tif" not in [row["filename"] for row in excluded]
+    assert [(row["filename"], row["ratio"]) for row in excluded] == [
+        (row["filename"], row["ratio"]) for row in stored]
+
+def test_client_sends_absolute_paths(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    params = absolute_paths({"folders": ["a"], "groups": [["A", "b", "red"]], "output": "plot.png",
+                             "preprocess": [{"step": "flatfield", "objective_folder": "10x"}]})
+    assert params["folders"] == [str(tmp_path / "a")]
+    assert params["groups"] == [["A", str(tmp_path / "b"), "red"]]
+    assert params["output"] == str(tmp_path / "plot.png")
+    assert params["preprocess"] == [{"step": "flatfield", "objective_folder": str(tmp_path / "10x")}]
+
+def test_served_ratios_from_another_directory(condition, tmp_path, monkeypatch):
+    socket_path = str(tmp_path / "daemon.sock")
+    server = threading.Thread(target=serve, args=(socket_path, 1))
+    server.start()
+    try:
+        while not os.path.exists(socket_path):
+            time.sleep(0.01)
+        monkeypatch.chdir(os.path.dirname(condition))
+        reply = request("ratios", socket_path, folders=[os.path.basename(condition)], threshold=40)
+        rows = reply["results"][condition]
+        assert len(rows) == 4
+        assert request("status", socket_path)["histograms"] == 4
+    finally:
+        request("shutdown", socket_path)
+        server.join()
@@ -0,0 +1,25 @@
+import os
+import numpy as np
+
+from uptake_engine.dataset import load_manifest, manifest_path, update_manifest, main
+
+from conftest import write_tiff
+
+def test_verify_never_writes_the_manifest(condition, tmp_path, capsys):
+    base = str(tmp_path)
+    update_manifest(base)
+    baseline = load_manifest(base)
+    mtime = os.stat(manifest_path(base)).st_mtime_ns
+
+    write_tiff(os.path.join(condition, "field0.tif"), np.full((64, 80, 3), 7, np.uint8))
+    os.remove(os.path.join(condition, "field1.tif"))
+    for _ in range(2):
+        assert main([base, "--verify"]) == 1
+        out = capsys.readouterr().out
+        assert "modified: 10x/A 10x/field0.tif" in out and "missing: 10x/A 10x/field1.tif" in out
+    assert load_manifest(base) == baseline
+    assert os.stat(manifest_path(base)).st_mtime_ns == mtime
+
+    report = update_manifest(base)
+    assert report["modified"] == ["10x/A 10x/field0.tif"] and report["missing"] == ["10x/A 10x/field1.tif"]
+    assert main([base, "--verify"]) == 0
@@ -0,0 +1,51 @@
+import os
+
+from uptake_engine import flatfield
+from uptake_engine.flatfield import FlatFieldCorrection, build_flat_field, stored_method
+from uptake_engine.results import condition_results, results_path
+
+from conftest import synthetic_field, write_tiff
+
+def test_cached_field_is_reused_unless_stale_or_another_method(condition, rng):
+    objective = os.path.dirname(condition)
+    path = build_flat_field(objective)
+    assert stored_method(path) == "mean"
+    mtime = os.stat(path).st_mtime_ns
+    assert build_flat_field(objective) == path and os.stat(path).st_mtime_ns == mtime
+    assert build_flat_field(objective, statistic="mean") == path and os.stat(path).st_mtime_ns == mtime
+
+    build_flat_field(objective, statistic="median")
+    assert stored_method(path) == "median"
+
+    image = write_tiff(os.path.join(condition, "field4.tif"), synthetic_field(rng))
+    stat = os.stat(path)
+    os.utime(image, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    build_flat_field(objective)
+    assert os.stat(path).st_mtime_ns != stat.st_mtime_ns
+
+def test_step_name_follows_the_field(condition):
+    objective = os.path.dirname(condition)
+    step = FlatFieldCorrection(objective)
+    mean_name = step.name
+    assert mean_name == FlatFieldCorrection(objective).name
+    mean_rows = condition_results(condition, "green", 50, 50, preprocess=(step,))
+
+    build_flat_field(objective, statistic="median")
+    assert step.name != mean_name
+    median_rows = condition_results(condition, "green", 50, 50, preprocess=(step,))
+    assert os.path.exists(results_path(condition, "green", 50, 50, (step,)))
+    assert len(os.listdir(os.path.dirname(results_path(condition)))) == 2
+    assert len(mean_rows) == len(median_rows) == 4
+
+def test_name_does_not_rescan_while_the_field_is_unchanged(condition, monkeypatch):
+    objective = os.path.dirname(condition)
+    step = FlatFieldCorrection(objective)
+    name = step.name
+
+    calls = []
+    build = flatfield.build_flat_field
+    monkeypatch.setattr(flatfield, "build_flat_field", lambda *a, **k: calls.append(a) or build(*a, **k))
+    assert step.name == name and not calls
+
+    build(objective, statistic="median")
+    assert step.name != name and len(calls) == 1
@@ -0,0 +1,37 @@
+import numpy as np
+from PIL import Image
+
+from uptake_engine.engine import analyze_image
+from uptake_engine.frames import iter_frames, analyze_series
+
+from conftest import leica_xml, synthetic_field
+
+def write_stack(path, planes):
+    pages = [Image.fromarray(plane) for plane in planes]
+    pages[0].save(path, save_all=True, append_images=pages[1:])
+
+def test_grayscale_stack_is_analyzed_as_green(tmp_path, rng):
+    planes = [synthetic_field(rng)[..., 1] for _ in range(4)]
+    path = str(tmp_path / "series.tif")
+    write_stack(path, planes)
+    frames = list(iter_frames(path))
+    assert [frame.shape for frame in frames] == [planes[0].shape + (3,)] * 4
+    assert np.array_equal(frames[0][..., 1], planes[0]) and not frames[0][..., [0, 2]].any()
+
+    rows = analyze_series(path, z_slices=2)
+    projection = np.zeros(planes[0].shape + (3,), np.uint8)
+    projection[..., 1] = np.maximum(planes[0], planes[1])
+    assert len(rows) == 2
+    assert rows[0]["ratio"] == analyze_image(projection)["ratio"]
+
+def test_grayscale_plane_goes_to_the_metadata_channel(tmp_path, rng):
+    leica_xml(str(tmp_path / "MetaData" / "Run_Pos003_ICC.xml"), "Pos003_ICC", luts=("Red",))
+    plane = synthetic_field(rng)[..., 0]
+    write_stack(str(tmp_path / "3.tif"), [plane, plane])
+    frame = next(iter_frames(str(tmp_path / "3.tif")))
+    assert np.array_equal(frame[..., 0], plane) and not frame[..., 1:].any()
+
+def test_rgb_pages_are_unchanged(tmp_path, rng):
+    fields = [synthetic_field(rng) for _ in range(2)]
+    write_stack(str(tmp_path / "rgb.tif"), fields)
+    assert all(np.array_equal(a, b) for a, b in zip(iter_frames(str(tmp_path / "rgb.tif")), fields))
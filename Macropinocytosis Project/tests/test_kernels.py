@@ -0,0 +1,52 @@
+"""
+The numba kernels against the NumPy reference code. numba is optional, so
+a stand-in numba whose njit returns the function unchanged runs the kernel
+loops as plain Python: the same code, checked without compiling it.
+"""
+import sys
+import types
+import importlib
+import numpy as np
+import pytest
+
+from uptake_engine import kernels
+from uptake_engine.metrics import signal_mask, cell_mask
+from uptake_engine.colocalization import joint_histogram
+from uptake_engine.intensity import intensity_histogram
+
+from conftest import synthetic_field
+
+@pytest.fixture
+def python_kernels(monkeypatch):
+    stub = types.ModuleType("numba")
+    stub.njit = lambda **options: (lambda function: function)
+    monkeypatch.setitem(sys.modules, "numba", stub)
+    monkeypatch.delenv(kernels.KERNELS_ENV, raising=False)
+    yield importlib.reload(kernels)
+    monkeypatch.undo()
+    importlib.reload(kernels)
+
+@pytest.fixture
+def field(rng):
+    return synthetic_field(rng, (24, 32))
+
+@pytest.mark.parametrize("channel", ["green", "yellow"])
+@pytest.mark.parametrize("threshold, black_threshold", [(50, 50), (40.5, 20.2), (0, 0)])
+def test_fused_masks_match_numpy(python_kernels, field, channel, threshold, black_threshold):
+    assert python_kernels.use_kernels(field)
+    signal, cells, n_signal, n_cells = python_kernels.fused_masks(field, channel, threshold, black_threshold)
+    assert np.array_equal(signal, signal_mask(field, channel, threshold))
+    assert np.array_equal(cells, cell_mask(field, black_threshold))
+    assert (n_signal, n_cells) == (np.count_nonzero(signal), np.count_nonzero(cells))
+
+@pytest.mark.parametrize("channel", ["green", "yellow"])
+def test_histograms_match_numpy(python_kernels, field, channel):
+    mask = cell_mask(field, 50)
+    assert np.array_equal(python_kernels.joint_histogram_u8(field, mask), joint_histogram(field, mask, compiled=False))
+    counts, _ = intensity_histogram(field, mask, channel, compiled=False)
+    assert np.array_equal(python_kernels.signal_histogram_u8(field, mask, channel), counts)
+
+def test_other_dtypes_use_numpy(python_kernels, field):
+    wide = field.astype(np.uint16) * 16
+    assert not python_kernels.use_kernels(wide)
+    assert python_kernels.joint_histogram_u8(wide, cell_mask(wide, 50)) is None
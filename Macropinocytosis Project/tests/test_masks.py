@@ -0,0 +1,24 @@
+import os
+import numpy as np
+import pytest
+
+from uptake_engine.background import BackgroundSubtraction
+from uptake_engine.engine import load_image
+from uptake_engine.masks import mask_export, mask_path, load_masks
+from uptake_engine.metrics import signal_mask
+from uptake_engine.results import condition_results
+
+@pytest.mark.parametrize("decoders", [0, 1])
+def test_masks_are_kept_per_preprocessing(condition, decoders):
+    step = BackgroundSubtraction(radius=8)
+    for preprocess in ((), (step,)):
+        rows = condition_results(condition, "green", 30, 20, stages=(mask_export,),
+                                 preprocess=preprocess, decoders=decoders)
+        assert all(row["mask_file"] == os.path.basename(mask_path(
+            os.path.join(condition, row["filename"]), "green", 30, 20, preprocess)) for row in rows)
+
+    path = os.path.join(condition, "field0.tif")
+    plain, corrected = mask_path(path, "green", 30, 20), mask_path(path, "green", 30, 20, (step,))
+    assert plain != corrected
+    assert np.array_equal(load_masks(plain)[0], signal_mask(load_image(path), "green", 30))
+    assert np.array_equal(load_masks(corrected)[0], signal_mask(load_image(path, (step,)), "green", 30))
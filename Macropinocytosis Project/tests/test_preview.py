@@ -0,0 +1,15 @@
+import numpy as np
+
+from uptake_engine.engine import analyze_image
+from uptake_engine.preview import preview_image
+
+from conftest import synthetic_field
+
+def test_full_sample_matches_the_full_analysis(rng):
+    img = synthetic_field(rng)
+    # a signal threshold below the black threshold counts signal outside the cells
+    for threshold, black_threshold in ((50, 50), (20, 60)):
+        expected = analyze_image(img, "green", threshold, black_threshold)["ratio"]
+        ratio, lower, upper, _ = preview_image(img, "green", threshold, black_threshold, stride=1)["ratio"]
+        assert np.isclose(ratio, expected)
+        assert lower <= ratio <= upper
@@ -0,0 +1,44 @@
+import os
+import json
+import pickle
+import numpy as np
+
+from uptake_engine.registration import ChannelRegistration, build_offsets, offsets_path, shift_plane
+
+from conftest import synthetic_field, write_tiff
+
+def _set_offsets(objective, median):
+    path = offsets_path(objective)
+    with open(path) as f:
+        cached = json.load(f)
+    cached["median"] = {str(c): v for c, v in median.items()}
+    with open(path, "w") as f:
+        json.dump(cached, f)
+
+def test_name_carries_the_rounded_offsets(condition):
+    objective = os.path.dirname(condition)
+    build_offsets(objective)
+    _set_offsets(objective, {0: [0.5, -1.254], 2: [-0.001, 0.0]})
+    step = ChannelRegistration(objective)
+    assert step.name == "reg0+0.50-1.252+0.00+0.00"
+    assert pickle.loads(pickle.dumps(step)).name == step.name
+
+    _set_offsets(objective, {0: [0.5, -1.0], 2: [0.0, 0.0]})
+    assert step.name == "reg0+0.50-1.002+0.00+0.00"
+
+def test_offsets_are_reestimated_when_an_image_is_newer(condition, rng):
+    objective = os.path.dirname(condition)
+    build_offsets(objective)
+    _set_offsets(objective, {0: [3.0, 3.0], 2: [3.0, 3.0]})
+    assert build_offsets(objective)[0] == (3.0, 3.0)
+
+    image = write_tiff(os.path.join(condition, "field4.tif"), synthetic_field(rng))
+    stat = os.stat(offsets_path(objective))
+    os.utime(image, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert build_offsets(objective)[0] != (3.0, 3.0)
+
+def test_integer_shift_moves_the_plane():
+    plane = np.arange(20, dtype=np.uint8).reshape(4, 5)
+    shifted = shift_plane(plane, 1, -2)
+    assert np.array_equal(shifted[1:, :3], plane[:3, 2:])
+    assert not shifted[0].any() and not shifted[:, 3:].any()
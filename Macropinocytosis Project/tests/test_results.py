@@ -0,0 +1,44 @@
+import os
+import json
+
+from uptake_engine import results
+from uptake_engine.background import BackgroundSubtraction
+from uptake_engine.intensity import intensity_distribution
+from uptake_engine.results import condition_results, load_results, results_path, is_stale
+
+from conftest import synthetic_field, write_tiff
+
+def test_settings_are_stored_separately(condition):
+    paths = {results_path(condition, "green", 50, 50), results_path(condition, "green", 40, 50),
+             results_path(condition, "green", 50, 40), results_path(condition, "yellow", 50, 50),
+             results_path(condition, "green", 50, 50, (BackgroundSubtraction(radius=30),)),
+             results_path(condition, "green", 50, 50, (BackgroundSubtraction(radius=50),))}
+    assert len(paths) == 6
+
+def test_rows_are_reused_until_the_image_changes(condition, rng, monkeypatch):
+    first = condition_results(condition, "green", 50, 50)
+    assert len(first) == 4 and os.path.exists(results_path(condition, "green", 50, 50))
+
+    analyzed = []
+    analyze = results.analyze_file
+    monkeypatch.setattr(results, "analyze_file", lambda path, *args: analyzed.append(path) or analyze(path, *args))
+    assert condition_results(condition, "green", 50, 50) == first
+    assert analyzed == []
+
+    path = write_tiff(os.path.join(condition, "field1.tif"), synthetic_field(rng))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert is_stale(load_results(condition, "green", 50, 50)["field1.tif"], path)
+    condition_results(condition, "green", 50, 50)
+    assert analyzed == [path]
+
+def test_missing_stage_makes_a_row_stale(condition):
+    condition_results(condition, "green", 50, 50)
+    path = os.path.join(condition, "field0.tif")
+    row = load_results(condition, "green", 50, 50)["field0.tif"]
+    assert not is_stale(row, path)
+    assert is_stale(row, path, (intensity_distribution,))
+    rows = condition_results(condition, "green", 50, 50, stages=(intensity_distribution,))
+    assert all("mean_intensity" in row for row in rows)
+    with open(results_path(condition, "green", 50, 50)) as f:
+        assert all(row["stages"] == ["intensity_distribution"] for row in json.load(f))
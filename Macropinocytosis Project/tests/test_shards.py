@@ -0,0 +1,73 @@
+import os
+import shutil
+import numpy as np
+import pytest
+
+from uptake_engine.dataset import update_manifest
+from uptake_engine.qc import image_qc, apply_qc
+from uptake_engine.results import condition_results, load_results, is_stale
+from uptake_engine.shards import run_shard, merge_shards, save_figures
+
+from conftest import synthetic_field, write_tiff
+
+CONDITIONS = ("10x/A 10x", "10x/B 10x", "20x/A 20x")
+
+@pytest.fixture
+def experiment(tmp_path, rng):
+    base = tmp_path / "experiment"
+    for condition in CONDITIONS:
+        for i in range(5):
+            write_tiff(str(base / condition / f"field{i}.tif"), synthetic_field(rng))
+        write_tiff(str(base / condition / "empty.tif"), np.zeros((64, 80, 3), np.uint8))
+    update_manifest(str(base))
+    return str(base)
+
+def run(experiment, out_dir, count=3, **settings):
+    for index in range(count):
+        run_shard(experiment, index, count, out_dir, **settings)
+    return merge_shards(out_dir)
+
+@pytest.mark.parametrize("exclude_failed_qc", [True, False])
+def test_merge_matches_a_single_node_run(experiment, tmp_path, exclude_failed_qc):
+    merged = run(experiment, str(tmp_path / "run"), threshold=40, exclude_failed_qc=exclude_failed_qc)
+    assert sorted(merged) == sorted(CONDITIONS)
+    for condition, result in merged.items():
+        rows = condition_results(os.path.join(experiment, condition), "green", 40,
+                                 stages=(image_qc,) if exclude_failed_qc else ())
+        included = apply_qc(rows, exclude_failed_qc)
+        assert result["rows"] == rows
+        assert result["included"] == included
+        ratios = [row["ratio"] for row in included]
+        stats = result["statistics"]
+        assert stats["n"] == len(included) == (5 if exclude_failed_qc else 6)
+        assert stats["mean"] == float(np.mean(ratios))
+        assert stats["sem"] == float(np.std(ratios, ddof=1) / np.sqrt(len(ratios)))
+        assert stats["signal_area"] == sum(row["signal_area"] for row in included)
+
+def test_store_restamps_rows_for_local_copies(experiment, tmp_path):
+    out_dir = str(tmp_path / "run")
+    run(experiment, out_dir)
+    copy = str(tmp_path / "copy")
+    shutil.copytree(experiment, copy)  # New mtimes, same content
+    changed = os.path.join(copy, "10x/B 10x/field0.tif")
+    write_tiff(changed, np.full((64, 80, 3), 120, np.uint8))
+    update_manifest(copy)
+
+    merge_shards(out_dir, copy, store=True)
+    for condition in CONDITIONS:
+        folder = os.path.join(copy, condition)
+        stored = load_results(folder, "green", 50, 50)
+        stale = [name for name in os.listdir(folder) if name.endswith(".tif")
+                 and is_stale(stored.get(name), os.path.join(folder, name), (image_qc,))]
+        assert stale == (["field0.tif"] if condition == "10x/B 10x" else [])
+
+def test_figures_per_objective_folder(experiment, tmp_path):
+    merged = run(experiment, str(tmp_path / "run"))
+    paths = save_figures(merged, str(tmp_path / "merged.png"), "Experiment")
+    assert [os.path.basename(path) for path in paths] == ["merged-10x.png", "merged-20x.png"]
+    assert all(os.path.getsize(path) for path in paths)
+
+def test_shard_refuses_images_that_differ_from_the_manifest(experiment, tmp_path):
+    write_tiff(os.path.join(experiment, "10x/A 10x/field0.tif"), np.full((64, 80, 3), 120, np.uint8))
+    with pytest.raises(ValueError, match="differs from the dataset manifest"):
+        run(experiment, str(tmp_path / "run"), count=1)
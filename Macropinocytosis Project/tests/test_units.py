@@ -0,0 +1,25 @@
+import numpy as np
+
+from uptake_engine.metadata import position_number, image_metadata
+from uptake_engine.units import pixel_size_um
+
+from conftest import leica_xml, write_tiff
+
+def test_position_numbers():
+    assert position_number("SF188WT 63x_Lung HS1299T_63x_Pos013_ICC") == 13
+    assert position_number("Pos007") == 7
+    assert position_number("13") == 13
+    assert position_number("Position") is None and position_number("field1") is None
+
+def test_numbered_images_find_their_position(tmp_path, capsys):
+    folder = tmp_path / "63x" / "Lung 63x"
+    leica_xml(str(folder / "MetaData" / "Run_63x_Pos013_ICC.xml"), "Pos013_ICC", length_m=2e-5)
+    leica_xml(str(folder / "MetaData" / "Run_63x_Pos007_ICC.xml"), "Pos007_ICC", length_m=1e-5)
+    for name in ("13.tif", "7.tif", "99.tif"):
+        write_tiff(str(folder / name), np.zeros((8, 8, 3), np.uint8))
+
+    assert image_metadata(str(folder / "13.tif"))["position"] == "Run_63x_Pos013_ICC"
+    assert pixel_size_um(str(folder / "13.tif")) == (0.2, "metadata")
+    assert pixel_size_um(str(folder / "7.tif")) == (0.1, "metadata")
+    assert pixel_size_um(str(folder / "99.tif"))[1] != "metadata"
+    assert "no metadata for 99.tif" in capsys.readouterr().out
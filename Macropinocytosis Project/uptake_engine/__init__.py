@@ -0,0 +1,28 @@
+"""
+Shared uptake-analysis engine for the macropinocytosis imaging experiments.
+
+The per-experiment analyze_*_images.py scripts compute the same whole-field
+metrics (signal area / total cell area); this package holds one copy of that
+logic plus the tooling built on top of it. Import it with the
+"Macropinocytosis Project" folder on the path, or run its tools from there:
+    python -m uptake_engine.preview <condition folder> ...
+
+Only the core metrics, the engine and the library API (api.Experiment) are
+re-exported here; tools that double as command-line entry points are
+imported from their own modules. Experiment is imported on first access:
+api pulls in most command-line modules, and importing them with the package
+would make `python -m uptake_engine.<tool>` run a second copy of the tool.
+"""
+from .metrics import (
+    compute_green_area,
+    compute_yellow_area,
+    compute_total_cell_area,
+    compute_ratio,
+)
+from .engine import list_images, load_image, analyze_image, analyze_condition
+
+def __getattr__(name):
+    if name == "Experiment":
+        from .api import Experiment
+        return Experiment
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,220 @@
+"""
+Library API: lazily computed, memoized experiment results.
+
+The analysis scripts print their tables and return a Figure, so a notebook
+has to rerun them (and scrape stdout) to get numbers. Experiment describes
+an analysis the way the scripts configure one (groups, thresholds, metric)
+and computes nothing until a view is accessed:
+
+- images: one row per image (group, filename, every stored metric)
+- summary: one row per group (n, mean and SEM of the metric, mean areas,
+  pooled ratio)
+- pairwise: Welch's t-test for every pair of groups, or of every group
+  against the control
+
+Each view is computed once per Experiment and reused by the views built on
+it; per-image results come from the result store (condition_results), so
+even a new Experiment only decodes images that were never analyzed with its
+thresholds. with_options(metric=..., control=...) derives an Experiment that
+shares the computed rows. The stage a metric needs (stages.METRIC_STAGES,
+e.g. intensity_distribution for mean_intensity) is added automatically.
+
+As in the analysis scripts, images that fail image QC are left out of the
+statistics unless exclude_failed_qc=False.
+
+images, summary and pairwise are pandas DataFrames, which needs pandas
+(`pip install pandas`; the scripts themselves do not use it). The
+image_records, summary_records and pairwise_records properties return the
+same data as lists of dicts without it.
+
+Usage:
+    from uptake_engine.api import Experiment
+    exp = Experiment(groups_exp1, BASE_FOLDER_EXP1, threshold=50, black_threshold=50)
+    exp.summary          # computed here
+    exp.pairwise         # reuses the rows computed for summary
+    exp.with_options(metric="mean_intensity").summary   # adds intensity_distribution
+    exp.summary_records  # same data without pandas
+"""
+import os
+import functools
+import numpy as np
+from scipy.stats import ttest_ind
+
+from .engine import DEFAULT_THRESHOLD, DEFAULT_BLACK_THRESHOLD
+from .results import condition_results
+from .qc import image_qc, apply_qc
+from .stages import METRIC_STAGES, STAGES
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+## ================= HELPERS ================= ##
+def significance_stars(p):
+    """Star notation used in the figures and tables"""
+    if p < 0.001:
+        return "***"
+    if p < 0.01:
+        return "**"
+    if p < 0.05:
+        return "*"
+    return "ns"
+
+def _frame(records, columns=None):
+    if pd is None:
+        raise ImportError("pandas is required for DataFrame views (pip install pandas); "
+                          "use the *_records properties instead")
+    return pd.DataFrame.from_records(records, columns=columns)
+
+## ================= EXPERIMENT ================= ##
+class Experiment:
+    """
+    One experiment's groups and analysis settings, with lazy result views.
+
+    Parameters:
+    - groups: (label, folder_name, color) tuples as in the analysis scripts
+    - base_folder: folder the group folders are relative to
+    - channel / threshold / black_threshold: as for condition_results
+    - stages: extra analysis stages (image_qc is added when excluding QC
+      failures, and the metric's stage when it needs one)
+    - metric: per-image field the summary and statistics are computed on
+    - control: label of the control group; pairwise then compares every group
+      with it instead of all pairs
+    - exclude_failed_qc: drop images that fail qc.image_qc before statistics
+      (the scripts' default)
+    - workers: processes for images that need decoding
+    """
+    def __init__(self, groups, base_folder="", channel="green", threshold=DEFAULT_THRESHOLD,
+                 black_threshold=DEFAULT_BLACK_THRESHOLD, stages=(), metric="ratio",
+                 control=None, exclude_failed_qc=True, workers=1):
+        self.groups = [tuple(group) for group in groups]
+        self.base_folder = base_folder
+        self.channel = channel
+        self.threshold = threshold
+        self.black_threshold = black_threshold
+        self.stages = tuple(stages)
+        if exclude_failed_qc and image_qc not in self.stages:
+            self.stages += (image_qc,)
+        needed = STAGES.get(METRIC_STAGES.get(metric))
+        if needed is not None and needed not in self.stages:
+            self.stages += (needed,)
+        self.metric = metric
+        self.control = control
+        self.exclude_failed_qc = exclude_failed_qc
+        self.workers = workers
+
+    def __repr__(self):
+        labels = ", ".join(label for label, _, _ in self.groups)
+        return (f"Experiment([{labels}], channel={self.channel!r}, threshold={self.threshold:g}, "
+                f"black_threshold={self.black_threshold:g}, metric={self.metric!r})")
+
+    def with_options(self, **changes):
+        """
+        Copy with some settings changed. Computed per-image rows are shared
+        when only metric, control or exclude_failed_qc change (and the QC
+        selection too when exclude_failed_qc is unchanged).
+        """
+        settings = {key: getattr(self, key) for key in (
+            "groups", "base_folder", "channel", "threshold", "black_threshold", "stages",
+            "metric", "control", "exclude_failed_qc", "workers")}
+        settings.update(changes)
+        derived = Experiment(**settings)
+        same_rows = all(getattr(derived, key) == getattr(self, key) for key in (
+            "groups", "base_folder", "channel", "threshold", "black_threshold", "stages"))
+        # cached_property stores its value in the instance __dict__
+        if same_rows and "group_rows" in self.__dict__:
+            derived.__dict__["group_rows"] = self.group_rows
+            if derived.exclude_failed_qc == self.exclude_failed_qc and "included_rows" in self.__dict__:
+                derived.__dict__["included_rows"] = self.included_rows
+        return derived
+
+    ## ----- computation (memoized) ----- ##
+    @functools.cached_property
+    def group_rows(self):
+        """{label: all stored rows of the group's images}, QC failures included"""
+        rows = {}
+        for label, folder, _ in self.groups:
+            rows[label] = condition_results(os.path.join(self.base_folder, folder), self.channel,
+                                            self.threshold, self.black_threshold, self.workers,
+                                            stages=self.stages)
+        return rows
+
+    @functools.cached_property
+    def included_rows(self):
+        """{label: rows used for statistics} (QC failures removed when requested)"""
+        if not self.exclude_failed_qc:
+            return self.group_rows
+        return {label: apply_qc(rows, exclude=True, label=label)
+                for label, rows in self.group_rows.items()}
+
+    @functools.cached_property
+    def image_records(self):
+        """Per-image rows as dicts, with the group label, in group order"""
+        return [{"group": label, **row} for label, rows in self.included_rows.items() for row in rows]
+
+    @functools.cached_property
+    def summary_records(self):
+        """Per-group n, mean/SEM of the metric, mean areas and pooled ratio"""
+        records = []
+        for label, _, color in self.groups:
+            rows = self.included_rows[label]
+            values = np.array([row[self.metric] for row in rows], dtype=float)
+            signal = np.array([row["signal_area"] for row in rows], dtype=float)
+            cells = np.array([row["cell_area"] for row in rows], dtype=float)
+            n = len(rows)
+            records.append({
+                "group": label,
+                "color": color,
+                "n": n,
+                "mean": float(values.mean()) if n else float("nan"),
+                "sem": float(values.std(ddof=1) / np.sqrt(n)) if n > 1 else float("nan"),
+                "mean_signal_area": float(signal.mean()) if n else float("nan"),
+                "mean_cell_area": float(cells.mean()) if n else float("nan"),
+                "pooled_ratio": float(signal.sum() / cells.sum()) if cells.sum() else float("nan"),
+            })
+        return records
+
+    @functools.cached_property
+    def pairwise_records(self):
+        """Welch's t-test per pair of groups (each group vs the control when one is set)"""
+        labels = [label for label, _, _ in self.groups]
+        if self.control is not None:
+            if self.control not in labels:
+                raise ValueError(f"Unknown control group '{self.control}' (expected one of {labels})")
+            pairs = [(self.control, label) for label in labels if label != self.control]
+        else:
+            pairs = [(a, b) for i, a in enumerate(labels) for b in labels[i + 1:]]
+        records = []
+        for a, b in pairs:
+            x = [row[self.metric] for row in self.included_rows[a]]
+            y = [row[self.metric] for row in self.included_rows[b]]
+            if len(x) > 1 and len(y) > 1:
+                statistic, p = ttest_ind(x, y, equal_var=False)
+                statistic, p = float(statistic), float(p)
+            else:
+                statistic = p = float("nan")
+            records.append({
+                "group_a": a, "group_b": b, "n_a": len(x), "n_b": len(y),
+                "mean_difference": float(np.mean(y) - np.mean(x)) if x and y else float("nan"),
+                "t": statistic, "p_value": p,
+                "significance": significance_stars(p) if p == p else "n/a",
+            })
+        return records
+
+    ## ----- DataFrame views ----- ##
+    @functools.cached_property
+    def images(self):
+        """Per-image DataFrame (requires pandas)"""
+        return _frame(self.image_records)
+
+    @functools.cached_property
+    def summary(self):
+        """Per-group summary DataFrame indexed by group (requires pandas)"""
+        return _frame(self.summary_records).set_index("group")
+
+    @functools.cached_property
+    def pairwise(self):
+        """Pairwise statistics DataFrame (requires pandas)"""
+        return _frame(self.pairwise_records, columns=[
+            "group_a", "group_b", "n_a", "n_b", "mean_difference", "t", "p_value", "significance"])
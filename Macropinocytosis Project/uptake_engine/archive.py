@@ -0,0 +1,208 @@
+"""
+Lossless, tiled, per-channel archive of the raw TIFFs.
+
+The TIFFs are single-strip LZW RGB: reading any pixel decodes the whole
+2432x2032x3 image (~45 ms), even when a tool needs only the blue nuclei or
+one corner. The archive re-encodes each image as a chunked .npz next to its
+TIFF ("<name>.tif.tiles.npz", see tiles.py for the format): one
+deflate-compressed member per channel and 512x512 tile, so a reader
+inflates only the members it asks for.
+
+Planar per-channel deflate stores the KO-line images in 61% of the LZW
+TIFF size. Reading every channel costs about as much as decoding the TIFF
+(~45 ms), but one channel costs ~10 ms and a region only its tiles, so
+load_archived(path, channels=..., region=...) is what the partial readers
+use (nuclei.py for the blue channel, pyramid.read_region for full-resolution
+crops). Every archive is checked bit-exact against the decoded TIFF before
+it is swapped in, and verify_archive repeats the check later.
+
+An archive is current when the source hash it records matches the image's
+hash in the dataset manifest (dataset.recorded_hash), not by file mtime, so
+copying or touching the TIFF does not invalidate it. --retire then deletes
+each TIFF whose archive verifies bit-exact: the archive becomes the copy of
+record, and the engine lists, hashes and decodes the image from it under
+the TIFF's name. Multi-page TIFFs (see frames.py) are never retired, since
+the archive holds only the first page. A retired image's archive is
+verified against the hash of the decoded pixels it records.
+
+Every engine reader goes through engine.image_file / load_image (or
+load_archived), and representatives.export_image re-encodes a TIFF from the
+archive. The 2026-02-03 analysis scripts still list and read the TIFFs
+themselves, so do not retire that experiment's images.
+
+Usage (from the "Macropinocytosis Project" folder):
+    python -m uptake_engine.archive "2026-01-15 Macropinocytosis KO Lines FITC Assay"
+    python -m uptake_engine.archive "2026-01-15 ..." --verify
+    python -m uptake_engine.archive "2026-01-15 ..." --retire   # delete the verified TIFFs
+"""
+import os
+import sys
+import zlib
+import zipfile
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from .engine import load_image
+from .cache import walk_image_folders
+from .dataset import file_hash, recorded_hash, find_manifest, update_manifest
+from .frames import frame_count
+from .tiles import (archive_path, archive_pixel_hash, archive_source_hash, encode_tiles, pixel_hash,
+                    read_archive)
+
+## ================= BUILDING ================= ##
+def is_current(image_path):
+    """
+    True when an image has an archive of its current content (always, once
+    the TIFF was retired).
+    """
+    path = archive_path(image_path)
+    if not os.path.exists(path):
+        return False
+    if not os.path.exists(image_path):
+        return True
+    return archive_source_hash(path) == recorded_hash(image_path)
+
+def build_archive(image_path, force=False):
+    """
+    Archive one image unless a current archive exists, checking the
+    roundtrip before the archive is swapped in.
+
+    Returns:
+        archive size in bytes (0 when it was already current)
+    """
+    path = archive_path(image_path)
+    if (not force and is_current(image_path)) or not os.path.exists(image_path):
+        return 0
+    img = load_image(image_path)
+    tmp = path + ".tmp.npz"
+    np.savez_compressed(tmp, source_hash=np.array(file_hash(image_path)),
+                        pixel_hash=np.array(pixel_hash(img)), **encode_tiles(img))
+    if not np.array_equal(read_archive(tmp), img):
+        os.remove(tmp)
+        raise ValueError(f"{image_path}: archive roundtrip is not bit-exact")
+    os.replace(tmp, path)
+    return os.path.getsize(path)
+
+def image_paths(base_folder):
+    return [os.path.join(folder, f) for folder, filenames in walk_image_folders(base_folder)
+            for f in filenames]
+
+def build_archives(base_folder, workers=None, force=False):
+    """
+    Archive every image under an experiment in a process pool.
+
+    Returns:
+        (images archived, their TIFF bytes, their archive bytes)
+    """
+    todo = [p for p in image_paths(base_folder)
+            if os.path.exists(p) and (force or not is_current(p))]
+    if workers == 1 or len(todo) <= 1:
+        sizes = [build_archive(p, force) for p in todo]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            sizes = list(pool.map(build_archive, todo, [force] * len(todo)))
+    return len(todo), sum(os.path.getsize(p) for p in todo), sum(sizes)
+
+def verify_archive(image_path):
+    """
+    True when the archive decodes bit-exact to the TIFF and names its hash,
+    or, once the TIFF was retired, decodes to the pixel hash it records
+    """
+    path = archive_path(image_path)
+    if not os.path.exists(image_path):
+        # Retired: the archive is the only copy left
+        try:
+            recorded = archive_pixel_hash(path)
+            return recorded is not None and pixel_hash(read_archive(path)) == recorded
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile, zlib.error):
+            return False
+    if archive_source_hash(path) != file_hash(image_path):
+        return False
+    return bool(np.array_equal(read_archive(path), load_image(image_path)))
+
+def retire_tiff(image_path):
+    """
+    Delete a TIFF whose archive verifies bit-exact.
+
+    Returns:
+        bytes freed (0 when the TIFF was kept or is already gone)
+    """
+    if not os.path.exists(image_path):
+        return 0
+    if not os.path.exists(archive_path(image_path)) or frame_count(image_path) != 1:
+        return 0
+    if archive_pixel_hash(archive_path(image_path)) is None:
+        build_archive(image_path, force=True)  # Older archive: record the pixel hash first
+    if not verify_archive(image_path):
+        return 0
+    size = os.path.getsize(image_path)
+    os.remove(image_path)
+    return size
+
+## ================= READING ================= ##
+def load_archived(image_path, channels=None, region=None, preprocess=()):
+    """
+    Decode an image (or some of its channels / a region of it) from its
+    archive, or from the TIFF when there is no current archive. Same result
+    as load_image followed by the channel and region selection.
+
+    Parameters:
+    - channels: channel indices (None = all); the result then has a channel
+      axis, in this order (see tiles.read_archive)
+    - region: (y0, y1, x0, x1) in full-resolution pixels (None = whole image)
+    - preprocess: steps that need whole images, so the full image is read,
+      preprocessed, then cut down
+    """
+    path = archive_path(image_path)
+    if is_current(image_path):
+        if not preprocess:
+            return read_archive(path, channels, region)
+        img = read_archive(path)
+    else:
+        img = load_image(image_path)
+    for step in preprocess:
+        img = step(img)
+    if region is not None:
+        y0, y1, x0, x1 = region
+        img = img[y0:y1, x0:x1]
+    if channels is None:
+        return img
+    planes = img[..., np.newaxis] if img.ndim == 2 else img
+    return planes[..., list(channels)]
+
+## ================= MAIN ================= ##
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive TIFFs as tiled, per-channel compressed .npz.")
+    parser.add_argument("folders", nargs="+", help="experiment or condition folders")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="re-archive even if the archive is current")
+    parser.add_argument("--verify", action="store_true", help="re-check every archive against its TIFF")
+    parser.add_argument("--retire", action="store_true",
+                        help="after archiving, delete every TIFF whose archive verifies bit-exact")
+    args = parser.parse_args(argv)
+
+    status = 0
+    for folder in args.folders:
+        if args.verify:
+            paths = image_paths(folder)
+            bad = [p for p in paths if not os.path.exists(archive_path(p)) or not verify_archive(p)]
+            for path in bad:
+                print(f"⚠️  {path}: archive missing or not bit-exact")
+            print(f"✓ {folder}: {len(paths) - len(bad)}/{len(paths)} archives verified")
+            status = status or int(bool(bad))
+            continue
+        count, tiff_bytes, archive_bytes = build_archives(folder, args.workers, args.force)
+        ratio = f" ({archive_bytes / tiff_bytes:.0%} of the TIFF size)" if tiff_bytes else ""
+        print(f"✓ {folder}: {count} images archived, {archive_bytes / 1e6:.1f} MB{ratio}")
+        if args.retire:
+            freed = [retire_tiff(p) for p in image_paths(folder)]
+            print(f"🗑️  {folder}: {sum(1 for n in freed if n)} TIFFs retired, {sum(freed) / 1e6:.1f} MB freed")
+        # New archives (and retired TIFFs) change the condition folders
+        base, manifest = find_manifest(folder)
+        if manifest is not None:
+            update_manifest(base, args.workers)
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
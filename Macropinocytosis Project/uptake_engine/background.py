@@ -0,0 +1,113 @@
+"""
+Local background subtraction.
+
+A fixed global threshold of 50 is sensitive to uneven illumination across a
+field. This optional preprocessing step estimates a smooth local background
+per channel and subtracts it before any threshold is applied.
+
+The estimate is a morphological opening (a rolling-ball approximation with a
+square "ball") on an 8x downsampled copy of the image, smoothed with a box
+filter and bilinearly upsampled. scipy's separable min/max/uniform filters
+cost O(1) per pixel regardless of window size, and the heavy work happens on
+1/64 of the pixels, so the whole step is linear in pixel count and cheap at
+2432x2032.
+
+Usage:
+    from uptake_engine.background import BackgroundSubtraction
+    analyze_condition(folder, preprocess=(BackgroundSubtraction(radius=50),))
+"""
+import numpy as np
+from scipy import ndimage
+
+from .pyramid import downsample2x
+
+## ================= CONFIGURATION ================= ##
+BACKGROUND_RADIUS = 50       # Full-resolution px; must exceed the radius of a cell
+BACKGROUND_DOWNSAMPLE = 8    # Power of two
+
+## ================= ESTIMATION ================= ##
+def bilinear_upsample(small, shape):
+    """Separable bilinear resize of an (h, w, ...) array to shape[:2]"""
+    def axis_weights(n_out, n_in):
+        pos = np.clip((np.arange(n_out) + 0.5) * n_in / n_out - 0.5, 0, n_in - 1)
+        lo = np.floor(pos).astype(np.intp)
+        hi = np.minimum(lo + 1, n_in - 1)
+        return lo, hi, (pos - lo).astype(np.float32)
+
+    y0, y1, wy = axis_weights(shape[0], small.shape[0])
+    x0, x1, wx = axis_weights(shape[1], small.shape[1])
+    extra = (1,) * (small.ndim - 2)
+    wy = wy.reshape(-1, 1, *extra)
+    wx = wx.reshape(1, -1, *extra)
+    rows = small[y0] * (1 - wy) + small[y1] * wy
+    return rows[:, x0] * (1 - wx) + rows[:, x1] * wx
+
+def coarse_background(img, radius=BACKGROUND_RADIUS, downsample=BACKGROUND_DOWNSAMPLE):
+    """Background estimate at 1/downsample resolution, float32"""
+    small = img
+    for _ in range(int(np.log2(downsample))):
+        small = downsample2x(small)
+    size = 2 * max(1, radius // downsample) + 1
+    window = (size, size) + (1,) * (img.ndim - 2)
+    opened = ndimage.grey_opening(small, size=window)
+    return ndimage.uniform_filter(opened.astype(np.float32), size=window)
+
+def estimate_background(img, radius=BACKGROUND_RADIUS, downsample=BACKGROUND_DOWNSAMPLE):
+    """
+    Smooth per-channel background of an (H, W, C) image, same shape, float32.
+
+    Parameters:
+    - img: image to estimate the background of
+    - radius: structuring element radius in full-resolution px
+    - downsample: power-of-two factor the opening runs at
+    """
+    return bilinear_upsample(coarse_background(img, radius, downsample), img.shape)
+
+def subtract_background(img, radius=BACKGROUND_RADIUS, downsample=BACKGROUND_DOWNSAMPLE,
+                        channels=None):
+    """
+    Subtract the local background from an image, clipping at zero.
+
+    Channels whose background rounds to zero everywhere (the usual case for
+    dark-field fluorescence) are left untouched, which skips all of the
+    full-resolution work for them.
+
+    Parameters:
+    - channels: channel indices to correct (None = all)
+
+    Returns:
+        corrected image with the input dtype
+    """
+    coarse = coarse_background(img, radius, downsample)
+    channels = range(img.shape[-1]) if channels is None else channels
+    active = [c for c in channels if coarse[..., c].max() >= 0.5]
+    if not active:
+        return img
+    # smallest signed type that holds the input range (int16 for uint8, int32 for uint16)
+    work_dtype = np.promote_types(img.dtype, np.int8)
+    background = np.rint(bilinear_upsample(coarse[..., active], img.shape)).astype(work_dtype)
+    corrected = img[..., active].astype(work_dtype)
+    corrected -= background
+    np.clip(corrected, 0, None, out=corrected)
+    out = img.copy()
+    out[..., active] = corrected
+    return out
+
+## ================= PREPROCESSING STEP ================= ##
+class BackgroundSubtraction:
+    """
+    Preprocessing step for load_image / analyze_condition / condition_results.
+    Instances pickle, so they can be handed to worker processes.
+    """
+    def __init__(self, radius=BACKGROUND_RADIUS, downsample=BACKGROUND_DOWNSAMPLE, channels=None):
+        self.radius = radius
+        self.downsample = downsample
+        self.channels = channels
+
+    @property
+    def name(self):
+        suffix = "c" + "".join(map(str, self.channels)) if self.channels is not None else ""
+        return f"bg{self.radius}d{self.downsample}{suffix}"
+
+    def __call__(self, img):
+        return subtract_background(img, self.radius, self.downsample, self.channels)
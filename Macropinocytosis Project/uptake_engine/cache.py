@@ -0,0 +1,35 @@
+import os
+
+from .engine import IMAGE_EXTENSIONS, image_file, image_filenames
+
+## ================= CONFIGURATION ================= ##
+# Derived data (pyramids, per-image results, ...) lives in a hidden folder
+# next to the images it was computed from, one sub-folder per kind.
+CACHE_DIRNAME = ".uptake_cache"
+
+## ================= PATHS ================= ##
+def cache_dir(folder_path, kind):
+    """Cache folder for one kind of derived data of a condition folder"""
+    return os.path.join(folder_path, CACHE_DIRNAME, kind)
+
+def cache_path(image_path, kind, suffix=""):
+    """Cache entry for a single image, e.g. cache_path(p, "pyramids")"""
+    folder, filename = os.path.split(image_path)
+    return os.path.join(cache_dir(folder, kind), filename + suffix)
+
+def is_fresh(cached_path, source_path):
+    """True when cached_path exists and is not older than the image source_path"""
+    if not os.path.exists(cached_path):
+        return False
+    return os.path.getmtime(cached_path) >= os.path.getmtime(image_file(source_path))
+
+def walk_image_folders(base_folder, extensions=IMAGE_EXTENSIONS):
+    """
+    Yield (folder, filenames) for every folder under base_folder that holds
+    images, skipping cache folders.
+    """
+    for folder, dirnames, filenames in os.walk(base_folder):
+        dirnames[:] = sorted(d for d in dirnames if d != CACHE_DIRNAME)
+        images = image_filenames(filenames, extensions)
+        if images:
+            yield folder, images
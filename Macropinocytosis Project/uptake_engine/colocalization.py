@@ -0,0 +1,128 @@
+"""
+Red/green colocalization inside the cell mask.
+
+The yellow (TMR) metric is (R + G) / 2 > threshold, which a strong signal in
+a single channel can pass on its own. This stage measures how much the red
+and green channels actually overlap:
+
+- Pearson's correlation coefficient
+- Manders' M1 (fraction of red intensity where green is above threshold) and
+  M2 (fraction of green intensity where red is above threshold)
+- the overlap coefficient sum(RG) / sqrt(sum(R^2) sum(G^2))
+
+For 8-bit images everything comes from one pass: the (R, G) pairs of the cell
+pixels are counted into a 256x256 joint histogram with a single bincount, and
+every sum is then an exact integer reduction of that histogram. Other dtypes
+fall back to int64 sums over the masked pixels.
+
+Usage (from the "Macropinocytosis Project" folder):
+    python -m uptake_engine.colocalization "2026-02-13 Macropinocytosis 63x Images/Lung H1299"
+"""
+import os
+import sys
+import math
+import argparse
+import numpy as np
+
+from .engine import DEFAULT_THRESHOLD, DEFAULT_BLACK_THRESHOLD
+from .results import condition_results
+from .kernels import joint_histogram_u8
+
+## ================= ACCUMULATION ================= ##
+def joint_histogram(img, mask, compiled=True):
+    """
+    256x256 int64 counts of (red, green) pairs of an 8-bit image inside mask
+    (compiled=False skips the numba kernel, see kernels.py)
+    """
+    if compiled:
+        counts = joint_histogram_u8(img, mask)
+        if counts is not None:
+            return counts
+    code = img[..., 0].astype(np.uint16)
+    code <<= 8
+    code |= img[..., 1]
+    return np.bincount(code[mask], minlength=65536).reshape(256, 256)
+
+def channel_sums(img, mask, threshold):
+    """
+    Integer accumulators over the masked pixels.
+
+    Returns:
+        dict of Python ints: n, r, g, rr, gg, rg, r_coloc (sum of red where
+        green > threshold) and g_coloc (sum of green where red > threshold)
+    """
+    t = int(math.floor(threshold))  # v > threshold  <=>  v > floor(threshold) for integers
+    if img.dtype == np.uint8:
+        hist = joint_histogram(img, mask)
+        v = np.arange(256, dtype=np.int64)
+        red = hist.sum(axis=1)    # marginal counts of each red value
+        green = hist.sum(axis=0)
+        above = slice(t + 1, None) if t >= 0 else slice(None)
+        return {
+            "n": int(red.sum()),
+            "r": int(red @ v), "g": int(green @ v),
+            "rr": int(red @ (v * v)), "gg": int(green @ (v * v)),
+            "rg": int(v @ hist @ v),
+            "r_coloc": int(hist[:, above].sum(axis=1) @ v),
+            "g_coloc": int(hist[above, :].sum(axis=0) @ v),
+        }
+    r = img[..., 0][mask].astype(np.int64)
+    g = img[..., 1][mask].astype(np.int64)
+    return {
+        "n": int(r.size),
+        "r": int(r.sum()), "g": int(g.sum()),
+        "rr": int(r @ r), "gg": int(g @ g), "rg": int(r @ g),
+        "r_coloc": int(r[g > threshold].sum()),
+        "g_coloc": int(g[r > threshold].sum()),
+    }
+
+def colocalization_metrics(sums):
+    """Pearson, Manders M1/M2 and overlap coefficient from channel_sums"""
+    n, r, g = sums["n"], sums["r"], sums["g"]
+    # Exact integer numerators; the only float step is the final division
+    covariance = n * sums["rg"] - r * g
+    spread = (n * sums["rr"] - r * r) * (n * sums["gg"] - g * g)
+    energy = sums["rr"] * sums["gg"]
+    return {
+        "pearson": covariance / math.sqrt(spread) if spread > 0 else 0.0,
+        "manders_m1": sums["r_coloc"] / r if r else 0.0,
+        "manders_m2": sums["g_coloc"] / g if g else 0.0,
+        "overlap_coefficient": sums["rg"] / math.sqrt(energy) if energy else 0.0,
+    }
+
+## ================= STAGE ================= ##
+def colocalization(img, context):
+    """analyze_image stage: red/green colocalization over the cell mask"""
+    return colocalization_metrics(channel_sums(img, context["cell_mask"], context["threshold"]))
+
+## ================= MAIN ================= ##
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Red/green colocalization per condition.")
+    parser.add_argument("folders", nargs="+", help="condition folders")
+    parser.add_argument("--channel", choices=["green", "yellow"], default="yellow")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--black-threshold", type=float, default=DEFAULT_BLACK_THRESHOLD)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    print("\n" + "="*80)
+    print("COLOCALIZATION")
+    print("="*80)
+    print(f"{'Condition':<25}{'n':>5}{'Ratio':>10}{'Pearson':>10}{'M1':>10}{'M2':>10}{'Overlap':>10}")
+    print("-" * 80)
+    for folder in args.folders:
+        rows = condition_results(folder, args.channel, args.threshold, args.black_threshold,
+                                 args.workers, stages=(colocalization,))
+        label = os.path.basename(os.path.normpath(folder))
+        if not rows:
+            print(f"{label:<25}{0:>5}")
+            continue
+        mean = {key: np.mean([row[key] for row in rows])
+                for key in ("ratio", "pearson", "manders_m1", "manders_m2", "overlap_coefficient")}
+        print(f"{label:<25}{len(rows):>5}{mean['ratio']:>10.4f}{mean['pearson']:>10.3f}"
+              f"{mean['manders_m1']:>10.3f}{mean['manders_m2']:>10.3f}{mean['overlap_coefficient']:>10.3f}")
+    print("="*80 + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
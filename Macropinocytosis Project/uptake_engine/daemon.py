@@ -0,0 +1,334 @@
+"""
+Local analysis daemon: a warm engine behind a Unix socket.
+
+Every script run pays the NumPy/SciPy/matplotlib imports, starts a process
+pool and decodes whatever the result store does not have. The daemon does
+that once and then keeps, for as long as it runs:
+
+- the imports and one process pool (passed to condition_results)
+- per-image threshold histograms of 8-bit images (after the job's
+  preprocessing): green values, R + G sums, the brightest of R, G, B, and
+  the brightest of R, G, B over the pixels with a saturated red or green,
+  plus the image's focus measure. Every (threshold, black_threshold) pair's
+  signal_area, cell_area and ratio, and image_qc's verdict, are exact sums
+  over them, so the "ratios" job answers a threshold tweak without touching
+  pixels. Decoded images are not kept: nothing reads them twice.
+- the metadata indexes it was asked for
+
+Like the analysis scripts, "ratios", "results" and "figure" drop the fields
+that fail image QC (qc.apply_qc) unless "exclude_failed_qc" is false.
+"preprocess" names preprocessing steps by spec (see stages.py). The client
+resolves folder and output paths against its own working directory.
+
+Jobs are one JSON object per line, answered with one JSON line
+({"ok": true, ...} or {"ok": false, "error": ...}):
+
+    {"op": "ratios", "folders": [...], "channel": "green", "threshold": 40, "black_threshold": 50,
+     "preprocess": [{"step": "background", "radius": 50}], "exclude_failed_qc": true}
+    {"op": "results", "folders": [...], "channel": ..., "threshold": ..., "black_threshold": ...,
+     "stages": ["intensity_distribution", "image_qc"], "preprocess": [...], "exclude_failed_qc": ...}
+    {"op": "figure", "groups": [[label, folder, color], ...], "output": "plot.png", ...}
+    {"op": "metadata", "folder": ...}
+    {"op": "status"} / {"op": "shutdown"}
+
+Jobs are served one at a time; request() is the client.
+
+Usage (from the "Macropinocytosis Project" folder):
+    python -m uptake_engine.daemon serve &
+    python -m uptake_engine.daemon ratios "2026-01-15 .../10x/PELP1 10x" "2026-01-15 .../10x/SafeGuide 10x" --threshold 40
+    python -m uptake_engine.daemon ratios "2026-01-15 .../10x/PELP1 10x" --preprocess '{"step": "background"}'
+    python -m uptake_engine.daemon shutdown
+"""
+import os
+import sys
+import json
+import math
+import socket
+import argparse
+import tempfile
+import socketserver
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")  # Figures are only ever written to files
+import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
+
+from .engine import DEFAULT_THRESHOLD, DEFAULT_BLACK_THRESHOLD, load_image, stage_name
+from .metrics import compute_ratio
+from .results import condition_results, file_signature
+from .dataset import folder_images
+from .metadata import build_index, index_rows
+from .qc import apply_qc, focus_measure, qc_verdict, saturation_level
+from .stages import STAGES, resolve_stages, resolve_preprocess
+
+## ================= CONFIGURATION ================= ##
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), f"uptake-engine-{os.getuid()}.sock")
+
+## ================= WARM STATE ================= ##
+def threshold_histograms(img):
+    """
+    Counts from which analyze_image's areas and image_qc's fields follow for
+    any thresholds of an 8-bit image: green values (256 bins), R + G (511),
+    max(R, G, B) (256), and max(R, G, B) of the pixels whose red or green is
+    saturated (256); plus the focus measure and the pixel count.
+    """
+    green = np.bincount(img[..., 1].ravel(), minlength=256)
+    yellow = np.bincount((img[..., 0].astype(np.uint16) + img[..., 1]).ravel(), minlength=511)
+    brightest = img[..., :3].max(axis=-1)
+    level = saturation_level(img.dtype)
+    saturated = (img[..., 0] >= level) | (img[..., 1] >= level)
+    return {"green": green, "yellow": yellow, "cells": np.bincount(brightest.ravel(), minlength=256),
+            "saturated": np.bincount(brightest[saturated], minlength=256),
+            "focus": focus_measure(img), "pixels": brightest.size}
+
+def areas_from_histograms(hists, channel, threshold, black_threshold):
+    """(signal_area, cell_area) exactly as metrics.signal_mask / cell_mask count them"""
+    # Integer values: v > t <=> v >= floor(t) + 1, v >= b <=> v >= ceil(b)
+    if channel == "yellow":
+        signal = hists["yellow"][max(math.floor(2 * threshold) + 1, 0):].sum()
+    else:
+        signal = hists["green"][max(math.floor(threshold) + 1, 0):].sum()
+    cells = hists["cells"][max(math.ceil(black_threshold), 0):].sum()
+    return int(signal), int(cells)
+
+def qc_from_histograms(hists, black_threshold):
+    """image_qc's fields exactly as qc.qc_metrics computes them on the cell mask"""
+    start = max(math.ceil(black_threshold), 0)
+    cells = int(hists["cells"][start:].sum())
+    saturated = int(hists["saturated"][start:].sum())
+    return qc_verdict(hists["focus"], float(saturated / cells) if cells else 0.0,
+                      float(cells / hists["pixels"]))
+
+class Engine:
+    """Everything the daemon keeps warm between jobs"""
+    def __init__(self, workers=None):
+        self.pool = ProcessPoolExecutor(max_workers=workers) if workers != 1 else None
+        self.histograms = {}  # (path, preprocessing names) -> (signature, histograms)
+        self.metadata = {}    # folder -> metadata rows
+        self.jobs = 0
+
+    def image_histograms(self, path, preprocess=()):
+        """Histograms of one (preprocessed) image, or None when it is not 8-bit RGB"""
+        key = (path, tuple(stage_name(step) for step in preprocess))
+        signature = file_signature(path)
+        entry = self.histograms.get(key)
+        if entry is None or entry[0] != signature:
+            img = load_image(path, preprocess)
+            hists = threshold_histograms(img) if img.dtype == np.uint8 and img.ndim == 3 else None
+            entry = self.histograms[key] = (signature, hists)
+        return entry[1]
+
+    ## ----- jobs ----- ##
+    def ratios(self, folders, channel="green", threshold=DEFAULT_THRESHOLD,
+               black_threshold=DEFAULT_BLACK_THRESHOLD, preprocess=(), exclude_failed_qc=True):
+        steps = resolve_preprocess(preprocess)
+        out = {}
+        for folder in folders:
+            rows = []
+            for filename in folder_images(folder):
+                hists = self.image_histograms(os.path.join(folder, filename), steps)
+                if hists is None:
+                    # Not 8-bit: no exact histogram shortcut, go through the store
+                    rows = self.results([folder], channel, threshold, black_threshold,
+                                        preprocess=preprocess, exclude_failed_qc=False)[folder]
+                    break
+                signal, cells = areas_from_histograms(hists, channel, threshold, black_threshold)
+                rows.append({"filename": filename, "signal_area": signal, "cell_area": cells,
+                             "ratio": compute_ratio(signal, cells),
+                             **qc_from_histograms(hists, black_threshold)})
+            out[folder] = apply_qc(rows, exclude_failed_qc, os.path.basename(os.path.normpath(folder)))
+        return out
+
+    def results(self, folders, channel="green", threshold=DEFAULT_THRESHOLD,
+                black_threshold=DEFAULT_BLACK_THRESHOLD, stages=(), preprocess=(),
+                exclude_failed_qc=True):
+        stages = list(stages)
+        if "image_qc" not in stages:
+            stages.append("image_qc")
+        stages, steps = resolve_stages(stages), resolve_preprocess(preprocess)
+        out = {}
+        for folder in folders:
+            rows = condition_results(folder, channel, threshold, black_threshold, stages=stages,
+                                     preprocess=steps, pool=self.pool)
+            out[folder] = apply_qc(rows, exclude_failed_qc, os.path.basename(os.path.normpath(folder)))
+        return out
+
+    def figure(self, groups, output, channel="green", threshold=DEFAULT_THRESHOLD,
+               black_threshold=DEFAULT_BLACK_THRESHOLD, metric="ratio", title="", preprocess=(),
+               exclude_failed_qc=True):
+        folders = [folder for _, folder, _ in groups]
+        if metric == "ratio":
+            rows = self.ratios(folders, channel, threshold, black_threshold, preprocess, exclude_failed_qc)
+        else:
+            rows = self.results(folders, channel, threshold, black_threshold, ("intensity_distribution",),
+                                preprocess, exclude_failed_qc)
+        summary = []
+        fig, ax = plt.subplots(figsize=(max(4, 1.6 * len(groups)), 5))
+        for i, (label, folder, color) in enumerate(groups):
+            values = [row[metric] for row in rows[folder]]
+            mean = float(np.mean(values)) if values else 0.0
+            sem = float(np.std(values, ddof=1) / np.sqrt(len(values))) if len(values) > 1 else 0.0
+            summary.append({"label": label, "n": len(values), "mean": mean, "sem": sem})
+            ax.bar(i, mean, yerr=sem, color=color, capsize=6, edgecolor="black", linewidth=1)
+            ax.scatter(np.full(len(values), i) + np.random.uniform(-0.15, 0.15, len(values)),
+                       values, color="black", s=12, alpha=0.6, zorder=3)
+        ax.set_xticks(range(len(groups)))
+        ax.set_xticklabels([label for label, _, _ in groups])
+        ax.set_ylabel(metric)
+        ax.set_title(title or f"{channel} t={threshold:g} b={black_threshold:g}")
+        fig.savefig(output, dpi=150, bbox_inches="tight")
+        plt.close(fig)
+        return {"output": output, "groups": summary}
+
+    def metadata_rows(self, folder):
+        if folder not in self.metadata:
+            self.metadata[folder] = index_rows(build_index(folder))
+        return self.metadata[folder]
+
+    def status(self):
+        return {"jobs": self.jobs, "histograms": len(self.histograms), "metadata_folders": sorted(self.metadata),
+                "pid": os.getpid()}
+
+    def handle(self, job):
+        self.jobs += 1
+        op = job.pop("op", None)
+        if op == "ratios":
+            return {"results": self.ratios(**job)}
+        if op == "results":
+            return {"results": self.results(**job)}
+        if op == "figure":
+            return self.figure(**job)
+        if op == "metadata":
+            return {"rows": self.metadata_rows(**job)}
+        if op == "status":
+            return self.status()
+        raise ValueError(f"Unknown op '{op}'")
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+## ================= SERVER ================= ##
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                job = json.loads(line)
+                if job.get("op") == "shutdown":
+                    reply = {"ok": True}
+                    self.server.shutdown_requested = True
+                else:
+                    reply = {"ok": True, **self.server.engine.handle(job)}
+            except Exception as error:
+                reply = {"ok": False, "error": f"{type(error).__name__}: {error}"}
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+            self.wfile.flush()
+            if self.server.shutdown_requested:
+                return
+
+def serve(socket_path=DEFAULT_SOCKET, workers=None):
+    """Run the daemon until a shutdown job arrives (jobs are served one at a time)"""
+    if os.path.exists(socket_path):
+        try:
+            request("status", socket_path)
+            raise RuntimeError(f"A daemon is already listening on {socket_path}")
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.remove(socket_path)  # Left over from a daemon that died
+    engine = Engine(workers)
+    server = socketserver.UnixStreamServer(socket_path, _Handler)
+    os.chmod(socket_path, 0o600)
+    server.engine = engine
+    server.shutdown_requested = False
+    print(f"🟢 uptake daemon listening on {socket_path} (pid {os.getpid()})")
+    try:
+        while not server.shutdown_requested:
+            server.handle_request()
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+        engine.close()
+    return 0
+
+## ================= CLIENT ================= ##
+def absolute_paths(params):
+    """
+    A job's folder and output paths resolved against the client's working
+    directory (the daemon's may differ).
+    """
+    params = dict(params)
+    if "folders" in params:
+        params["folders"] = [os.path.abspath(folder) for folder in params["folders"]]
+    if "folder" in params:
+        params["folder"] = os.path.abspath(params["folder"])
+    if "groups" in params:
+        params["groups"] = [[label, os.path.abspath(folder), color] for label, folder, color in params["groups"]]
+    if "output" in params:
+        params["output"] = os.path.abspath(params["output"])
+    if "preprocess" in params:
+        params["preprocess"] = [{**spec, "objective_folder": os.path.abspath(spec["objective_folder"])}
+                                if "objective_folder" in spec else spec for spec in params["preprocess"]]
+    return params
+
+def request(op, socket_path=DEFAULT_SOCKET, **params):
+    """
+    Send one job to a running daemon.
+
+    Returns:
+        the reply dict without "ok"; raises RuntimeError with the daemon's
+        error message when the job failed
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        with sock.makefile("rwb") as stream:
+            stream.write(json.dumps({"op": op, **absolute_paths(params)}).encode() + b"\n")
+            stream.flush()
+            reply = json.loads(stream.readline())
+    if not reply.pop("ok"):
+        raise RuntimeError(reply["error"])
+    return reply
+
+## ================= MAIN ================= ##
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm local analysis daemon and its client.")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_cmd = commands.add_parser("serve", help="run the daemon")
+    serve_cmd.add_argument("--workers", type=int, default=None)
+    for name in ("ratios", "results"):
+        job = commands.add_parser(name, help=f"send a {name} job")
+        job.add_argument("folders", nargs="+", help="condition folders")
+        job.add_argument("--channel", choices=["green", "yellow"], default="green")
+        job.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+        job.add_argument("--black-threshold", type=float, default=DEFAULT_BLACK_THRESHOLD)
+        job.add_argument("--preprocess", nargs="*", default=[], type=json.loads,
+                         help='preprocessing step specs, e.g. \'{"step": "background", "radius": 50}\'')
+        job.add_argument("--keep-failed-qc", action="store_true", help="keep fields that fail image QC")
+        if name == "results":
+            job.add_argument("--stages", nargs="*", default=[], choices=sorted(STAGES))
+    commands.add_parser("status", help="show what the daemon holds")
+    commands.add_parser("shutdown", help="stop the daemon")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        return serve(args.socket, args.workers)
+    if args.command in ("status", "shutdown"):
+        print(json.dumps(request(args.command, args.socket), indent=1))
+        return 0
+
+    params = {"folders": args.folders, "channel": args.channel, "threshold": args.threshold,
+              "black_threshold": args.black_threshold, "preprocess": args.preprocess,
+              "exclude_failed_qc": not args.keep_failed_qc}
+    if args.command == "results":
+        params["stages"] = args.stages
+    results = request(args.command, args.socket, **params)["results"]
+    print(f"\n{'Condition':<25}{'n':>5}{'Mean Ratio':>14}{'SEM':>12}")
+    print("-" * 56)
+    for folder, rows in results.items():
+        ratios = [row["ratio"] for row in rows]
+        mean = np.mean(ratios) if ratios else 0.0
+        sem = np.std(ratios, ddof=1) / np.sqrt(len(ratios)) if len(ratios) > 1 else 0.0
+        print(f"{os.path.basename(os.path.normpath(folder)):<25}{len(rows):>5}{mean:>14.4f}{sem:>12.4f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
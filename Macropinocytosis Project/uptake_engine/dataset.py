@@ -0,0 +1,250 @@
+"""
+Per-experiment dataset manifest: every image with its size, mtime and hash.
+
+Listing condition folders (os.path.exists + os.listdir per group, per run)
+is slow on networked storage, and a folder that disappears is silently
+skipped. The manifest lists every image of an experiment once:
+
+    <experiment>/.uptake_cache/dataset/manifest.json
+    {"folders": {"<condition folder>": {"mtime_ns": ..., "files": {
+        "<filename>": {"size": ..., "mtime_ns": ..., "hash": "<blake2b-128>"}}}}}
+
+An image whose TIFF was retired into its archive (see archive.py) keeps
+its entry: size and mtime are then the archive's, the hash is still the
+TIFF's.
+
+Hashes are computed in a thread pool (hashlib releases the GIL while
+hashing, so threads overlap reads and hashing without pickling anything).
+
+folder_images is what the engine uses instead of os.listdir: it costs one
+JSON read per experiment and process, plus one stat of the condition folder
+to check that no file was added or removed since the manifest was written
+(if one was, it falls back to listing that folder). The folder's
+.uptake_cache is created before its mtime is recorded, so the caches that
+results, masks or pyramids later write into it do not count as a change.
+
+update_manifest re-hashes only files whose size or mtime changed, and its
+report says which images were added, modified (new content), touched (new
+mtime, same content) or are missing. It then records the new state, except
+in verify mode (save=False, --verify), which only reports: the manifest
+stays the baseline, so a modified or deleted image fails every later
+--verify until the manifest is rebuilt on purpose.
+
+Usage (from the "Macropinocytosis Project" folder):
+    python -m uptake_engine.dataset "2026-01-15 Macropinocytosis KO Lines FITC Assay"
+    python -m uptake_engine.dataset "2026-01-15 ..." --verify   # exit 1 if images changed or vanished
+"""
+import os
+import sys
+import json
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from .engine import list_images, image_file
+from .tiles import archive_source_hash
+from .cache import cache_dir, walk_image_folders, CACHE_DIRNAME
+
+## ================= CONFIGURATION ================= ##
+DATASET_KIND = "dataset"
+HASH_DIGEST_SIZE = 16         # blake2b digest bytes (32 hex characters)
+HASH_BLOCK = 1 << 20          # Bytes read per update
+PARALLEL_MIN_FILES = 8        # Below this, hashing in-thread beats starting a pool
+
+## ================= HASHING ================= ##
+def file_hash(path):
+    """blake2b digest of a file's content, as hex"""
+    digest = hashlib.blake2b(digest_size=HASH_DIGEST_SIZE)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def content_hash(image_path):
+    """
+    Hash of an image's TIFF; for a TIFF retired into its archive (see
+    archive.py), the hash the archive recorded of it.
+    """
+    source = image_file(image_path)
+    return file_hash(image_path) if source == image_path else archive_source_hash(source)
+
+def _hash_all(paths, workers=None):
+    if workers == 1 or len(paths) < PARALLEL_MIN_FILES:
+        return list(map(content_hash, paths))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(content_hash, paths))
+
+## ================= MANIFEST ================= ##
+def manifest_path(base_folder):
+    return os.path.join(cache_dir(base_folder, DATASET_KIND), "manifest.json")
+
+def load_manifest(base_folder):
+    """Stored manifest of an experiment (None when it has none)"""
+    path = manifest_path(base_folder)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def save_manifest(base_folder, manifest):
+    path = manifest_path(base_folder)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, path)
+
+def update_manifest(base_folder, workers=None, rehash=False, save=True):
+    """
+    Create, update or verify the manifest of an experiment, hashing only
+    images that are new or whose size/mtime changed.
+
+    Parameters:
+    - base_folder: experiment folder
+    - workers: threads used for hashing (None = executor default)
+    - rehash: hash every image again (full integrity check)
+    - save: record the new state; False only compares against the manifest
+      (verify mode) and writes nothing
+
+    Returns:
+        report dict: added, modified, touched, missing (lists of paths
+        relative to base_folder) and unchanged (count)
+    """
+    old = (load_manifest(base_folder) or {"folders": {}})["folders"]
+    report = {"added": [], "modified": [], "touched": [], "missing": [], "unchanged": 0}
+
+    folders, to_hash = {}, []
+    for folder, filenames in walk_image_folders(base_folder):
+        rel = os.path.relpath(folder, base_folder)
+        known = old.get(rel, {}).get("files", {})
+        files = {}
+        for filename in filenames:
+            stat = os.stat(image_file(os.path.join(folder, filename)))
+            entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": None}
+            previous = known.get(filename)
+            if (not rehash and previous is not None
+                    and (previous["size"], previous["mtime_ns"]) == (entry["size"], entry["mtime_ns"])):
+                entry["hash"] = previous["hash"]
+                report["unchanged"] += 1
+            else:
+                to_hash.append((rel, filename, previous))
+            files[filename] = entry
+        if save:
+            try:
+                # Creating it later would change the folder mtime recorded here
+                os.makedirs(os.path.join(folder, CACHE_DIRNAME), exist_ok=True)
+            except OSError:
+                pass  # Read-only storage: nothing will be cached there either
+        folders[rel] = {"mtime_ns": os.stat(folder).st_mtime_ns, "files": files}
+
+    hashes = _hash_all([os.path.join(base_folder, rel, f) for rel, f, _ in to_hash], workers)
+    for (rel, filename, previous), digest in zip(to_hash, hashes):
+        folders[rel]["files"][filename]["hash"] = digest
+        key = os.path.join(rel, filename)
+        if previous is None:
+            report["added"].append(key)
+        elif previous["hash"] != digest:
+            report["modified"].append(key)
+        elif (previous["size"], previous["mtime_ns"]) != tuple(
+                folders[rel]["files"][filename][k] for k in ("size", "mtime_ns")):
+            report["touched"].append(key)
+        else:
+            report["unchanged"] += 1
+
+    for rel, folder in old.items():
+        for filename in folder["files"]:
+            if filename not in folders.get(rel, {}).get("files", {}):
+                report["missing"].append(os.path.join(rel, filename))
+
+    if save:
+        save_manifest(base_folder, {"folders": folders})
+        _loaded.pop(os.path.abspath(manifest_path(base_folder)), None)
+    return report
+
+## ================= ENGINE LOOKUP ================= ##
+_loaded = {}  # manifest path -> (mtime_ns, manifest), per process
+
+def find_manifest(folder_path):
+    """
+    Nearest manifest above a condition folder.
+
+    Returns:
+        (experiment folder, manifest) or (None, None)
+    """
+    folder = os.path.abspath(folder_path)
+    while True:
+        path = manifest_path(folder)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            parent = os.path.dirname(folder)
+            if parent == folder:
+                return None, None
+            folder = parent
+            continue
+        cached = _loaded.get(path)
+        if cached is None or cached[0] != mtime:
+            with open(path) as f:
+                cached = _loaded[path] = (mtime, json.load(f))
+        return folder, cached[1]
+
+def folder_images(folder_path):
+    """
+    Sorted image filenames of a condition folder, from the experiment's
+    manifest when it covers the folder and the folder is unchanged since,
+    otherwise from a directory listing (see engine.list_images).
+    """
+    base, manifest = find_manifest(folder_path)
+    if manifest is not None:
+        entry = manifest["folders"].get(os.path.relpath(os.path.abspath(folder_path), base))
+        if entry is not None:
+            try:
+                mtime = os.stat(folder_path).st_mtime_ns
+            except FileNotFoundError:
+                print(f"⚠️  {folder_path}: listed in the dataset manifest but missing")
+                return []
+            if mtime == entry["mtime_ns"]:
+                return sorted(entry["files"])
+    return list_images(folder_path)
+
+def recorded_hash(image_path):
+    """
+    Content hash of an image: the manifest's when its entry matches the
+    file's size and mtime, otherwise computed (see content_hash).
+    """
+    base, manifest = find_manifest(os.path.dirname(image_path))
+    if manifest is not None:
+        rel = os.path.relpath(os.path.dirname(os.path.abspath(image_path)), base)
+        entry = manifest["folders"].get(rel, {}).get("files", {}).get(os.path.basename(image_path))
+        stat = os.stat(image_file(image_path))
+        if entry is not None and (entry["size"], entry["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            return entry["hash"]
+    return content_hash(image_path)
+
+## ================= MAIN ================= ##
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or verify the image manifest of experiments.")
+    parser.add_argument("folders", nargs="+", help="experiment folders")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--rehash", action="store_true", help="hash every image, not only changed ones")
+    parser.add_argument("--verify", action="store_true",
+                        help="only compare against the manifest (never written) and exit with "
+                             "status 1 if recorded images were modified or are missing")
+    args = parser.parse_args(argv)
+
+    status = 0
+    for folder in args.folders:
+        report = update_manifest(folder, args.workers, args.rehash, save=not args.verify)
+        print(f"\n{folder}")
+        print(f"  {report['unchanged']} unchanged, {len(report['added'])} added, "
+              f"{len(report['modified'])} modified, {len(report['touched'])} touched, "
+              f"{len(report['missing'])} missing")
+        for kind in ("modified", "missing"):
+            for path in report[kind]:
+                print(f"  ⚠️  {kind}: {path}")
+        if args.verify and (report["modified"] or report["missing"]):
+            status = 1
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
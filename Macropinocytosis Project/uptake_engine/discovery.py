@@ -0,0 +1,213 @@
+"""
+Auto-discovery of experiments, magnifications and conditions.
+
+The analysis scripts hard-code their groups as (label, folder, color) tuples,
+and several point at folders that do not exist or hold no images (e.g.
+"SF188 WT" and "Pancreatic 8988T" in run-63x-analysis.py, the Dose_Response
+path of groups_exp2). This module scans the project tree once and records,
+per condition folder:
+
+- experiment: top-level folder (e.g. "2026-01-15 Macropinocytosis KO Lines FITC Assay")
+- magnification: from the folder names (e.g. "63x")
+- condition: folder name without the magnification ("PELP1 63x" -> "PELP1")
+- files: the TIFF images it holds
+- positions / acquisitions: Leica TextDescriptions and the acquisition
+  condition names parsed from the XML file names of its MetaData folder,
+  so folders that only hold metadata are listed too
+
+The manifest is cached in <root>/.uptake_cache/discovery/manifest.json with
+the mtime of every directory it saw; it is rebuilt only when one of them
+changes (adding or removing a file or folder changes its parent's mtime).
+
+Usage (from the "Macropinocytosis Project" folder):
+    python -m uptake_engine.discovery .
+"""
+import os
+import re
+import sys
+import json
+import argparse
+
+from .engine import image_filenames
+from .cache import cache_dir, CACHE_DIRNAME
+from .metadata import build_index, index_rows, position_key
+from .units import magnification_from_path, condition_label
+
+## ================= CONFIGURATION ================= ##
+DISCOVERY_KIND = "discovery"
+METADATA_DIRNAME = "MetaData"
+MAGNIFICATION_TOKEN = re.compile(r"^\d+(?:\.\d*)?x$", re.IGNORECASE)   # "63x", and the "63.x" export typo
+
+## ================= SCAN ================= ##
+def acquisition_condition(position):
+    """
+    Condition named in a Leica position key, e.g.
+    "SF188WT and Ras Mutant 63x_Lung HS1299T_63x_Pos013_ICC" -> "Lung HS1299T"
+    (project before the first "_", magnification and PosNNN at the end).
+    """
+    parts = position.split("_")
+    while parts and (parts[-1] == "ICC" or parts[-1].startswith("Pos")):
+        parts.pop()
+    if parts and MAGNIFICATION_TOKEN.match(parts[-1]):
+        parts.pop()
+    return "_".join(parts[1:]) or position
+
+def scan_project(root):
+    """
+    Walk a project tree once.
+
+    Returns:
+        (conditions, dir_mtimes): condition entries sorted by folder, and the
+        mtime of every directory visited (relative path -> ns)
+    """
+    entries = {}
+    dir_mtimes = {}
+    for folder, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d != CACHE_DIRNAME)
+        rel = os.path.relpath(folder, root)
+        dir_mtimes[rel] = os.stat(folder).st_mtime_ns
+        images = image_filenames(filenames)
+        is_metadata = os.path.basename(folder) == METADATA_DIRNAME
+        if not images and not is_metadata:
+            continue
+        # Metadata describes the condition folder it sits in
+        condition_rel = os.path.dirname(rel) if is_metadata else rel
+        if condition_rel in ("", "."):
+            continue
+        entry = entries.setdefault(condition_rel, {
+            "experiment": condition_rel.split(os.sep)[0],
+            "magnification": None,
+            "condition": condition_label(condition_rel),
+            "folder": condition_rel,
+            "files": [],
+            "positions": [],
+            "acquisitions": [],
+        })
+        magnification = magnification_from_path(condition_rel)
+        if magnification is not None:
+            entry["magnification"] = f"{magnification:g}x"
+        if images:
+            entry["files"] = images
+        if is_metadata:
+            rows = index_rows(build_index(folder, workers=1))
+            entry["positions"] = sorted(r["image"] or position_key(os.path.basename(r["xml"])) for r in rows)
+            entry["acquisitions"] = sorted(set(acquisition_condition(r["position"]) for r in rows))
+            if entry["magnification"] is None and rows and rows[0]["magnification"]:
+                entry["magnification"] = f"{rows[0]['magnification']:g}x"
+    return [entries[k] for k in sorted(entries)], dir_mtimes
+
+## ================= MANIFEST ================= ##
+def manifest_path(root):
+    return os.path.join(cache_dir(root, DISCOVERY_KIND), "manifest.json")
+
+def _is_current(cached, root):
+    for rel, mtime in cached["dir_mtimes"].items():
+        try:
+            if os.stat(os.path.join(root, rel)).st_mtime_ns != mtime:
+                return False
+        except FileNotFoundError:
+            return False
+    return True
+
+def discover(root, force=False):
+    """
+    Manifest of every condition folder under a project root, rescanned only
+    when a directory changed.
+
+    Returns:
+        {"root": root, "conditions": [entry, ...]} (see module docstring)
+    """
+    path = manifest_path(root)
+    if not force and os.path.exists(path):
+        with open(path) as f:
+            cached = json.load(f)
+        if _is_current(cached, root):
+            return {"root": root, "conditions": cached["conditions"]}
+    conditions, dir_mtimes = scan_project(root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"conditions": conditions, "dir_mtimes": dir_mtimes}, f, indent=1)
+    os.replace(tmp, path)
+    return {"root": root, "conditions": conditions}
+
+def select(manifest, experiment=None, magnification=None, condition=None, with_images=True):
+    """Entries matching every given field (experiment may be a prefix, e.g. "2026-01-15")"""
+    return [c for c in manifest["conditions"]
+            if (experiment is None or c["experiment"].startswith(experiment))
+            and (magnification is None or c["magnification"] == magnification)
+            and (condition is None or c["condition"] == condition)
+            and (not with_images or c["files"])]
+
+def condition_folder(manifest, entry):
+    return os.path.join(manifest["root"], entry["folder"])
+
+def manifest_groups(manifest, experiment, magnification, colors=None, order=None):
+    """
+    Groups of one experiment and magnification, defined from the manifest
+    rather than written out by hand.
+
+    Parameters:
+    - colors: {condition: color} (conditions not listed get the matplotlib cycle)
+    - order: conditions to put first, e.g. the control
+
+    Returns:
+        (base_folder, [(label, folder_name, color), ...]) in the form
+        analyze_experiment takes
+    """
+    entries = select(manifest, experiment, magnification)
+    if not entries:
+        return None, []
+    rank = {label: i for i, label in enumerate(order or ())}
+    entries.sort(key=lambda c: (rank.get(c["condition"], len(rank)), c["condition"]))
+    colors = colors or {}
+    groups = [(c["condition"], os.path.basename(c["folder"]), colors.get(c["condition"], f"C{i}"))
+              for i, c in enumerate(entries)]
+    return os.path.dirname(condition_folder(manifest, entries[0])), groups
+
+def check_groups(manifest, base_folder, groups):
+    """
+    Report configured (label, folder, color) groups that have no images in
+    the manifest, and image folders under base_folder that no group uses.
+
+    Returns:
+        list of labels of groups without images
+    """
+    base = os.path.abspath(base_folder)
+    entries = {os.path.abspath(condition_folder(manifest, c)): c for c in manifest["conditions"]
+               if os.path.abspath(condition_folder(manifest, c)).startswith(base + os.sep)}
+    used = set()
+    missing = []
+    for label, folder, _ in groups:
+        path = os.path.abspath(os.path.join(base_folder, folder))
+        used.add(path)
+        entry = entries.get(path)
+        if entry is None or not entry["files"]:
+            detail = "metadata only" if entry and entry["positions"] else "no folder"
+            print(f"⚠️  {label}: no images for '{folder}' ({detail})")
+            missing.append(label)
+    for path, entry in sorted(entries.items()):
+        if entry["files"] and path not in used:
+            print(f"💡 Unused condition with images: {entry['folder']} ({len(entry['files'])} images)")
+    return missing
+
+## ================= MAIN ================= ##
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Discover experiments, magnifications and conditions.")
+    parser.add_argument("root", help="project folder")
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args(argv)
+
+    manifest = discover(args.root, args.force)
+    experiment = None
+    for entry in manifest["conditions"]:
+        if entry["experiment"] != experiment:
+            experiment = entry["experiment"]
+            print(f"\n{experiment}")
+        acquisitions = f"  [{', '.join(entry['acquisitions'])}]" if entry["acquisitions"] else ""
+        print(f"  {entry['magnification'] or '?':>5}  {entry['condition']:<25}"
+              f"{len(entry['files']):>4} images{len(entry['positions']):>4} positions{acquisitions}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+import os
+import matplotlib.image as mpimg
+
+from .metrics import compute_ratio
+from .kernels import fused_masks
+from .tiles import ARCHIVE_SUFFIX, archive_path, read_archive
+
+## ================= CONFIGURATION ================= ##
+DEFAULT_THRESHOLD = 50        # Green (FITC) or yellow (TMR) signal threshold
+DEFAULT_BLACK_THRESHOLD = 50  # Background threshold
+IMAGE_EXTENSIONS = ('.tif', '.tiff')
+
+## ================= IMAGE I/O ================= ##
+def image_filenames(filenames, extensions=IMAGE_EXTENSIONS):
+    """
+    Sorted image names among a folder's filenames: its TIFFs, plus TIFFs that
+    were retired into their archive (see archive.py), under the TIFF's name.
+    """
+    names = set()
+    for f in filenames:
+        if f.endswith(ARCHIVE_SUFFIX):
+            f = f[:-len(ARCHIVE_SUFFIX)]
+        if f.lower().endswith(extensions):
+            names.add(f)
+    return sorted(names)
+
+def list_images(folder_path):
+    """Sorted list of image filenames in a condition folder ([] if missing)"""
+    if not os.path.exists(folder_path):
+        return []
+    return image_filenames(os.listdir(folder_path))
+
+def image_file(path):
+    """File an image is stored in: its TIFF, or its archive once the TIFF was retired"""
+    archive = archive_path(path)
+    if not os.path.exists(path) and os.path.exists(archive):
+        return archive
+    return path
+
+def load_image(path, preprocess=()):
+    """
+    Decode a single image into an (H, W, C) array.
+
+    Parameters:
+    - path: image file (a retired TIFF is read from its archive)
+    - preprocess: optional steps step(img) -> img applied right after
+      decoding, in order (e.g. background subtraction)
+    """
+    source = image_file(path)
+    img = mpimg.imread(path) if source == path else read_archive(source)
+    for step in preprocess:
+        img = step(img)
+    return img
+
+## ================= ANALYSIS ================= ##
+def analyze_image(img, channel="green", threshold=DEFAULT_THRESHOLD,
+                  black_threshold=DEFAULT_BLACK_THRESHOLD, stages=(), path=None, preprocess=()):
+    """
+    Compute the whole-field uptake metrics for one decoded image.
+
+    Parameters:
+    - img: decoded (H, W, C) image
+    - channel / threshold / black_threshold: same as analyze_condition
+    - stages: optional extra analysis stages run in the same pass. Each stage
+      is a module-level function stage(img, context) returning a dict of
+      extra fields; context holds the thresholds and the signal/cell masks
+      so stages never recompute them, and a stage may add entries to it for
+      the stages after it.
+    - path: file the image was decoded from, passed to stages as
+      context["path"] (e.g. for per-image exports); None for in-memory images
+    - preprocess: steps the image was preprocessed with (see load_image),
+      passed to stages as context["preprocess"] so per-image exports can be
+      keyed by them like the result store
+
+    Returns:
+        dict with signal_area, cell_area and ratio (plus any stage fields)
+    """
+    signal, cells, signal_area, cell_area = fused_masks(img, channel, threshold, black_threshold)
+    result = {
+        "signal_area": signal_area,
+        "cell_area": cell_area,
+        "ratio": compute_ratio(signal_area, cell_area),
+    }
+    context = {
+        "channel": channel,
+        "threshold": threshold,
+        "black_threshold": black_threshold,
+        "signal_mask": signal,
+        "cell_mask": cells,
+        "path": path,
+        "preprocess": preprocess,
+    }
+    for stage in stages:
+        result.update(stage(img, context))
+    return result
+
+def stage_name(stage):
+    """
+    Name a stage or preprocessing step is recorded under in the result store:
+    its `name` attribute if it has one (configurable steps), else the
+    function name.
+    """
+    return getattr(stage, "name", None) or stage.__name__
+
+def analyze_condition(folder_path, channel="green", threshold=DEFAULT_THRESHOLD,
+                      black_threshold=DEFAULT_BLACK_THRESHOLD, preprocess=()):
+    """
+    Analyze all TIFF images in a folder and compute signal/cell area ratios.
+
+    Parameters:
+    - folder_path: condition folder containing the TIFF images
+    - channel: "green" (FITC) or "yellow" (TMR)
+    - threshold: signal threshold for the chosen channel
+    - black_threshold: background threshold for the cell area
+    - preprocess: optional preprocessing steps (see load_image)
+
+    Returns:
+        ratios: list of signal_area/total_cell_area for each image
+        signal_areas: list of signal pixel counts
+        cell_areas: list of total cell pixel counts
+    """
+    ratios = []
+    signal_areas = []
+    cell_areas = []
+
+    if not os.path.exists(folder_path):
+        print(f"⚠️  Missing folder: {folder_path}")
+        return ratios, signal_areas, cell_areas
+
+    for filename in list_images(folder_path):
+        img = load_image(os.path.join(folder_path, filename), preprocess)
+        result = analyze_image(img, channel, threshold, black_threshold)
+
+        ratios.append(result["ratio"])
+        signal_areas.append(result["signal_area"])
+        cell_areas.append(result["cell_area"])
+
+    return ratios, signal_areas, cell_areas
@@ -0,0 +1,272 @@
+"""
+Flat-field and dark-frame correction per objective.
+
+Vignetting at 10x and 20x makes the field centre brighter than its corners,
+which biases thresholded areas toward the centre. This module estimates a
+per-channel illumination profile for one magnification folder, either from
+reference flat (and optional dark) frames or from the session's own images:
+averaged over many fields, the randomly placed cells wash out and the
+illumination profile remains. The estimate is computed on pyramid level 3
+(cached thumbnails are read when available), smoothed, normalised to a mean
+of 1 and cached in the folder's .uptake_cache/flatfield.
+
+FlatFieldCorrection is the matching preprocessing step: it expands the
+cached field to a full-resolution gain once per process and then corrects
+each image with a single fused subtract-multiply.
+
+Usage (from the "Macropinocytosis Project" folder):
+    python -m uptake_engine.flatfield "2026-01-15 Macropinocytosis KO Lines FITC Assay/10x"
+    analyze_condition(folder, preprocess=(FlatFieldCorrection(".../10x"),))
+"""
+import os
+import sys
+import hashlib
+import argparse
+import numpy as np
+from scipy import ndimage
+
+from .engine import load_image, image_file
+from .cache import cache_dir, walk_image_folders
+from .pyramid import load_level
+from .background import bilinear_upsample
+
+## ================= CONFIGURATION ================= ##
+FLATFIELD_KIND = "flatfield"
+FLATFIELD_LEVEL = 3          # Pyramid level the profile is estimated at (1/8 resolution)
+FLATFIELD_SMOOTHING = 8.0    # Gaussian sigma at that level; vignetting is very smooth
+MIN_GAIN, MAX_GAIN = 0.5, 2.0
+MIN_PROFILE_SIGNAL = 1.0     # Mean intensity below which a channel is left uncorrected
+
+## ================= ESTIMATION ================= ##
+def normalize_profile(profile):
+    """Smooth a coarse (h, w, C) profile and scale each channel to mean 1"""
+    profile = ndimage.gaussian_filter(profile.astype(np.float32),
+                                      sigma=(FLATFIELD_SMOOTHING, FLATFIELD_SMOOTHING, 0),
+                                      mode="nearest")
+    means = profile.mean(axis=(0, 1))
+    flat = np.ones_like(profile)
+    for c, mean in enumerate(means):
+        if mean >= MIN_PROFILE_SIGNAL:
+            flat[..., c] = profile[..., c] / mean
+    return flat
+
+def estimate_flat_field(image_paths, statistic="mean", level=FLATFIELD_LEVEL):
+    """
+    Illumination profile of a session from its own images.
+
+    Parameters:
+    - image_paths: images taken with the same objective
+    - statistic: "mean" (robust to sparse cells) or "median" (for fields
+      with a bright, uniform background)
+    - level: pyramid level the images are read at
+
+    Returns:
+        coarse (h, w, C) float32 profile with mean 1 per channel
+    """
+    stack = np.stack([np.asarray(load_level(p, level), dtype=np.float32)[..., :3] for p in image_paths])
+    profile = np.median(stack, axis=0) if statistic == "median" else stack.mean(axis=0)
+    return normalize_profile(profile)
+
+def reference_flat_field(flat_paths, dark_paths=(), level=FLATFIELD_LEVEL):
+    """
+    Profile and dark frame from reference acquisitions.
+
+    Returns:
+        (coarse profile with mean 1 per channel, full-resolution mean dark
+        frame as float32 or None)
+    """
+    dark = None
+    if dark_paths:
+        dark = np.mean([load_image(p)[..., :3].astype(np.float32) for p in dark_paths], axis=0)
+    flats = []
+    for p in flat_paths:
+        img = load_image(p)[..., :3].astype(np.float32)
+        if dark is not None:
+            img = np.clip(img - dark, 0, None)
+        for _ in range(level):
+            img = img[:img.shape[0] // 2 * 2, :img.shape[1] // 2 * 2]
+            img = (img[0::2, 0::2] + img[1::2, 0::2] + img[0::2, 1::2] + img[1::2, 1::2]) / 4
+        flats.append(img)
+    return normalize_profile(np.mean(flats, axis=0)), dark
+
+## ================= CACHE ================= ##
+def flat_field_path(objective_folder):
+    """Cached field of one magnification folder (e.g. ".../10x")"""
+    return os.path.join(cache_dir(objective_folder, FLATFIELD_KIND), "flatfield.npz")
+
+def stored_method(path):
+    """How a cached field was built: "mean", "median" or "reference" (None if unknown)"""
+    with np.load(path) as data:
+        return str(data["method"]) if "method" in data.files else None
+
+def build_flat_field(objective_folder, flat_paths=(), dark_paths=(), statistic=None, force=False):
+    """
+    Estimate and cache the field of a magnification folder, unless a cache
+    newer than every image in it, built the requested way, already exists.
+
+    Parameters:
+    - flat_paths / dark_paths: reference frames (see reference_flat_field)
+    - statistic: "mean" or "median" for a field estimated from the session's
+      own images (see estimate_flat_field); None accepts whatever field is
+      cached and estimates with "mean" when there is none
+
+    Returns:
+        path of the cached field
+    """
+    path = flat_field_path(objective_folder)
+    image_paths = [os.path.join(folder, f)
+                   for folder, filenames in walk_image_folders(objective_folder)
+                   for f in filenames]
+    sources = list(image_paths) + list(flat_paths) + list(dark_paths)
+    method = "reference" if flat_paths else statistic
+    if (not force and os.path.exists(path) and sources
+            and os.path.getmtime(path) >= max(os.path.getmtime(image_file(p)) for p in sources)
+            and method in (None, stored_method(path))):
+        return path
+
+    if flat_paths:
+        profile, dark = reference_flat_field(flat_paths, dark_paths)
+    else:
+        method = statistic or "mean"
+        profile, dark = estimate_flat_field(image_paths, method), None
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fields = {"profile": profile, "method": np.array(method)}
+    if dark is not None:
+        fields["dark"] = dark
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, **fields)
+    os.replace(tmp, path)
+    return path
+
+## ================= PREPROCESSING STEP ================= ##
+class FlatFieldCorrection:
+    """
+    Preprocessing step: (img - dark) * gain, gain = 1 / profile.
+
+    8-bit images without a dark frame take an integer fast path (gain in Q7
+    fixed point, one uint16 multiply-shift); channels whose profile is flat
+    are not touched.
+
+    The full-resolution gain is built lazily on first use and is not pickled,
+    so handing the step to worker processes only ships the folder path.
+
+    The step's name (which keys the result store) carries a digest of the
+    field, so results computed with a re-estimated or replaced field are
+    stored separately instead of being served from the old ones. Once known,
+    the digest is only recomputed when the stored field file changes, so
+    reading the name does not walk the objective folder every time.
+    """
+    def __init__(self, objective_folder):
+        self.objective_folder = objective_folder
+        self._fields = None
+        self._signature = None
+        self._digest = None
+        self._gain = None
+        self._gain_q7 = None
+        self._channels = None
+
+    @property
+    def name(self):
+        if self._digest is not None:
+            try:
+                stat = os.stat(flat_field_path(self.objective_folder))
+            except FileNotFoundError:
+                stat = None
+            if stat is not None and (stat.st_size, stat.st_mtime_ns) == self._signature:
+                return f"ff{self._digest}"
+        self._load_fields(refresh=True)
+        return f"ff{self._digest}"
+
+    def __getstate__(self):
+        return {"objective_folder": self.objective_folder}
+
+    def __setstate__(self, state):
+        self.__init__(state["objective_folder"])
+
+    def _load_fields(self, refresh=False):
+        """
+        Read the cached field (building it when needed). With refresh, the
+        cache is checked again and re-read when it changed since the last load.
+        """
+        if self._fields is not None and not refresh:
+            return
+        path = build_flat_field(self.objective_folder)
+        stat = os.stat(path)
+        if (stat.st_size, stat.st_mtime_ns) == self._signature:
+            return
+        with np.load(path) as data:
+            self._fields = {key: data[key] for key in data.files if key != "method"}
+        digest = hashlib.blake2b(digest_size=4)
+        for key in sorted(self._fields):
+            digest.update(key.encode())
+            digest.update(np.ascontiguousarray(self._fields[key]).tobytes())
+        self._signature = (stat.st_size, stat.st_mtime_ns)
+        self._digest = digest.hexdigest()
+        self._gain = None
+
+    def _load(self, shape):
+        self._load_fields()
+        if self._gain is None or self._gain.shape[:2] != shape[:2]:
+            profile = self._fields["profile"]
+            self._channels = [c for c in range(profile.shape[-1])
+                              if not np.all(profile[..., c] == 1) or "dark" in self._fields]
+            gain = np.clip(1.0 / np.maximum(bilinear_upsample(profile[..., self._channels], shape[:2]), 1e-6),
+                           MIN_GAIN, MAX_GAIN)
+            self._gain = np.ascontiguousarray(gain, dtype=np.float32)
+            # Q7 fixed point: 255 * 256 + 64 still fits in uint16
+            self._gain_q7 = np.ascontiguousarray(np.rint(gain * 128), dtype=np.uint16)
+            if self._channels == list(range(profile.shape[-1])):
+                self._channels = slice(0, profile.shape[-1])
+        return self._gain, self._fields.get("dark")
+
+    def __call__(self, img):
+        gain, dark = self._load(img.shape)
+        if self._channels == []:
+            return img
+        out = img.copy()
+        if dark is None and img.dtype == np.uint8:
+            corrected = img[..., self._channels].astype(np.uint16)
+            corrected *= self._gain_q7
+            corrected += 64
+            corrected >>= 7
+            np.minimum(corrected, np.uint16(255), out=corrected)
+            out[..., self._channels] = corrected
+            return out
+        corrected = img[..., self._channels].astype(np.float32)
+        if dark is not None:
+            corrected -= dark[..., self._channels]
+        corrected *= gain
+        if np.issubdtype(img.dtype, np.integer):
+            np.clip(corrected, 0, np.iinfo(img.dtype).max, out=corrected)
+            np.rint(corrected, out=corrected)
+        else:
+            np.clip(corrected, 0, None, out=corrected)
+        out[..., self._channels] = corrected
+        return out
+
+## ================= MAIN ================= ##
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estimate and cache a per-objective flat field.")
+    parser.add_argument("folders", nargs="+", help="magnification folders (e.g. .../10x)")
+    parser.add_argument("--flat", nargs="*", default=(), help="reference flat frames")
+    parser.add_argument("--dark", nargs="*", default=(), help="reference dark frames")
+    parser.add_argument("--statistic", choices=["mean", "median"], default="mean",
+                        help="how to estimate the field from the folder's own images")
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args(argv)
+
+    for folder in args.folders:
+        path = build_flat_field(folder, args.flat, args.dark, args.statistic, args.force)
+        with np.load(path) as data:
+            profile = data["profile"]
+        h, w = profile.shape[:2]
+        ch, cw = h // 6, w // 6
+        centre = profile[h // 3:2 * h // 3, w // 3:2 * w // 3].mean(axis=(0, 1))
+        corners = np.mean([profile[:ch, :cw], profile[:ch, -cw:],
+                           profile[-ch:, :cw], profile[-ch:, -cw:]], axis=(0, 1, 2))
+        falloff = ", ".join(f"{c:.2f}" for c in corners / centre)
+        print(f"💾 {folder}: corner/centre intensity per channel (R, G, B) = {falloff}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+Multi-page, Z-stack and time-lapse TIFF support.
+
+load_image (mpimg.imread) only ever sees the first page of a TIFF. This
+module streams the pages of multi-page / OME-TIFFs with PIL one at a time,
+so memory stays at one page plus one accumulator however long the series:
+
+- grayscale pages (one channel per file, as Leica exports them per channel)
+  are placed into an RGB frame at the channel their metadata LUT names
+  (metadata.image_metadata), green when it names none, so every stage sees
+  the (H, W, 3) layout of the RGB exports
+- pages are grouped into timepoints of z_slices consecutive pages (the
+  Leica export order is Z fastest, then T)
+- each timepoint is reduced to a running maximum-intensity projection over Z
+- every projected timepoint goes through analyze_image, so all stages work
+  per timepoint
+
+condition_timecourse aggregates the per-timepoint rows of a condition, which
+lets the 18-hour FITC assay be read as a time course when it is exported as
+a series. Single-page TIFFs are a one-timepoint series.
+
+Usage (from the "Macropinocytosis Project" folder):
+    python -m uptake_engine.frames "<condition folder>" --z-slices 5 --interval 0.5
+"""
+import os
+import sys
+import argparse
+import numpy as np
+from PIL import Image, ImageSequence
+
+from .engine import DEFAULT_THRESHOLD, DEFAULT_BLACK_THRESHOLD, analyze_image, load_image
+from .dataset import folder_images
+from .metadata import image_metadata
+
+## ================= CONFIGURATION ================= ##
+LUT_CHANNELS = {"red": 0, "green": 1, "blue": 2}   # Leica LUT name -> RGB channel
+GRAYSCALE_CHANNEL = 1         # Green (FITC) when the metadata names no single RGB channel
+
+## ================= FRAME STREAMING ================= ##
+def frame_count(path):
+    """Number of pages in a TIFF (1 for a TIFF retired into its archive, see archive.py)"""
+    if not os.path.exists(path):
+        return 1
+    with Image.open(path) as im:
+        return getattr(im, "n_frames", 1)
+
+def plane_channel(path):
+    """RGB channel a grayscale image's plane belongs to, from its metadata LUT"""
+    row = image_metadata(path)
+    luts = row["channels"].split(",") if row and row["channels"] else []
+    if len(luts) == 1 and luts[0].strip().lower() in LUT_CHANNELS:
+        return LUT_CHANNELS[luts[0].strip().lower()]
+    return GRAYSCALE_CHANNEL
+
+def as_rgb(frame, channel=GRAYSCALE_CHANNEL):
+    """(H, W, C) frames unchanged; a 2D plane into channel of a zero RGB frame"""
+    if frame.ndim == 3:
+        return frame
+    rgb = np.zeros(frame.shape + (3,), dtype=frame.dtype)
+    rgb[..., channel] = frame
+    return rgb
+
+def iter_frames(path):
+    """Yield the pages of a TIFF one at a time as (H, W, C) arrays (see as_rgb)"""
+    channel = None
+    if not os.path.exists(path):
+        frame = load_image(path)  # Retired single-page TIFF
+        yield as_rgb(frame, plane_channel(path)) if frame.ndim == 2 else frame
+        return
+    with Image.open(path) as im:
+        for page in ImageSequence.Iterator(im):
+            frame = np.asarray(page)
+            if frame.ndim == 2 and channel is None:
+                channel = plane_channel(path)
+            yield as_rgb(frame, channel)
+
+def iter_timepoints(path, z_slices=1, preprocess=()):
+    """
+    Yield one max-intensity projection per timepoint.
+
+    Parameters:
+    - z_slices: consecutive pages that make up one timepoint (1 = no Z)
+    - preprocess: steps applied to each page before projecting (see load_image)
+    """
+    projection = None
+    for index, frame in enumerate(iter_frames(path)):
+        for step in preprocess:
+            frame = step(frame)
+        if projection is None:
+            projection = frame.copy()
+        else:
+            np.maximum(projection, frame, out=projection)
+        if (index + 1) % z_slices == 0:
+            yield projection
+            projection = None
+    if projection is not None:
+        yield projection  # Incomplete last stack
+
+def load_projection(path, preprocess=()):
+    """Maximum-intensity projection of all pages of a TIFF"""
+    projection = None
+    for frame in iter_timepoints(path, frame_count(path), preprocess):
+        projection = frame
+    return projection
+
+## ================= ANALYSIS ================= ##
+def analyze_series(path, channel="green", threshold=DEFAULT_THRESHOLD,
+                   black_threshold=DEFAULT_BLACK_THRESHOLD, z_slices=1, stages=(),
+                   preprocess=()):
+    """
+    Per-timepoint metrics of one multi-page TIFF.
+
+    Returns:
+        list of analyze_image results, each with a "timepoint" index
+    """
+    rows = []
+    for t, img in enumerate(iter_timepoints(path, z_slices, preprocess)):
+        row = {"timepoint": t}
+        row.update(analyze_image(img, channel, threshold, black_threshold, stages, path, preprocess))
+        rows.append(row)
+    return rows
+
+def condition_timecourse(folder_path, channel="green", threshold=DEFAULT_THRESHOLD,
+                         black_threshold=DEFAULT_BLACK_THRESHOLD, z_slices=1, stages=(),
+                         preprocess=(), metric="ratio"):
+    """
+    Time course of a condition: every series in the folder analyzed per
+    timepoint, then aggregated over positions.
+
+    Returns:
+        list of dicts (timepoint, n, mean, sem) in timepoint order
+    """
+    by_timepoint = {}
+    for filename in folder_images(folder_path):
+        path = os.path.join(folder_path, filename)
+        for row in analyze_series(path, channel, threshold, black_threshold, z_slices, stages, preprocess):
+            by_timepoint.setdefault(row["timepoint"], []).append(row[metric])
+    course = []
+    for t in sorted(by_timepoint):
+        values = by_timepoint[t]
+        sem = np.std(values, ddof=1) / np.sqrt(len(values)) if len(values) > 1 else 0.0
+        course.append({"timepoint": t, "n": len(values), "mean": float(np.mean(values)), "sem": float(sem)})
+    return course
+
+## ================= MAIN ================= ##
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-timepoint uptake of multi-page TIFF series.")
+    parser.add_argument("folders", nargs="+", help="condition folders")
+    parser.add_argument("--channel", choices=["green", "yellow"], default="green")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--black-threshold", type=float, default=DEFAULT_BLACK_THRESHOLD)
+    parser.add_argument("--z-slices", type=int, default=1, help="pages per timepoint")
+    parser.add_argument("--interval", type=float, help="hours between timepoints")
+    args = parser.parse_args(argv)
+
+    print("\n" + "="*80)
+    print("UPTAKE TIME COURSE")
+    print("="*80)
+    print(f"{'Condition':<25}{'Time':>10}{'n':>5}{'Mean Ratio':>14}{'SEM':>12}")
+    print("-" * 80)
+    for folder in args.folders:
+        label = os.path.basename(os.path.normpath(folder))
+        for point in condition_timecourse(folder, args.channel, args.threshold,
+                                          args.black_threshold, args.z_slices):
+            t = point["timepoint"]
+            time = f"{t * args.interval:g} h" if args.interval else f"t{t}"
+            print(f"{label:<25}{time:>10}{point['n']:>5}{point['mean']:>14.4f}{point['sem']:>12.4f}")
+    print("="*80 + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Intensity-based uptake metrics.
+
+Counting pixels above the threshold discards how much dextran a field took
+up. This stage histograms the signal intensity of the cell pixels once and
+derives everything from that histogram:
+
+- integrated and mean signal intensity inside the cell mask
+- integrated intensity of the signal (above-threshold) pixels
+- percentiles of the foreground intensity distribution
+
+The thresholded signal area is the tail of the same histogram (every signal
+pixel is also a cell pixel), so intensity and area metrics stay consistent.
+For 8-bit images the histogram is a single bincount with 256 bins (green) or
+511 bins of R + G (yellow, i.e. half-integer steps of (R + G) / 2).
+
+Usage (from the "Macropinocytosis Project" folder):
+    python -m uptake_engine.intensity "2026-01-15 Macropinocytosis KO Lines FITC Assay/10x/PELP1 10x"
+"""
+import os
+import sys
+import argparse
+import numpy as np
+
+from .engine import DEFAULT_THRESHOLD, DEFAULT_BLACK_THRESHOLD
+from .metrics import signal_intensity
+from .results import condition_results
+from .kernels import signal_histogram_u8
+
+## ================= CONFIGURATION ================= ##
+INTENSITY_PERCENTILES = (50, 90, 99)
+
+## ================= HISTOGRAM ================= ##
+def intensity_histogram(img, mask, channel="green", compiled=True):
+    """
+    Histogram of the signal intensity of the masked pixels of an 8-bit image
+    (compiled=False skips the numba kernel, see kernels.py).
+
+    Returns:
+        (counts, values): int64 counts per bin and the intensity of each bin
+    """
+    counts = signal_histogram_u8(img, mask, channel) if compiled else None
+    if counts is not None:
+        values = np.arange(counts.size) / 2 if channel == "yellow" else np.arange(counts.size, dtype=np.float64)
+        return counts, values
+    if channel == "yellow":
+        summed = img[..., 0].astype(np.uint16) + img[..., 1]
+        counts = np.bincount(summed[mask], minlength=511)
+        return counts, np.arange(counts.size) / 2
+    counts = np.bincount(img[..., 1][mask], minlength=256)
+    return counts, np.arange(counts.size, dtype=np.float64)
+
+def histogram_percentiles(counts, values, percentiles=INTENSITY_PERCENTILES):
+    """Lower (inverted-CDF) percentiles of a histogram"""
+    cumulative = np.cumsum(counts)
+    if not cumulative.size or cumulative[-1] == 0:
+        return [0.0] * len(percentiles)
+    ranks = np.ceil(np.asarray(percentiles) / 100 * cumulative[-1]).clip(1)
+    return values[np.searchsorted(cumulative, ranks)].tolist()
+
+def intensity_metrics(img, mask, channel="green", threshold=DEFAULT_THRESHOLD,
+                      percentiles=INTENSITY_PERCENTILES):
+    """
+    Intensity metrics of the masked pixels.
+
+    Returns:
+        dict: integrated_intensity, mean_intensity, signal_integrated_intensity
+        and intensity_p<q> for each percentile q
+    """
+    if img.dtype == np.uint8:
+        counts, values = intensity_histogram(img, mask, channel)
+        n = int(counts.sum())
+        integrated = float(counts @ values)
+        above = values > threshold
+        signal_integrated = float(counts[above] @ values[above])
+        levels = histogram_percentiles(counts, values, percentiles)
+    else:
+        pixels = signal_intensity(img[mask], channel).astype(np.float64)
+        n = pixels.size
+        integrated = float(pixels.sum())
+        signal_integrated = float(pixels[pixels > threshold].sum())
+        levels = (np.percentile(pixels, percentiles, method="inverted_cdf").tolist()
+                  if n else [0.0] * len(percentiles))
+    result = {
+        "integrated_intensity": integrated,
+        "mean_intensity": integrated / n if n else 0.0,
+        "signal_integrated_intensity": signal_integrated,
+    }
+    result.update({f"intensity_p{q:g}": float(v) for q, v in zip(percentiles, levels)})
+    return result
+
+## ================= STAGE ================= ##
+def intensity_distribution(img, context):
+    """analyze_image stage: intensity metrics over the cell mask"""
+    return intensity_metrics(img, context["cell_mask"], context["channel"], context["threshold"])
+
+## ================= MAIN ================= ##
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Intensity-based uptake per condition.")
+    parser.add_argument("folders", nargs="+", help="condition folders")
+    parser.add_argument("--channel", choices=["green", "yellow"], default="green")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--black-threshold", type=float, default=DEFAULT_BLACK_THRESHOLD)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    print("\n" + "="*80)
+    print("INTENSITY UPTAKE")
+    print("="*80)
+    print(f"{'Condition':<25}{'n':>5}{'Ratio':>10}{'Mean Int.':>12}{'Integrated':>14}{'p50':>7}{'p90':>7}")
+    print("-" * 80)
+    for folder in args.folders:
+        rows = condition_results(folder, args.channel, args.threshold, args.black_threshold,
+                                 args.workers, stages=(intensity_distribution,))
+        label = os.path.basename(os.path.normpath(folder))
+        if not rows:
+            print(f"{label:<25}{0:>5}")
+            continue
+        mean = {key: np.mean([row[key] for row in rows])
+                for key in ("ratio", "mean_intensity", "integrated_intensity", "intensity_p50", "intensity_p90")}
+        print(f"{label:<25}{len(rows):>5}{mean['ratio']:>10.4f}{mean['mean_intensity']:>12.2f}"
+              f"{mean['integrated_intensity']:>14.3g}{mean['intensity_p50']:>7.1f}{mean['intensity_p90']:>7.1f}")
+    print("="*80 + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
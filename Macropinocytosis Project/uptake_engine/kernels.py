@@ -0,0 +1,123 @@
+"""
+Optional compiled (numba) kernels for the per-pixel loops.
+
+The NumPy code builds several full-size temporaries per image: the int32
+R + G sum of the yellow mask, one comparison per channel for the cell mask,
+the uint16 (R << 8 | G) codes of the joint histogram, the masked copies fed
+to bincount. When numba is installed, the kernels below do the same work in
+a single pass per image without temporaries:
+
+- fused_masks: signal and cell masks plus both pixel counts (analyze_image)
+- joint_histogram_u8: 256x256 (red, green) counts (colocalization)
+- signal_histogram_u8: green or R + G counts (intensity)
+
+They are used automatically for 8-bit (H, W, C) images when numba imports;
+set UPTAKE_KERNELS=numpy to force the NumPy code, which stays the reference
+implementation and the fallback for every other dtype. Kernels compile on
+first use with cache=True, so the compiled machine code is written next to
+this module's __pycache__ (or to NUMBA_CACHE_DIR) and later processes,
+including every pool worker, load it instead of recompiling.
+
+verify_kernels.py checks the kernels against the NumPy code and times both.
+"""
+import os
+import numpy as np
+
+from .metrics import signal_mask, cell_mask
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+## ================= CONFIGURATION ================= ##
+KERNELS_ENV = "UPTAKE_KERNELS"  # "numpy" disables the compiled kernels
+ENABLED = numba is not None and os.environ.get(KERNELS_ENV, "").lower() != "numpy"
+
+## ================= COMPILED KERNELS ================= ##
+if ENABLED:
+    _jit = numba.njit(cache=True, nogil=True)
+
+    @_jit
+    def _fused_masks(img, yellow, threshold, black_threshold, signal, cells):
+        h, w, c = img.shape
+        c = min(c, 3)
+        twice = 2 * threshold
+        n_signal = 0
+        n_cells = 0
+        for y in range(h):
+            for x in range(w):
+                g = np.int32(img[y, x, 1])
+                if yellow:
+                    s = np.int32(img[y, x, 0]) + g > twice
+                else:
+                    s = g > threshold
+                inside = False
+                for k in range(c):
+                    if img[y, x, k] >= black_threshold:
+                        inside = True
+                        break
+                signal[y, x] = s
+                cells[y, x] = inside
+                if s:
+                    n_signal += 1
+                if inside:
+                    n_cells += 1
+        return n_signal, n_cells
+
+    @_jit
+    def _joint_histogram(img, mask, out):
+        h, w = mask.shape
+        for y in range(h):
+            for x in range(w):
+                if mask[y, x]:
+                    out[img[y, x, 0], img[y, x, 1]] += 1
+
+    @_jit
+    def _signal_histogram(img, mask, yellow, out):
+        h, w = mask.shape
+        for y in range(h):
+            for x in range(w):
+                if mask[y, x]:
+                    if yellow:
+                        out[np.int32(img[y, x, 0]) + img[y, x, 1]] += 1
+                    else:
+                        out[img[y, x, 1]] += 1
+
+def use_kernels(img):
+    """True when the compiled kernels handle this image"""
+    return ENABLED and img.dtype == np.uint8 and img.ndim == 3 and img.shape[2] >= 2
+
+## ================= DISPATCH ================= ##
+def fused_masks(img, channel, threshold, black_threshold):
+    """
+    Signal and cell masks of an image and their pixel counts.
+
+    Returns:
+        (signal_mask, cell_mask, signal_area, cell_area)
+    """
+    if use_kernels(img) and channel in ("green", "yellow"):
+        signal = np.empty(img.shape[:2], dtype=bool)
+        cells = np.empty(img.shape[:2], dtype=bool)
+        n_signal, n_cells = _fused_masks(img, channel == "yellow", float(threshold),
+                                         float(black_threshold), signal, cells)
+        return signal, cells, int(n_signal), int(n_cells)
+    signal = signal_mask(img, channel, threshold)
+    cells = cell_mask(img, black_threshold)
+    return signal, cells, int(np.count_nonzero(signal)), int(np.count_nonzero(cells))
+
+def joint_histogram_u8(img, mask):
+    """Compiled colocalization.joint_histogram (None when kernels are off)"""
+    if not use_kernels(img):
+        return None
+    out = np.zeros((256, 256), dtype=np.int64)
+    _joint_histogram(img, mask, out)
+    return out
+
+def signal_histogram_u8(img, mask, channel="green"):
+    """Compiled intensity_histogram counts (None when kernels are off)"""
+    if not use_kernels(img):
+        return None
+    out = np.zeros(511 if channel == "yellow" else 256, dtype=np.int64)
+    _signal_histogram(img, mask, channel == "yellow", out)
+    return out
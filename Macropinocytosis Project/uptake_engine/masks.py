@@ -0,0 +1,134 @@
+"""
+Bit-packed export of the thresholded masks.
+
+To audit what the thresholds counted, the mask_export stage saves the
+signal (green/yellow) and cell masks of every analyzed image next to it in
+.uptake_cache/masks. Each mask row is packed to 1 bit per pixel with
+np.packbits and the file is zlib-compressed (.npz), so a 2432x2032 field
+costs under 100 kB instead of the 10 MB of two 8-bit images.
+
+The masks are written by the stage itself, in whichever process ran it (a
+worker of condition_results' pool, or the caller with workers=1), before
+the image's row is returned, so a row's mask_file always exists. With
+several workers the writes of one overlap the decoding of the others.
+
+render_mask_overlay reads the masks back lazily: only every 2 ** level-th
+packed row is unpacked, to match a pyramid level thumbnail.
+
+Usage (from the "Macropinocytosis Project" folder):
+    python -m uptake_engine.masks "2026-01-15 Macropinocytosis KO Lines FITC Assay/63x/PELP1 63x"
+    python -m uptake_engine.masks "2026-01-15 .../63x/PELP1 63x" --overlay overlays/
+"""
+import os
+import sys
+import argparse
+import numpy as np
+import matplotlib.pyplot as plt
+
+from .engine import DEFAULT_THRESHOLD, DEFAULT_BLACK_THRESHOLD, stage_name
+from .dataset import folder_images
+from .cache import cache_path
+from .pyramid import load_level
+from .montage import OVERLAY_COLOR, OVERLAY_ALPHA, BACKGROUND_DIM
+from .results import condition_results
+
+## ================= CONFIGURATION ================= ##
+MASKS_KIND = "masks"
+OVERLAY_LEVEL = 2             # Pyramid level overlays are rendered at
+
+## ================= FILES ================= ##
+def mask_path(image_path, channel="green", threshold=DEFAULT_THRESHOLD,
+              black_threshold=DEFAULT_BLACK_THRESHOLD, preprocess=()):
+    """
+    Mask file of one image for one channel, pair of thresholds and
+    preprocessing (named like results.results_path)
+    """
+    steps = "".join(f"_{stage_name(step)}" for step in preprocess)
+    return cache_path(image_path, MASKS_KIND, f".{channel}_t{threshold:g}_b{black_threshold:g}{steps}.npz")
+
+def save_masks(path, signal, cells):
+    """Pack both masks row-wise to 1 bit per pixel and write them atomically"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp.npz"
+    np.savez_compressed(tmp, shape=np.array(signal.shape),
+                        signal=np.packbits(signal, axis=1), cells=np.packbits(cells, axis=1))
+    os.replace(tmp, path)
+
+def load_masks(path, step=1):
+    """
+    Read the masks of one image, keeping every step-th row and column.
+
+    Returns:
+        (signal, cells) boolean arrays
+    """
+    with np.load(path) as data:
+        width = int(data["shape"][1])
+        masks = []
+        for key in ("signal", "cells"):
+            packed = data[key][::step]
+            masks.append(np.unpackbits(packed, axis=1, count=width)[:, ::step].astype(bool))
+    return tuple(masks)
+
+## ================= STAGE ================= ##
+def mask_export(img, context):
+    """
+    analyze_image stage: write the signal and cell masks of the image.
+    Needs context["path"] (set by condition_results); in-memory images are
+    skipped. The file is keyed by context["preprocess"] too.
+    """
+    if context.get("path") is None:
+        return {}
+    path = mask_path(context["path"], context["channel"], context["threshold"],
+                     context["black_threshold"], context.get("preprocess", ()))
+    save_masks(path, context["signal_mask"], context["cell_mask"])
+    return {"mask_file": os.path.basename(path)}
+
+## ================= OVERLAY ================= ##
+def render_mask_overlay(image_path, channel="green", threshold=DEFAULT_THRESHOLD,
+                        black_threshold=DEFAULT_BLACK_THRESHOLD, level=OVERLAY_LEVEL, preprocess=()):
+    """
+    Pyramid thumbnail with the exported full-resolution masks drawn on it:
+    signal tinted as in the contact sheets, background dimmed.
+    """
+    thumb = np.asarray(load_level(image_path, level))[..., :3]
+    signal, cells = load_masks(mask_path(image_path, channel, threshold, black_threshold, preprocess),
+                               2 ** level)
+    signal = signal[:thumb.shape[0], :thumb.shape[1]]
+    cells = cells[:thumb.shape[0], :thumb.shape[1]]
+    tile = thumb.astype(np.float32)
+    tile[~cells] *= BACKGROUND_DIM
+    tile[signal] = (1 - OVERLAY_ALPHA) * tile[signal] + OVERLAY_ALPHA * OVERLAY_COLOR
+    return tile.astype(np.uint8)
+
+## ================= MAIN ================= ##
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export bit-packed masks and render QC overlays.")
+    parser.add_argument("folders", nargs="+", help="condition folders")
+    parser.add_argument("--channel", choices=["green", "yellow"], default="green")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--black-threshold", type=float, default=DEFAULT_BLACK_THRESHOLD)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--overlay", help="folder to write PNG overlays to")
+    parser.add_argument("--level", type=int, default=OVERLAY_LEVEL)
+    args = parser.parse_args(argv)
+
+    for folder in args.folders:
+        condition_results(folder, args.channel, args.threshold, args.black_threshold,
+                          args.workers, stages=(mask_export,))
+        label = os.path.basename(os.path.normpath(folder))
+        paths = [mask_path(os.path.join(folder, f), args.channel, args.threshold, args.black_threshold)
+                 for f in folder_images(folder)]
+        size = sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+        print(f"💾 {label}: {len(paths)} mask files, {size / 1e6:.2f} MB")
+
+        if args.overlay:
+            out = os.path.join(args.overlay, label)
+            os.makedirs(out, exist_ok=True)
+            for filename in folder_images(folder):
+                overlay = render_mask_overlay(os.path.join(folder, filename), args.channel,
+                                              args.threshold, args.black_threshold, args.level)
+                plt.imsave(os.path.join(out, os.path.splitext(filename)[0] + ".png"), overlay)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""
+Leica MetaData XML index.
+
+Every acquisition folder carries a MetaData folder with one *_ICC.xml (and
+a *_Properties.xml copy with the same content plus derived fields) per
+position: pixel size, channel LUTs, bit depth, objective and timestamps.
+This module stream-parses them with ElementTree.iterparse (elements are
+cleared as soon as they are read, so a 150 kB file never sits in memory as
+a tree), in a process pool, and keeps only the fields below in a columnar
+table (one list per field) cached in the experiment's
+.uptake_cache/metadata/index.json. Files are re-parsed only when their
+mtime changes, so re-indexing an unchanged experiment is a directory walk
+and one JSON read.
+
+image_metadata finds the row of an image's own position: by name, or by
+position number, since the exported images are numbered ("13.tif") while
+the XML files name the position ("..._63x_Pos013_ICC.xml").
+
+Usage (from the "Macropinocytosis Project" folder):
+    python -m uptake_engine.metadata "2026-02-13 Macropinocytosis 63x Images"
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import datetime
+import functools
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+from .cache import cache_dir, CACHE_DIRNAME
+
+## ================= CONFIGURATION ================= ##
+METADATA_KIND = "metadata"
+XML_SUFFIXES = ("_Properties.xml", ".xml")   # Longest first; stripped to get the position key
+PARALLEL_MIN_FILES = 16       # Below this, parsing in-process beats starting a pool
+POSITION_PATTERN = re.compile(r"(?:^|_)Pos(\d+)(?:_|$)", re.IGNORECASE)
+
+FIELDS = (
+    "xml",                # Path relative to the experiment folder
+    "position",           # File name without the XML suffix (one per acquired position)
+    "image",              # Image TextDescription, e.g. "Pos013_ICC"
+    "magnification",
+    "objective",
+    "numerical_aperture",
+    "bit_depth",          # Detector resolution in bits (12 -> max value 4095)
+    "channels",           # LUT names in channel order, comma-separated
+    "size_x", "size_y",   # Pixels
+    "pixel_size_x_um", "pixel_size_y_um",
+    "n_z", "n_t",
+    "start_time",         # ISO timestamp of the first frame
+)
+
+# Leica DimensionDescription DimID values
+DIM_X, DIM_Y, DIM_Z, DIM_T = "1", "2", "3", "4"
+
+## ================= PARSING ================= ##
+def filetime_to_iso(hex_ticks):
+    """Leica timestamps are Windows FILETIMEs: 100 ns ticks since 1601-01-01, in hex"""
+    ticks = int(hex_ticks, 16)
+    moment = datetime.datetime(1601, 1, 1) + datetime.timedelta(microseconds=ticks // 10)
+    return moment.isoformat(timespec="seconds")
+
+def position_key(filename):
+    for suffix in XML_SUFFIXES:
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)]
+    return filename
+
+def parse_metadata(path):
+    """
+    Stream-parse one Leica XML file.
+
+    Returns:
+        dict with every FIELDS entry except xml/position (missing fields are None)
+    """
+    row = {field: None for field in FIELDS[2:]}
+    row["n_z"] = row["n_t"] = 1
+    luts = []
+    for event, el in ET.iterparse(path, events=("start", "end")):
+        if event == "start":
+            a = el.attrib
+            if el.tag == "Image" and row["image"] is None:
+                row["image"] = a.get("TextDescription")
+            elif el.tag == "ChannelDescription":
+                luts.append(a.get("LUTName", ""))
+                if row["bit_depth"] is None and "Resolution" in a:
+                    row["bit_depth"] = int(a["Resolution"])
+            elif el.tag == "DimensionDescription":
+                n = int(a.get("NumberOfElements", 1))
+                dim = a.get("DimID")
+                if dim in (DIM_X, DIM_Y):
+                    axis = "x" if dim == DIM_X else "y"
+                    row[f"size_{axis}"] = n
+                    if a.get("Unit") == "m" and n:
+                        row[f"pixel_size_{axis}_um"] = float(a["Length"]) * 1e6 / n
+                elif dim == DIM_Z:
+                    row["n_z"] = n
+                elif dim == DIM_T:
+                    row["n_t"] = n
+            elif "Magnification" in a and row["objective"] is None and a.get("ObjectiveName"):
+                row["magnification"] = float(a["Magnification"])
+                row["objective"] = a["ObjectiveName"].strip()
+                row["numerical_aperture"] = float(a.get("NumericalAperture", "nan"))
+        else:
+            if el.tag == "TimeStampList" and row["start_time"] is None and el.text and el.text.strip():
+                row["start_time"] = filetime_to_iso(el.text.split()[0])
+            el.clear()
+    row["channels"] = ",".join(luts)
+    return row
+
+## ================= INDEX ================= ##
+def find_metadata_files(base_folder):
+    """
+    XML files under an experiment, one per position: *_Properties.xml is
+    only used when the matching *_ICC.xml is absent.
+
+    Returns:
+        sorted list of paths
+    """
+    paths = []
+    for folder, dirnames, filenames in os.walk(base_folder):
+        dirnames[:] = sorted(d for d in dirnames if d != CACHE_DIRNAME)
+        xml = set(f for f in filenames if f.endswith(".xml"))
+        for f in sorted(xml):
+            if f.endswith("_Properties.xml") and f[:-len("_Properties.xml")] + ".xml" in xml:
+                continue
+            paths.append(os.path.join(folder, f))
+    return paths
+
+def index_path(base_folder):
+    return os.path.join(cache_dir(base_folder, METADATA_KIND), "index.json")
+
+def _read_index(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        cached = json.load(f)
+    columns = cached["columns"]
+    return {xml: (mtime, {field: columns[field][i] for field in FIELDS})
+            for i, (xml, mtime) in enumerate(zip(columns["xml"], cached["mtime_ns"]))}
+
+def build_index(base_folder, workers=None, force=False):
+    """
+    Metadata of every position under an experiment, parsing only XML files
+    that are new or changed since the cached index.
+
+    Parameters:
+    - base_folder: experiment folder
+    - workers: processes used to parse changed files (None = one per CPU)
+    - force: re-parse everything
+
+    Returns:
+        columnar table: {field: list of values}, one entry per position, in
+        path order
+    """
+    path = index_path(base_folder)
+    cached = {} if force else _read_index(path)
+    files = find_metadata_files(base_folder)
+    mtimes = [os.stat(p).st_mtime_ns for p in files]
+    keys = [os.path.relpath(p, base_folder) for p in files]
+
+    stale = [p for p, key, mtime in zip(files, keys, mtimes)
+             if key not in cached or cached[key][0] != mtime]
+    if stale:
+        if workers == 1 or len(stale) < PARALLEL_MIN_FILES:
+            parsed = list(map(parse_metadata, stale))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                parsed = list(pool.map(parse_metadata, stale, chunksize=8))
+        for p, row in zip(stale, parsed):
+            key = os.path.relpath(p, base_folder)
+            row.update(xml=key, position=position_key(os.path.basename(p)))
+            cached[key] = (os.stat(p).st_mtime_ns, row)
+
+    columns = {field: [cached[key][1][field] for key in keys] for field in FIELDS}
+    if stale or len(cached) != len(keys):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"columns": columns, "mtime_ns": mtimes}, f)
+        os.replace(tmp, path)
+    return columns
+
+def index_rows(columns):
+    """Row dicts of a columnar table"""
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+## ================= LOOKUP ================= ##
+def position_number(name):
+    """
+    Acquisition position named by a Leica position or image stem: 13 for
+    "..._63x_Pos013_ICC", "Pos013" or an exported "13" (None if none)
+    """
+    match = POSITION_PATTERN.search(name)
+    if match:
+        return int(match.group(1))
+    return int(name) if name.isdigit() else None
+
+@functools.lru_cache(maxsize=None)
+def folder_metadata(folder):
+    """Metadata rows under a condition folder (indexed once per process)"""
+    return index_rows(build_index(folder, workers=1))
+
+def image_metadata(image_path):
+    """
+    Metadata row of an image's own position: the position whose name is the
+    image's stem (or ends with "_" + stem), else the only position with the
+    same position number. None when no row, or more than one, matches.
+    """
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    rows = folder_metadata(os.path.dirname(image_path))
+    for row in rows:
+        if row["position"] == stem or row["position"].endswith("_" + stem):
+            return row
+    number = position_number(stem)
+    if number is None:
+        return None
+    matches = [row for row in rows if position_number(row["position"]) == number]
+    return matches[0] if len(matches) == 1 else None
+
+## ================= MAIN ================= ##
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index the Leica XML metadata of experiments.")
+    parser.add_argument("folders", nargs="+", help="experiment folders")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args(argv)
+
+    for folder in args.folders:
+        columns = build_index(folder, args.workers, args.force)
+        print(f"\n{folder}: {len(columns['xml'])} positions")
+        print(f"{'Position':<60}{'Mag':>5}{'Bits':>6}{'µm/px':>8}{'Size':>11}  {'Channels':<18}{'Start'}")
+        for row in index_rows(columns):
+            size = f"{row['size_x']}x{row['size_y']}"
+            um = row["pixel_size_x_um"] or 0
+            print(f"{row['position'][-60:]:<60}{row['magnification'] or 0:>5g}{row['bit_depth'] or 0:>6}"
+                  f"{um:>8.4f}{size:>11}  {row['channels']:<18}{row['start_time']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
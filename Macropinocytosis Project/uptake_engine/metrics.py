@@ -0,0 +1,51 @@
+import numpy as np
+
+## ================= PIXEL MASKS ================= ##
+# All masks index the channel axis with [..., k] so they work both on full
+# (H, W, C) images and on flat (N, C) pixel samples.
+
+def green_mask(img, green_threshold):
+    """Pixels whose green (FITC) channel is above threshold"""
+    return img[..., 1] > green_threshold
+
+def yellow_mask(img, yellow_threshold):
+    """Pixels whose mean of Red + Green (TMR) is above threshold"""
+    # (R + G) / 2 > t  <=>  R + G > 2t, done in integers to skip float temporaries
+    return img[..., 0].astype(np.int32) + img[..., 1] > 2 * yellow_threshold
+
+def cell_mask(img, black_threshold):
+    """Pixels that are not black background in every channel"""
+    return np.any(img[..., :3] >= black_threshold, axis=-1)
+
+SIGNAL_MASKS = {
+    "green": green_mask,
+    "yellow": yellow_mask,
+}
+
+def signal_mask(img, channel, threshold):
+    """Dispatch to the green (FITC) or yellow (TMR) signal mask"""
+    if channel not in SIGNAL_MASKS:
+        raise ValueError(f"Unknown channel '{channel}' (expected one of {sorted(SIGNAL_MASKS)})")
+    return SIGNAL_MASKS[channel](img, threshold)
+
+def signal_intensity(img, channel):
+    """Per-pixel signal intensity: green for FITC, mean of Red + Green for TMR"""
+    if channel == "yellow":
+        return (img[..., 0].astype(np.float32) + img[..., 1]) / 2
+    return img[..., 1].astype(np.float32)
+
+## ================= AREA METRICS ================= ##
+def compute_green_area(img, green_threshold):
+    return np.sum(green_mask(img, green_threshold))
+
+def compute_yellow_area(img, yellow_threshold):
+    """Calculate the total area of yellow pixels above threshold (TMR dye)"""
+    return np.sum(yellow_mask(img, yellow_threshold))
+
+def compute_total_cell_area(img, black_threshold):
+    """Calculate total cell area by excluding black background pixels"""
+    return np.sum(cell_mask(img, black_threshold))
+
+def compute_ratio(signal_area, cell_area):
+    """Signal area / total cell area, 0 when there are no cell pixels"""
+    return signal_area / cell_area if cell_area != 0 else 0
@@ -0,0 +1,147 @@
+"""
+Contact-sheet montages for QC.
+
+Tiles every image of each condition into one grid, with the thresholded
+signal mask overlaid and the image's ratio printed on the tile. Tiles are
+rendered from the cached pyramid thumbnails in a process pool and the
+ratios come from the result store, so once an experiment has been analyzed
+its whole QC sheet is produced without decoding a single full-size TIFF.
+
+Usage (from the "Macropinocytosis Project" folder):
+    python -m uptake_engine.montage "2026-01-15 Macropinocytosis KO Lines FITC Assay/10x" -o qc-10x.pdf
+"""
+import os
+import sys
+import argparse
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+from concurrent.futures import ProcessPoolExecutor
+
+from .engine import DEFAULT_THRESHOLD, DEFAULT_BLACK_THRESHOLD
+from .metrics import signal_mask, cell_mask
+from .cache import walk_image_folders
+from .pyramid import THUMBNAIL_SIZE, build_pyramids, load_thumbnail
+from .results import condition_results
+
+## ================= CONFIGURATION ================= ##
+OVERLAY_COLOR = np.array([255, 0, 255], dtype=np.float32)  # Magenta stands out on green/yellow
+OVERLAY_ALPHA = 0.5
+BACKGROUND_DIM = 0.4   # Non-cell pixels are darkened so the cell mask is visible too
+TILE_PADDING = 4
+
+## ================= TILES ================= ##
+def render_tile(image_path, channel="green", threshold=DEFAULT_THRESHOLD,
+                black_threshold=DEFAULT_BLACK_THRESHOLD, size=THUMBNAIL_SIZE):
+    """
+    Thumbnail of one image with the signal mask tinted and background dimmed.
+    The masks are recomputed on the thumbnail, so they are a visual guide
+    rather than the exact full-resolution mask.
+    """
+    thumb = np.asarray(load_thumbnail(image_path, size))[..., :3]
+    signal = signal_mask(thumb, channel, threshold)
+    cells = cell_mask(thumb, black_threshold)
+    tile = thumb.astype(np.float32)
+    tile[~cells] *= BACKGROUND_DIM
+    tile[signal] = (1 - OVERLAY_ALPHA) * tile[signal] + OVERLAY_ALPHA * OVERLAY_COLOR
+    return tile.astype(np.uint8)
+
+def _render_tile_args(args):
+    return render_tile(*args)
+
+def grid_shape(n):
+    """Columns x rows of a roughly square grid holding n tiles"""
+    cols = max(1, int(np.ceil(np.sqrt(n))))
+    return cols, max(1, int(np.ceil(n / cols)))
+
+def tile_grid(tiles, padding=TILE_PADDING):
+    """
+    Paste tiles into one array on a roughly square grid.
+
+    Returns:
+        (montage, origins) where origins[i] is the (y, x) corner of tile i
+    """
+    cols, rows = grid_shape(len(tiles))
+    th = max(t.shape[0] for t in tiles) + padding
+    tw = max(t.shape[1] for t in tiles) + padding
+    montage = np.full((rows * th, cols * tw, 3), 255, dtype=np.uint8)
+    origins = []
+    for i, tile in enumerate(tiles):
+        y, x = (i // cols) * th, (i % cols) * tw
+        montage[y:y + tile.shape[0], x:x + tile.shape[1]] = tile
+        origins.append((y, x))
+    return montage, origins
+
+## ================= SHEETS ================= ##
+def plot_contact_sheet(montage, origins, rows, title):
+    """Draw a montage with each tile's filename and ratio in its corner"""
+    fig = plt.figure(figsize=(12, 12 * montage.shape[0] / montage.shape[1] + 0.8))
+    ax = fig.add_axes([0, 0, 1, 1 - 0.6 / fig.get_figheight()])
+    ax.imshow(montage, interpolation="nearest")
+    ax.axis('off')
+    for (y, x), row in zip(origins, rows):
+        ax.text(x + 4, y + 4, f"{row['filename']}  {row['ratio']:.4f}",
+                color='white', fontsize=7, weight='bold', va='top',
+                bbox={'facecolor': 'black', 'alpha': 0.6, 'pad': 1, 'edgecolor': 'none'})
+    fig.suptitle(title, fontsize=14, weight='bold')
+    return fig
+
+def build_contact_sheets(base_folder, output_path, channel="green", threshold=DEFAULT_THRESHOLD,
+                         black_threshold=DEFAULT_BLACK_THRESHOLD, size=THUMBNAIL_SIZE, workers=None):
+    """
+    Write one contact-sheet page per condition under base_folder into a PDF.
+
+    Parameters:
+    - base_folder: experiment folder (e.g. ".../10x") or a single condition folder
+    - output_path: PDF to write
+    - channel / threshold / black_threshold: thresholds used for ratios and overlays
+    - size: thumbnail size the tiles are rendered at
+    - workers: processes for pyramid building, analysis and tile rendering
+
+    Returns:
+        number of pages written
+    """
+    conditions = list(walk_image_folders(base_folder))
+    paths = [os.path.join(folder, f) for folder, filenames in conditions for f in filenames]
+    build_pyramids(paths, workers, size)
+
+    tasks = [(p, channel, threshold, black_threshold, size) for p in paths]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        tiles = list(pool.map(_render_tile_args, tasks, chunksize=4))
+
+    pages = 0
+    with PdfPages(output_path) as pdf:
+        start = 0
+        for folder, filenames in conditions:
+            rows = condition_results(folder, channel, threshold, black_threshold, workers)
+            condition_tiles = tiles[start:start + len(filenames)]
+            start += len(filenames)
+            montage, origins = tile_grid(condition_tiles)
+            ratios = [row["ratio"] for row in rows]
+            title = (f"{os.path.relpath(folder, base_folder)}  —  n={len(rows)}, "
+                     f"mean ratio {np.mean(ratios):.4f}")
+            fig = plot_contact_sheet(montage, origins, rows, title)
+            pdf.savefig(fig, dpi=150)
+            plt.close(fig)
+            pages += 1
+    return pages
+
+## ================= MAIN ================= ##
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-condition QC contact sheets.")
+    parser.add_argument("folder", help="experiment or condition folder")
+    parser.add_argument("-o", "--output", default="contact-sheets.pdf")
+    parser.add_argument("--channel", choices=["green", "yellow"], default="green")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--black-threshold", type=float, default=DEFAULT_BLACK_THRESHOLD)
+    parser.add_argument("--size", type=int, default=THUMBNAIL_SIZE)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    pages = build_contact_sheets(args.folder, args.output, args.channel, args.threshold,
+                                 args.black_threshold, args.size, args.workers)
+    print(f"💾 {pages} contact sheets saved to: {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
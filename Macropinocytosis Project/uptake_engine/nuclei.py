@@ -0,0 +1,146 @@
+"""
+Nuclear-channel cell counting.
+
+compute_total_cell_area uses "not black" pixels as a proxy for cells, which
+mixes cell size and spreading into the denominator. The blue channel holds
+the nuclear stain, so counting nuclei gives a second normalization: uptake
+per nucleus.
+
+The counter thresholds the blue channel on a NUCLEI_DOWNSAMPLE-times smaller
+copy (nuclei are hundreds to thousands of px, so nothing is lost), removes
+specks with a binary opening and counts labelled components. Clumps of
+touching nuclei are split by area: a component counts as
+round(area / median nucleus area) nuclei.
+
+nuclear_results (and the command line) count the nuclei of images whose
+area metrics are already stored from the blue channel alone, read through
+archive.load_archived, and store them back in the result store as if the
+nuclear_count stage had run.
+
+Usage (from the "Macropinocytosis Project" folder):
+    python -m uptake_engine.nuclei "2026-01-15 Macropinocytosis KO Lines FITC Assay/10x/PELP1 10x"
+"""
+import os
+import sys
+import argparse
+import numpy as np
+from scipy import ndimage
+from concurrent.futures import ProcessPoolExecutor
+
+from .engine import DEFAULT_THRESHOLD, DEFAULT_BLACK_THRESHOLD
+from .archive import load_archived
+from .pyramid import downsample2x
+from .results import condition_results, save_results
+
+## ================= CONFIGURATION ================= ##
+NUCLEAR_CHANNEL = 2           # Blue (nuclear stain)
+NUCLEAR_THRESHOLD = 64        # Blue intensity of nuclear pixels (stain is near saturation)
+NUCLEI_DOWNSAMPLE = 4         # Power of two
+MIN_NUCLEUS_AREA = 400        # Full-resolution px; smaller components are debris
+
+## ================= COUNTING ================= ##
+def label_nuclei(img, threshold=NUCLEAR_THRESHOLD, downsample=NUCLEI_DOWNSAMPLE,
+                 min_area=MIN_NUCLEUS_AREA):
+    """
+    Label nuclei on a downsampled copy of the nuclear channel of an
+    (H, W, C) image, or of the (H, W) nuclear plane alone.
+
+    Returns:
+        (areas, estimated_counts): full-resolution area of each kept
+        component and the number of nuclei it is estimated to contain
+    """
+    plane = img[..., NUCLEAR_CHANNEL] if img.ndim == 3 else img
+    for _ in range(int(np.log2(downsample))):
+        plane = downsample2x(plane)
+    mask = ndimage.binary_opening(plane >= threshold)
+    labels, n = ndimage.label(mask)
+    areas = np.bincount(labels.ravel(), minlength=n + 1)[1:] * downsample ** 2
+    areas = areas[areas >= min_area]
+    if not areas.size:
+        return areas, areas
+    typical = np.median(areas)
+    return areas, np.maximum(1, np.rint(areas / typical)).astype(int)
+
+def count_nuclei(img, threshold=NUCLEAR_THRESHOLD, downsample=NUCLEI_DOWNSAMPLE,
+                 min_area=MIN_NUCLEUS_AREA):
+    """Number of nuclei in a field"""
+    _, counts = label_nuclei(img, threshold, downsample, min_area)
+    return int(counts.sum())
+
+## ================= STAGE ================= ##
+def nuclear_fields(areas, counts, signal_area, cell_area):
+    """Row fields of the nuclear_count stage"""
+    n = int(counts.sum())
+    return {
+        "nuclei_count": n,
+        "signal_per_nucleus": signal_area / n if n else 0.0,
+        "cell_area_per_nucleus": cell_area / n if n else 0.0,
+        "median_nucleus_area": float(np.median(areas)) if areas.size else 0.0,
+    }
+
+def nuclear_count(img, context):
+    """
+    analyze_image stage: nuclei count and uptake per nucleus, next to the
+    area ratio of the same pass.
+    """
+    areas, counts = label_nuclei(img)
+    return nuclear_fields(areas, counts, int(context["signal_mask"].sum()),
+                          int(context["cell_mask"].sum()))
+
+## ================= BLUE-ONLY COUNTING ================= ##
+def _label_file(path):
+    return label_nuclei(load_archived(path, channels=(NUCLEAR_CHANNEL,))[..., 0])
+
+def nuclear_results(folder_path, channel="green", threshold=DEFAULT_THRESHOLD,
+                    black_threshold=DEFAULT_BLACK_THRESHOLD, workers=1):
+    """
+    Same rows as condition_results(..., stages=(nuclear_count,)), but images
+    whose area metrics are already stored are not decoded again: only their
+    nuclear channel is read, and the completed rows are stored back.
+    """
+    rows = condition_results(folder_path, channel, threshold, black_threshold, workers)
+    todo = [row for row in rows if nuclear_count.__name__ not in row.get("stages", [])]
+    if not todo:
+        return rows
+    paths = [os.path.join(folder_path, row["filename"]) for row in todo]
+    if workers == 1 or len(paths) == 1:
+        labelled = list(map(_label_file, paths))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            labelled = list(pool.map(_label_file, paths))
+    for row, (areas, counts) in zip(todo, labelled):
+        row.update(nuclear_fields(areas, counts, row["signal_area"], row["cell_area"]))
+        row["stages"] = row.get("stages", []) + [nuclear_count.__name__]
+    save_results(folder_path, rows, channel, threshold, black_threshold)
+    return rows
+
+## ================= MAIN ================= ##
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Nuclei counts and uptake per nucleus per condition.")
+    parser.add_argument("folders", nargs="+", help="condition folders")
+    parser.add_argument("--channel", choices=["green", "yellow"], default="green")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--black-threshold", type=float, default=DEFAULT_BLACK_THRESHOLD)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    print("\n" + "="*80)
+    print("UPTAKE PER NUCLEUS")
+    print("="*80)
+    print(f"{'Condition':<25}{'n':>5}{'Nuclei/Field':>15}{'Signal px/Nucleus':>20}{'Area Ratio':>14}")
+    print("-" * 80)
+    for folder in args.folders:
+        rows = nuclear_results(folder, args.channel, args.threshold, args.black_threshold, args.workers)
+        label = os.path.basename(os.path.normpath(folder))
+        if not rows:
+            print(f"{label:<25}{0:>5}")
+            continue
+        nuclei = [row["nuclei_count"] for row in rows]
+        per_nucleus = [row["signal_per_nucleus"] for row in rows]
+        ratios = [row["ratio"] for row in rows]
+        print(f"{label:<25}{len(rows):>5}{np.mean(nuclei):>15.1f}{np.mean(per_nucleus):>20.1f}{np.mean(ratios):>14.4f}")
+    print("="*80 + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+Decode / compute pipeline over a shared-memory ring buffer.
+
+condition_results' process pool decodes and thresholds each image in the
+same worker. To run decoding and thresholding in separate processes
+(e.g. few processes decoding from slow storage, more thresholding),
+passing each 2432x2032x3 array through a multiprocessing queue would
+pickle 15 MB per image, which costs more than the thresholding. Here the
+images never go through a queue:
+
+- the parent allocates one multiprocessing.shared_memory block split into
+  n_slots equal slots, each sized for one decoded (and preprocessed) image
+- decode workers take a free slot index from the "free" queue (blocking
+  when all slots are in use, which bounds memory to the ring), decode into
+  it and put (index, slot, shape, dtype) on the "ready" queue
+- compute workers wrap the slot as a NumPy view (no copy), run
+  analyze_image, put the row on the "results" queue and hand the slot back
+
+Only slot numbers, shapes and result rows are pickled. The parent polls the
+results queue and checks that every worker is still alive, so a worker
+killed outright (out of memory, SIGBUS on a full /dev/shm, a crashing
+decoder) raises instead of leaving the run waiting forever.
+
+Usage:
+    condition_results(folder, "green", workers=3, decoders=1)
+"""
+import os
+import queue
+import traceback
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+
+from .engine import load_image, analyze_image
+
+## ================= CONFIGURATION ================= ##
+SLOTS_PER_WORKER = 2          # Ring slots per compute worker: one being read, one being filled
+POLL_INTERVAL = 0.5           # Seconds between checks that the workers are alive
+
+## ================= RING BUFFER ================= ##
+class ImageRing:
+    """
+    Fixed-size slots in one shared-memory block. Picklable: worker
+    processes re-attach to the block by name.
+    """
+    def __init__(self, n_slots, slot_bytes, name=None):
+        self.n_slots = n_slots
+        self.slot_bytes = slot_bytes
+        self._owner = name is None
+        if self._owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=n_slots * slot_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+
+    def __getstate__(self):
+        return {"n_slots": self.n_slots, "slot_bytes": self.slot_bytes, "name": self.shm.name}
+
+    def __setstate__(self, state):
+        self.__init__(state["n_slots"], state["slot_bytes"], state["name"])
+
+    def view(self, slot, shape, dtype):
+        """NumPy array backed by one slot (valid until the ring is closed)"""
+        dtype = np.dtype(dtype)
+        if int(np.prod(shape)) * dtype.itemsize > self.slot_bytes:
+            raise ValueError(f"Image of shape {tuple(shape)} {dtype} does not fit a "
+                             f"{self.slot_bytes}-byte ring slot")
+        return np.ndarray(shape, dtype, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def close(self):
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+## ================= WORKERS ================= ##
+def _decode_worker(ring, tasks, free, ready, results, preprocess):
+    for index, path in iter(tasks.get, None):
+        slot = free.get()
+        try:
+            img = load_image(path, preprocess)
+            ring.view(slot, img.shape, img.dtype)[...] = img
+            ready.put((index, path, slot, img.shape, img.dtype.str))
+        except Exception:
+            free.put(slot)
+            results.put((index, None, traceback.format_exc()))
+    ring.shm.close()
+
+def _compute_worker(ring, ready, free, results, channel, threshold, black_threshold, stages, preprocess,
+                    make_row):
+    for index, path, slot, shape, dtype in iter(ready.get, None):
+        img = None
+        try:
+            img = ring.view(slot, shape, dtype)
+            results.put((index, make_row(path, img, channel, threshold, black_threshold, stages, preprocess),
+                         None))
+        except Exception:
+            results.put((index, None, traceback.format_exc()))
+        finally:
+            del img  # The view must be gone before the slot is reused or the block closed
+            free.put(slot)
+    ring.shm.close()
+
+def _analyze_row(path, img, channel, threshold, black_threshold, stages, preprocess):
+    return analyze_image(img, channel, threshold, black_threshold, stages, path, preprocess)
+
+## ================= PIPELINE ================= ##
+def _next_result(results, processes):
+    """results.get(), raising RuntimeError when a worker died without reporting"""
+    while True:
+        try:
+            return results.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            dead = [p for p in processes if p.exitcode not in (None, 0)]
+            if dead:
+                raise RuntimeError("Pipeline worker died: " + ", ".join(
+                    f"{p.name} (exit code {p.exitcode})" for p in dead))
+
+def pipelined_map(paths, channel, threshold, black_threshold, stages=(), preprocess=(),
+                  decoders=1, workers=None, make_row=_analyze_row):
+    """
+    make_row(path, img, channel, threshold, black_threshold, stages, preprocess) for
+    every image, with decoding and computing in separate processes.
+
+    Parameters:
+    - decoders: decode processes
+    - workers: compute processes (None = one per CPU)
+    - make_row: module-level function building the result of one image
+      (results.analyze_file's row builder when called from there)
+
+    Returns:
+        list of rows in path order
+    """
+    if not paths:
+        return []
+    workers = workers or os.cpu_count() or 1
+    # The first image sizes the slots and is computed in-process
+    first = load_image(paths[0], preprocess)
+    rows = [make_row(paths[0], first, channel, threshold, black_threshold, stages, preprocess)]
+    rest = paths[1:]
+    if not rest:
+        return rows
+
+    ctx = mp.get_context()
+    ring = ImageRing(SLOTS_PER_WORKER * workers, first.nbytes)
+    tasks, free, ready, results = ctx.Queue(), ctx.Queue(), ctx.Queue(), ctx.Queue()
+    for slot in range(ring.n_slots):
+        free.put(slot)
+    for item in enumerate(rest):
+        tasks.put(item)
+    for _ in range(decoders):
+        tasks.put(None)
+
+    processes = [ctx.Process(target=_decode_worker, name=f"decode-{i}",
+                             args=(ring, tasks, free, ready, results, preprocess))
+                 for i in range(decoders)]
+    processes += [ctx.Process(target=_compute_worker, name=f"compute-{i}",
+                              args=(ring, ready, free, results, channel, threshold,
+                                    black_threshold, stages, preprocess, make_row))
+                  for i in range(workers)]
+    try:
+        for p in processes:
+            p.start()
+        collected = [None] * len(rest)
+        errors = []
+        for _ in rest:
+            index, row, error = _next_result(results, processes)
+            collected[index] = row
+            if error:
+                errors.append(f"{rest[index]}:\n{error}")
+        for _ in range(workers):
+            ready.put(None)
+        for p in processes:
+            p.join()
+    finally:
+        for p in processes:
+            if p.is_alive():
+                p.terminate()
+        ring.close()
+    if errors:
+        raise RuntimeError("Pipeline workers failed:\n" + "\n".join(errors))
+    return rows + collected
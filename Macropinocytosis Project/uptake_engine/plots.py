@@ -0,0 +1,127 @@
+"""
+Publication figure shared by the KO-line analysis scripts and the sharded
+batch merge (shards.py): bars with SEM, significance stars against the
+control (Welch's t-test) and a table of n, mean ± SEM and p-values.
+
+Usage:
+    from uptake_engine.plots import create_beautiful_plot
+    fig = create_beautiful_plot(labels, means, sems, all_scores, colors, title, control_idx=0,
+                                ylabel="Green Area / Total Cell Area")
+"""
+import numpy as np
+import matplotlib.pyplot as plt
+from scipy.stats import ttest_ind
+
+## ================= FIGURE ================= ##
+def create_beautiful_plot(labels, means, sems, all_scores, colors, title, control_idx=0,
+                          ylabel="Green Area / Total Cell Area"):
+    """
+    Creates a beautiful bar plot with error bars, significance markers, and a data table.
+
+    Parameters:
+    - labels: list of group names
+    - means: list of mean values
+    - sems: list of SEM values
+    - all_scores: list of lists containing individual measurements
+    - colors: list of colors for each bar
+    - title: plot title
+    - control_idx: index of control group for statistical comparison
+    - ylabel: y-axis label (the metric's description)
+    """
+    fig = plt.figure(figsize=(12, 8))
+
+    # Create gridspec for plot and table
+    gs = fig.add_gridspec(3, 1, height_ratios=[3, 0.1, 1], hspace=0.3)
+    ax_plot = fig.add_subplot(gs[0])
+    ax_table = fig.add_subplot(gs[2])
+
+    # -------- BAR PLOT --------
+    x_pos = np.arange(len(labels))
+    bars = ax_plot.bar(x_pos, means, yerr=sems, capsize=8,
+                       color=colors, edgecolor='black', linewidth=1.5,
+                       error_kw={'linewidth': 2, 'ecolor': 'black'})
+
+    ax_plot.set_ylabel(ylabel, fontsize=16, weight='bold')
+    ax_plot.set_title(title, fontsize=16, weight='bold', pad=20)
+    ax_plot.set_xticks(x_pos)
+    ax_plot.set_xticklabels(labels, fontsize=14, weight='bold')
+    ax_plot.spines['top'].set_visible(False)
+    ax_plot.spines['right'].set_visible(False)
+    ax_plot.grid(axis='y', alpha=0.3, linestyle='--')
+
+    # -------- SIGNIFICANCE TESTING --------
+    control_scores = all_scores[control_idx]
+    y_max = max(m + s for m, s in zip(means, sems)) * 1.15
+
+    for i in range(len(labels)):
+        if i == control_idx:
+            continue
+        if not all_scores[i] or not control_scores:
+            continue
+
+        _, p = ttest_ind(all_scores[i], control_scores, equal_var=False)
+
+        if p < 0.001:
+            sig = "***"
+        elif p < 0.01:
+            sig = "**"
+        elif p < 0.05:
+            sig = "*"
+        else:
+            sig = "ns"
+
+        if sig != "ns":
+            ax_plot.text(i, means[i] + sems[i] + 0.03 * y_max,
+                        sig, ha="center", fontsize=16, weight='bold')
+
+    # -------- DATA TABLE --------
+    ax_table.axis('off')
+
+    # Prepare table data
+    table_data = []
+    table_data.append(['Group', 'n', 'Mean ± SEM', 'p-value vs Control'])
+
+    for i, label in enumerate(labels):
+        n = len(all_scores[i]) if all_scores[i] else 0
+        mean_sem = f"{means[i]:.4f} ± {sems[i]:.4f}" if n > 0 else "N/A"
+
+        if i == control_idx:
+            p_val = "—"
+        elif all_scores[i] and control_scores:
+            _, p = ttest_ind(all_scores[i], control_scores, equal_var=False)
+            if p < 0.001:
+                p_val = "< 0.001"
+            else:
+                p_val = f"{p:.3f}"
+        else:
+            p_val = "N/A"
+
+        table_data.append([label, str(n), mean_sem, p_val])
+
+    # Create table
+    table = ax_table.table(cellText=table_data, cellLoc='center', loc='center',
+                          colWidths=[0.25, 0.15, 0.35, 0.25])
+    table.auto_set_font_size(False)
+    table.set_fontsize(10)
+    table.scale(1, 2)
+
+    # Style header row
+    for i in range(4):
+        cell = table[(0, i)]
+        cell.set_facecolor('#34495e')
+        cell.set_text_props(weight='bold', color='white')
+
+    # Alternate row colors and bold group names
+    for i in range(1, len(table_data)):
+        for j in range(4):
+            cell = table[(i, j)]
+            if i % 2 == 0:
+                cell.set_facecolor('#ecf0f1')
+            else:
+                cell.set_facecolor('white')
+            # Bold the group names (first column)
+            if j == 0:
+                cell.set_text_props(weight='bold')
+
+    plt.tight_layout()
+    return fig
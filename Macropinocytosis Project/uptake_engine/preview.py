@@ -0,0 +1,248 @@
+"""
+Fast preview of a condition's uptake ratios.
+
+Instead of thresholding every pixel of every image, the preview decodes a
+random subset of the images in a condition and thresholds a strided (or
+random) subsample of their pixels, or reads a cached pyramid level (see
+pyramid.py) instead of the full-resolution image. Each ratio is reported with a confidence
+interval so a first look at a plate can be trusted only as far as it should.
+
+Usage (from the "Macropinocytosis Project" folder):
+    python -m uptake_engine.preview "2026-01-15 Macropinocytosis KO Lines FITC Assay/10x/PELP1 10x"
+"""
+import os
+import sys
+import argparse
+import numpy as np
+from scipy.stats import t as t_dist
+
+from .engine import DEFAULT_THRESHOLD, DEFAULT_BLACK_THRESHOLD
+from .dataset import folder_images
+from .metrics import signal_mask, cell_mask
+from .pyramid import load_level
+
+## ================= CONFIGURATION ================= ##
+PREVIEW_STRIDE = 8               # Keep every 8th pixel in each direction (1/64 of the field)
+PREVIEW_MAX_IMAGES = 4           # Images decoded per condition
+CONFIDENCE = 0.95
+MAX_RELATIVE_HALF_WIDTH = 0.25   # Flag when the CI half-width exceeds 25% of the estimate...
+MIN_ABSOLUTE_HALF_WIDTH = 0.002  # ...unless it is below this absolute floor
+
+## ================= SAMPLING ================= ##
+def subsample_pixels(img, stride=PREVIEW_STRIDE, n_random=None, rng=None):
+    """
+    Return an (N, C) array of sampled pixels.
+
+    Parameters:
+    - img: (H, W, C) image
+    - stride: take every stride-th row and column (ignored when n_random is set)
+    - n_random: draw this many pixels uniformly at random instead
+    - rng: numpy Generator or seed for random sampling
+    """
+    if n_random:
+        rng = np.random.default_rng(rng)
+        h, w = img.shape[:2]
+        rows = rng.integers(0, h, n_random)
+        cols = rng.integers(0, w, n_random)
+        return img[rows, cols, :3]
+    sample = img[::stride, ::stride, :3]
+    return sample.reshape(-1, sample.shape[-1])
+
+def wilson_interval(successes, n, confidence=CONFIDENCE):
+    """
+    Wilson score interval for a binomial proportion.
+
+    Returns:
+        (estimate, lower, upper, variance)
+    """
+    if n == 0:
+        return 0.0, 0.0, 1.0, 0.25
+    z = _normal_quantile(confidence)
+    p = successes / n
+    denom = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denom
+    half = z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return p, float(max(0.0, centre - half)), float(min(1.0, centre + half)), p * (1 - p) / n
+
+def ratio_interval(n_signal, n_cell, n_overlap, confidence=CONFIDENCE):
+    """
+    Delta-method interval for signal_area / cell_area from one pixel sample.
+
+    The full analysis does not restrict signal pixels to cell pixels, so the
+    ratio can exceed 1 and is not a binomial proportion. Its linearised
+    variance is sum((s_i - R c_i)^2) / n_cell^2, where n_overlap counts the
+    sampled pixels that are both signal and cell.
+
+    Returns:
+        (estimate, lower, upper, variance)
+    """
+    if n_cell == 0:
+        return 0.0, 0.0, 1.0, 0.25
+    z = _normal_quantile(confidence)
+    ratio = n_signal / n_cell
+    variance = max(n_signal - 2 * ratio * n_overlap + ratio * ratio * n_cell, 0) / (n_cell * n_cell)
+    half = z * np.sqrt(variance)
+    return ratio, float(max(0.0, ratio - half)), float(ratio + half), variance
+
+def _normal_quantile(confidence):
+    return t_dist.ppf(0.5 + confidence / 2, df=np.inf)
+
+## ================= PREVIEW ================= ##
+def preview_image(img, channel="green", threshold=DEFAULT_THRESHOLD,
+                  black_threshold=DEFAULT_BLACK_THRESHOLD, stride=PREVIEW_STRIDE,
+                  n_random=None, rng=None, confidence=CONFIDENCE):
+    """
+    Estimate the area fractions of one image from a pixel subsample.
+
+    Signal pixels are counted as in analyze_image, without intersecting them
+    with the cell mask, so the ratio matches compute_ratio on the full image
+    and gets a delta-method interval (see ratio_interval) rather than a
+    Wilson interval like the area fractions.
+
+    Returns:
+        dict mapping signal_fraction, cell_fraction and ratio to
+        (estimate, lower, upper, variance) tuples, plus n_pixels
+    """
+    pixels = subsample_pixels(img, stride, n_random, rng)
+    n = len(pixels)
+    cells = cell_mask(pixels, black_threshold)
+    n_cell = int(cells.sum())
+    signal = signal_mask(pixels, channel, threshold)
+    n_signal = int(signal.sum())
+    n_overlap = int((signal & cells).sum())
+    return {
+        "signal_fraction": wilson_interval(n_signal, n, confidence),
+        "cell_fraction": wilson_interval(n_cell, n, confidence),
+        "ratio": ratio_interval(n_signal, n_cell, n_overlap, confidence),
+        "n_pixels": n,
+    }
+
+def combine_estimates(estimates, variances, n_total, confidence=CONFIDENCE):
+    """
+    Combine per-image estimates into a condition mean with a t interval.
+
+    The between-image spread is scaled by the finite population correction
+    (k of n_total images were sampled) and the within-image sampling variance
+    is added on top, which is slightly conservative.
+
+    Returns:
+        (mean, lower, upper)
+    """
+    k = len(estimates)
+    if k == 0:
+        return 0.0, 0.0, 1.0
+    mean = float(np.mean(estimates))
+    within = np.sum(variances) / (k * k)
+    if k == 1:
+        if n_total > 1:
+            return mean, 0.0, 1.0  # No way to estimate between-image spread
+        se = np.sqrt(within)
+        half = _normal_quantile(confidence) * se
+    else:
+        fpc = (n_total - k) / (n_total - 1) if n_total > 1 else 0.0
+        se = np.sqrt(fpc * np.var(estimates, ddof=1) / k + within)
+        half = t_dist.ppf(0.5 + confidence / 2, df=k - 1) * se
+    return mean, float(max(0.0, mean - half)), float(min(1.0, mean + half))
+
+def is_uncertain(mean, lower, upper, max_relative_half_width=MAX_RELATIVE_HALF_WIDTH,
+                 min_absolute_half_width=MIN_ABSOLUTE_HALF_WIDTH):
+    """True when the interval is too wide to trust the preview estimate"""
+    half_width = (upper - lower) / 2
+    return half_width > max(max_relative_half_width * abs(mean), min_absolute_half_width)
+
+def preview_condition(folder_path, channel="green", threshold=DEFAULT_THRESHOLD,
+                      black_threshold=DEFAULT_BLACK_THRESHOLD, stride=PREVIEW_STRIDE,
+                      n_random=None, max_images=PREVIEW_MAX_IMAGES, seed=0,
+                      confidence=CONFIDENCE,
+                      max_relative_half_width=MAX_RELATIVE_HALF_WIDTH, pyramid_level=0):
+    """
+    Approximate analyze_condition for a quick first look at a condition.
+
+    Parameters:
+    - folder_path: condition folder containing the TIFF images
+    - channel: "green" (FITC) or "yellow" (TMR)
+    - threshold / black_threshold: same thresholds as the full analysis
+    - stride: pixel stride of the subsample
+    - n_random: use this many random pixels per image instead of a stride
+    - max_images: number of images decoded (None = all of them)
+    - seed: seed for the image and pixel selection
+    - confidence: confidence level of the reported intervals
+    - max_relative_half_width: flag the condition above this relative CI half-width
+    - pyramid_level: read this pyramid level instead of the full image
+      (e.g. level 3 with stride=1 and max_images=None covers every image cheaply).
+      Averaged pixels are thresholded, so dim puncta can drop out; that
+      smoothing bias is not part of the reported interval.
+
+    Returns:
+        dict with n_images, n_sampled, signal_fraction / cell_fraction / ratio
+        as (mean, lower, upper) tuples, an "uncertain" flag and per-image results
+    """
+    filenames = folder_images(folder_path)
+    rng = np.random.default_rng(seed)
+    if max_images is not None and len(filenames) > max_images:
+        picked = np.sort(rng.choice(len(filenames), max_images, replace=False))
+        sampled = [filenames[i] for i in picked]
+    else:
+        sampled = filenames
+
+    images = []
+    for filename in sampled:
+        img = load_level(os.path.join(folder_path, filename), pyramid_level)
+        result = preview_image(img, channel, threshold, black_threshold,
+                               stride, n_random, rng, confidence)
+        result["filename"] = filename
+        images.append(result)
+
+    summary = {
+        "folder": folder_path,
+        "n_images": len(filenames),
+        "n_sampled": len(sampled),
+        "images": images,
+    }
+    for key in ("signal_fraction", "cell_fraction", "ratio"):
+        summary[key] = combine_estimates([r[key][0] for r in images],
+                                         [r[key][3] for r in images],
+                                         len(filenames), confidence)
+    summary["uncertain"] = (not images) or is_uncertain(*summary["ratio"],
+                                                        max_relative_half_width)
+    return summary
+
+def print_preview_table(summaries):
+    """Print one line per previewed condition, flagging uncertain estimates"""
+    print("\n" + "="*80)
+    print("PREVIEW (approximate)")
+    print("="*80)
+    print(f"{'Condition':<25}{'n':>8}{'Ratio':>10}{'CI':>22}{'Cell Frac':>12}")
+    print("-" * 80)
+    for s in summaries:
+        label = os.path.basename(os.path.normpath(s["folder"]))
+        ratio, lo, hi = s["ratio"]
+        n = f"{s['n_sampled']}/{s['n_images']}"
+        flag = "  ⚠️ uncertain" if s["uncertain"] else ""
+        print(f"{label:<25}{n:>8}{ratio:>10.4f}{f'[{lo:.4f}, {hi:.4f}]':>22}"
+              f"{s['cell_fraction'][0]:>12.4f}{flag}")
+    print("="*80 + "\n")
+
+## ================= MAIN ================= ##
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Approximate uptake ratios for a quick look at a plate.")
+    parser.add_argument("folders", nargs="+", help="condition folders to preview")
+    parser.add_argument("--channel", choices=["green", "yellow"], default="green")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--black-threshold", type=float, default=DEFAULT_BLACK_THRESHOLD)
+    parser.add_argument("--stride", type=int, default=PREVIEW_STRIDE)
+    parser.add_argument("--random-pixels", type=int, default=None)
+    parser.add_argument("--max-images", type=int, default=PREVIEW_MAX_IMAGES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--level", type=int, default=0, help="pyramid level to read (0 = full image)")
+    args = parser.parse_args(argv)
+
+    summaries = [preview_condition(folder, args.channel, args.threshold, args.black_threshold,
+                                   args.stride, args.random_pixels, args.max_images, args.seed,
+                                   pyramid_level=args.level)
+                 for folder in args.folders]
+    print_preview_table(summaries)
+    return 1 if any(s["uncertain"] for s in summaries) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""
+Multi-resolution pyramid / thumbnail store.
+
+Every image gets a stack of 2x mean-downsampled levels (level 1 = half size,
+level 2 = quarter size, ...) down to the first level whose longest side is
+close to THUMBNAIL_SIZE. Levels are written once, in parallel, as .npy files
+in the condition's .uptake_cache/pyramids folder and are memory-mapped on
+read, so a preview, contact sheet or figure inset only touches the pixels of
+the level it asks for instead of decoding the 2432x2032 TIFF.
+
+Usage (from the "Macropinocytosis Project" folder):
+    python -m uptake_engine.pyramid "2026-02-03 Macropinocytosis WT PELPi FITC 18-Hour Assay"
+"""
+import os
+import sys
+import shutil
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from .engine import load_image
+from .archive import load_archived
+from .cache import cache_path, is_fresh, walk_image_folders
+
+## ================= CONFIGURATION ================= ##
+THUMBNAIL_SIZE = 256  # Longest side (px) of the smallest level we need
+PYRAMID_KIND = "pyramids"
+
+## ================= DOWNSAMPLING ================= ##
+def downsample2x(img):
+    """
+    Halve an (H, W, ...) image by averaging 2x2 blocks (odd edges are dropped).
+    The result keeps the input dtype.
+    """
+    h, w = img.shape[0] // 2 * 2, img.shape[1] // 2 * 2
+    # Four strided adds avoid the copy a reshape of a channel view would make.
+    # Integers accumulate in a wider type of the same signedness, so signed
+    # (e.g. background-subtracted int16) planes keep their negative values
+    if np.issubdtype(img.dtype, np.signedinteger):
+        acc = img[0:h:2, 0:w:2].astype(np.int16 if img.dtype.itemsize == 1 else np.int64)
+    elif np.issubdtype(img.dtype, np.integer):
+        acc = img[0:h:2, 0:w:2].astype(np.uint16 if img.dtype.itemsize == 1 else np.uint64)
+    else:
+        acc = img[0:h:2, 0:w:2].astype(np.float64 if img.dtype == np.float64 else np.float32)
+    acc += img[1:h:2, 0:w:2]
+    acc += img[0:h:2, 1:w:2]
+    acc += img[1:h:2, 1:w:2]
+    if np.issubdtype(img.dtype, np.integer):
+        acc += 2
+        acc //= 4
+    else:
+        acc *= 0.25
+    return acc.astype(img.dtype, copy=False)
+
+def build_levels(img, thumbnail_size=THUMBNAIL_SIZE):
+    """
+    Downsampled levels 1..n of an image; the last level is the first one whose
+    longest side is at most twice thumbnail_size.
+    """
+    levels = []
+    current = img
+    while max(current.shape[:2]) >= 2 * thumbnail_size:
+        current = downsample2x(current)
+        levels.append(current)
+    return levels
+
+## ================= STORE ================= ##
+def pyramid_dir(image_path):
+    """Folder holding the cached levels of one image"""
+    return cache_path(image_path, PYRAMID_KIND)
+
+def level_path(image_path, level):
+    return os.path.join(pyramid_dir(image_path), f"level{level}.npy")
+
+def cached_levels(image_path):
+    """Sorted level numbers available for an image (empty when stale or missing)"""
+    folder = pyramid_dir(image_path)
+    if not is_fresh(folder, image_path):
+        return []
+    names = [f for f in os.listdir(folder) if f.startswith("level") and f.endswith(".npy")]
+    return sorted(int(f[len("level"):-len(".npy")]) for f in names)
+
+def build_pyramid(image_path, thumbnail_size=THUMBNAIL_SIZE, force=False):
+    """
+    Build and store the pyramid of one image unless a fresh one exists.
+
+    Returns:
+        number of levels stored (0 when the cache was already fresh)
+    """
+    if not force and cached_levels(image_path):
+        return 0
+    folder = pyramid_dir(image_path)
+    # Build into a temporary folder and swap it in, so readers never see a
+    # partially written pyramid
+    tmp = folder + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    levels = build_levels(load_image(image_path), thumbnail_size)
+    for i, level in enumerate(levels, start=1):
+        np.save(os.path.join(tmp, f"level{i}.npy"), level)
+    shutil.rmtree(folder, ignore_errors=True)
+    os.replace(tmp, folder)
+    return len(levels)
+
+def build_pyramids(image_paths, workers=None, thumbnail_size=THUMBNAIL_SIZE, force=False):
+    """
+    Build pyramids for many images in a process pool.
+
+    Parameters:
+    - image_paths: list of image files
+    - workers: number of processes (None = one per CPU, 1 = run inline)
+
+    Returns:
+        number of images that were (re)built
+    """
+    todo = [p for p in image_paths if force or not cached_levels(p)]
+    if workers == 1 or len(todo) <= 1:
+        built = [build_pyramid(p, thumbnail_size, force) for p in todo]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            built = list(pool.map(build_pyramid, todo,
+                                  [thumbnail_size] * len(todo), [force] * len(todo)))
+    return sum(1 for n in built if n)
+
+def build_experiment_pyramids(base_folder, workers=None, thumbnail_size=THUMBNAIL_SIZE, force=False):
+    """Build pyramids for every image under an experiment folder"""
+    image_paths = [os.path.join(folder, f)
+                   for folder, filenames in walk_image_folders(base_folder)
+                   for f in filenames]
+    return build_pyramids(image_paths, workers, thumbnail_size, force)
+
+## ================= READING ================= ##
+def load_level(image_path, level, mmap=True):
+    """
+    Read one pyramid level (level 0 = the full-resolution image).
+    Falls back to decoding the original and downsampling when no cache exists.
+    """
+    if level == 0:
+        return load_image(image_path)
+    if level in cached_levels(image_path):
+        return np.load(level_path(image_path, level), mmap_mode="r" if mmap else None)
+    img = load_image(image_path)
+    for _ in range(level):
+        img = downsample2x(img)
+    return img
+
+def level_for_size(image_path, size=THUMBNAIL_SIZE):
+    """Deepest cached level whose longest side is still at least size (0 if none)"""
+    best = 0
+    for level in cached_levels(image_path):
+        shape = np.load(level_path(image_path, level), mmap_mode="r").shape
+        if max(shape[:2]) >= size:
+            best = level
+    return best
+
+def load_thumbnail(image_path, size=THUMBNAIL_SIZE):
+    """Smallest cached level that is at least `size` pixels on its longest side"""
+    return load_level(image_path, level_for_size(image_path, size))
+
+def read_region(image_path, level, y, x, height, width):
+    """
+    Read a window of a level; only the touched rows are paged in from disk,
+    and at level 0 only the archive tiles it covers are decoded (see
+    archive.load_archived).
+    """
+    if level == 0:
+        return load_archived(image_path, region=(y, y + height, x, x + width))
+    return np.asarray(load_level(image_path, level)[y:y + height, x:x + width])
+
+## ================= MAIN ================= ##
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build cached image pyramids / thumbnails.")
+    parser.add_argument("folders", nargs="+", help="experiment or condition folders")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--thumbnail-size", type=int, default=THUMBNAIL_SIZE)
+    parser.add_argument("--force", action="store_true", help="rebuild even if the cache is fresh")
+    args = parser.parse_args(argv)
+
+    for folder in args.folders:
+        built = build_experiment_pyramids(folder, args.workers, args.thumbnail_size, args.force)
+        print(f"✓ {folder}: {built} pyramids built")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Image quality control: focus, saturation and empty-field detection.
+
+Blurry, saturated or nearly empty fields pull down group means without any
+warning: compute_total_cell_area happily returns a tiny area and the ratio
+becomes 0 or extreme. This stage runs in the same analyze_image pass as the
+uptake metrics and reports, per field:
+
+- focus: variance of the Laplacian of the brightest channel at half
+  resolution (sharp edges give high variance)
+- saturated_fraction: fraction of cell pixels whose red or green channel sits
+  at the detector maximum (4095 for the Leica 12-bit data when stored in
+  16 bits, the dtype maximum otherwise; the exported TIFFs are 8-bit)
+- foreground_fraction: cell area / field area
+
+qc_pass is False when any check fails and qc_flags names the failed checks.
+apply_qc drops (or just reports) failing rows before statistics; the
+representative selector already skips rows with qc_pass False.
+
+Usage (from the "Macropinocytosis Project" folder):
+    python -m uptake_engine.qc "2026-01-15 Macropinocytosis KO Lines FITC Assay/10x/PELP1 10x"
+"""
+import os
+import sys
+import argparse
+import numpy as np
+
+from .engine import DEFAULT_THRESHOLD, DEFAULT_BLACK_THRESHOLD
+from .pyramid import downsample2x
+from .results import condition_results
+
+## ================= CONFIGURATION ================= ##
+LEICA_MAX_VALUE = 4095        # 12-bit detector maximum from the Leica metadata
+MIN_FOCUS = 100.0             # Laplacian variance (8-bit units, half resolution); in-focus fields are > 400
+MAX_SATURATED_FRACTION = 0.5  # Of cell pixels; the contrast-stretched 8-bit exports routinely clip 5-45%
+MIN_FOREGROUND_FRACTION = 0.01
+
+## ================= MEASURES ================= ##
+def saturation_level(dtype):
+    """Detector maximum for an image dtype"""
+    if dtype == np.uint16:
+        return LEICA_MAX_VALUE
+    if np.issubdtype(dtype, np.integer):
+        return np.iinfo(dtype).max
+    return 1.0
+
+def focus_measure(img):
+    """Variance of the Laplacian of the brightest channel at half resolution, scaled to 8-bit"""
+    small = downsample2x(img[..., :3])
+    plane = np.maximum(np.maximum(small[..., 0], small[..., 1]), small[..., 2]).astype(np.float32)
+    if img.dtype != np.uint8:
+        plane *= 255.0 / saturation_level(img.dtype)
+    # 5-point Laplacian on the interior
+    laplacian = plane[1:-1, :-2] + plane[1:-1, 2:] + plane[:-2, 1:-1] + plane[2:, 1:-1]
+    laplacian -= 4 * plane[1:-1, 1:-1]
+    return float(laplacian.var())
+
+def saturated_fraction(img, mask):
+    """Fraction of masked pixels with red or green at the detector maximum"""
+    if not mask.any():
+        return 0.0
+    level = saturation_level(img.dtype)
+    saturated = (img[..., 0] >= level) | (img[..., 1] >= level)
+    return float(np.count_nonzero(saturated & mask) / np.count_nonzero(mask))
+
+def qc_verdict(focus, saturated, foreground, min_focus=MIN_FOCUS,
+               max_saturated=MAX_SATURATED_FRACTION, min_foreground=MIN_FOREGROUND_FRACTION):
+    """
+    QC verdict of one field from its three measures.
+
+    Returns:
+        dict: focus, saturated_fraction, foreground_fraction, qc_flags
+        (names of failed checks) and qc_pass
+    """
+    result = {"focus": focus, "saturated_fraction": saturated, "foreground_fraction": foreground}
+    flags = []
+    if focus < min_focus:
+        flags.append("blurry")
+    if saturated > max_saturated:
+        flags.append("saturated")
+    if foreground < min_foreground:
+        flags.append("empty")
+    result["qc_flags"] = flags
+    result["qc_pass"] = not flags
+    return result
+
+def qc_metrics(img, mask, min_focus=MIN_FOCUS, max_saturated=MAX_SATURATED_FRACTION,
+               min_foreground=MIN_FOREGROUND_FRACTION):
+    """QC measures and verdict of one field (see qc_verdict)"""
+    return qc_verdict(focus_measure(img), saturated_fraction(img, mask),
+                      float(np.count_nonzero(mask) / mask.size),
+                      min_focus, max_saturated, min_foreground)
+
+## ================= STAGE ================= ##
+def image_qc(img, context):
+    """analyze_image stage: focus, saturation and foreground checks"""
+    return qc_metrics(img, context["cell_mask"])
+
+def apply_qc(rows, exclude=True, label=None):
+    """
+    Report fields that failed QC and, when exclude is set, drop them.
+
+    Returns:
+        rows to use for statistics
+    """
+    failed = [row for row in rows if not row.get("qc_pass", True)]
+    for row in failed:
+        action = "excluded" if exclude else "flagged"
+        prefix = f"{label}: " if label else ""
+        print(f"⚠️  QC {action}: {prefix}{row['filename']} ({', '.join(row['qc_flags'])})")
+    return [row for row in rows if row.get("qc_pass", True)] if exclude else rows
+
+## ================= MAIN ================= ##
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Focus, saturation and empty-field QC per condition.")
+    parser.add_argument("folders", nargs="+", help="condition folders")
+    parser.add_argument("--channel", choices=["green", "yellow"], default="green")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--black-threshold", type=float, default=DEFAULT_BLACK_THRESHOLD)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    print("\n" + "="*80)
+    print("IMAGE QC")
+    print("="*80)
+    print(f"{'Condition':<25}{'n':>5}{'Failed':>8}{'Focus':>10}{'Saturated':>12}{'Foreground':>12}")
+    print("-" * 80)
+    for folder in args.folders:
+        rows = condition_results(folder, args.channel, args.threshold, args.black_threshold,
+                                 args.workers, stages=(image_qc,))
+        label = os.path.basename(os.path.normpath(folder))
+        if not rows:
+            print(f"{label:<25}{0:>5}")
+            continue
+        failed = sum(not row["qc_pass"] for row in rows)
+        focus = np.median([row["focus"] for row in rows])
+        saturated = np.mean([row["saturated_fraction"] for row in rows])
+        foreground = np.mean([row["foreground_fraction"] for row in rows])
+        print(f"{label:<25}{len(rows):>5}{failed:>8}{focus:>10.1f}{saturated:>12.4f}{foreground:>12.3f}")
+    print("="*80 + "\n")
+    for folder in args.folders:
+        rows = condition_results(folder, args.channel, args.threshold, args.black_threshold,
+                                 args.workers, stages=(image_qc,))
+        apply_qc(rows, exclude=False, label=os.path.basename(os.path.normpath(folder)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+"""
+Channel registration by FFT phase correlation.
+
+At 63x a chromatic shift of a pixel or two between the red and green planes
+changes how much (R + G) / 2 passes the yellow threshold. This module
+estimates the sub-pixel offset of each channel relative to green with phase
+correlation on a central crop of a downsampled pyramid level (a few tens of
+ms per field), takes the
+median over a session's fields (the shift is a property of the optics, not
+of the sample) and caches it per magnification folder in
+.uptake_cache/registration.
+
+ChannelRegistration is the matching preprocessing step: it shifts the
+channels by the cached offsets right after decode, with plain slicing for
+integer offsets and a bilinear blend of four slices otherwise.
+
+Usage (from the "Macropinocytosis Project" folder):
+    python -m uptake_engine.registration "2026-01-15 Macropinocytosis KO Lines FITC Assay/63x"
+    analyze_condition(folder, "yellow", preprocess=(ChannelRegistration(".../63x"),))
+"""
+import os
+import sys
+import json
+import argparse
+import numpy as np
+
+from .engine import image_file
+from .cache import cache_dir, walk_image_folders
+from .pyramid import load_level
+
+## ================= CONFIGURATION ================= ##
+REGISTRATION_KIND = "registration"
+REGISTRATION_LEVEL = 1        # Pyramid level the offsets are estimated at (1/2 resolution)
+REFERENCE_CHANNEL = 1         # Green
+MOVING_CHANNELS = (0,)        # Red; the blue nuclear plane is not used by the uptake metrics
+REGISTRATION_WINDOW = 512     # Central crop (level px) the FFT runs on; a power of two keeps it fast
+MAX_CHANNEL_SHIFT = 8         # Full-resolution px; chromatic shifts are small, so only this window is searched
+MIN_PEAK = 0.05               # Phase-correlation peak below which a field's estimate is ignored
+                              # (unrelated planes peak at ~0.02)
+MIN_SUBPIXEL_SHIFT = 0.1      # Full-resolution px; smaller fractional parts are rounded
+OFFSET_DECIMALS = 2           # Offsets are applied (and name the step) rounded to 0.01 px
+
+## ================= ESTIMATION ================= ##
+def phase_correlation(reference, moving, max_shift=None):
+    """
+    Sub-pixel shift that aligns moving onto reference.
+
+    Both planes are Hann-windowed; the peak of the normalised cross-power
+    spectrum (searched within +-max_shift px when given) is refined with a
+    parabola through its neighbours on each axis.
+
+    Returns:
+        (dy, dx, peak): shift to apply to moving (np.roll convention) and the
+        height of the correlation peak (1 = identical up to a shift)
+    """
+    window = np.outer(np.hanning(reference.shape[0]), np.hanning(reference.shape[1])).astype(np.float32)
+    a = np.fft.rfft2((reference - reference.mean()) * window)
+    b = np.fft.rfft2((moving - moving.mean()) * window)
+    cross = a * np.conj(b)
+    cross /= np.maximum(np.abs(cross), 1e-12)
+    surface = np.fft.irfft2(cross, s=reference.shape)
+    if max_shift is None:
+        py, px = np.unravel_index(np.argmax(surface), surface.shape)
+    else:
+        # Search the (2m + 1)^2 shifts around zero, which wrap around the corners
+        m = int(np.ceil(max_shift))
+        ys = np.arange(-m, m + 1) % surface.shape[0]
+        xs = np.arange(-m, m + 1) % surface.shape[1]
+        iy, ix = np.unravel_index(np.argmax(surface[np.ix_(ys, xs)]), (ys.size, xs.size))
+        py, px = ys[iy], xs[ix]
+    peak = float(surface[py, px])
+
+    def refine(minus, centre, plus):
+        denominator = minus - 2 * centre + plus
+        return 0.5 * (minus - plus) / denominator if denominator else 0.0
+
+    h, w = surface.shape
+    dy = py + refine(surface[py - 1, px], peak, surface[(py + 1) % h, px])
+    dx = px + refine(surface[py, px - 1], peak, surface[py, (px + 1) % w])
+    # Wrap to the signed range
+    dy = dy - h if dy > h / 2 else dy
+    dx = dx - w if dx > w / 2 else dx
+    return float(dy), float(dx), peak
+
+def channel_offsets(img, level=0, channels=MOVING_CHANNELS):
+    """
+    Offsets of the moving channels relative to green, in full-resolution px.
+
+    Parameters:
+    - img: (H, W, C) image, already downsampled to the given pyramid level;
+      only its central REGISTRATION_WINDOW crop is correlated
+    - level: pyramid level of img (offsets are scaled by 2 ** level)
+
+    Returns:
+        {channel: (dy, dx, peak)}
+    """
+    h, w = img.shape[:2]
+    top, left = max(0, (h - REGISTRATION_WINDOW) // 2), max(0, (w - REGISTRATION_WINDOW) // 2)
+    img = img[top:top + REGISTRATION_WINDOW, left:left + REGISTRATION_WINDOW]
+    reference = img[..., REFERENCE_CHANNEL].astype(np.float32)
+    scale = 2 ** level
+    offsets = {}
+    for c in channels:
+        dy, dx, peak = phase_correlation(reference, img[..., c].astype(np.float32),
+                                         MAX_CHANNEL_SHIFT / scale)
+        offsets[c] = (dy * scale, dx * scale, peak)
+    return offsets
+
+def estimate_offsets(image_paths, level=REGISTRATION_LEVEL, channels=MOVING_CHANNELS):
+    """
+    Per-field offsets and their session median.
+
+    Returns:
+        (median, per_image): median is {channel: [dy, dx]} over fields with a
+        usable correlation peak, per_image is {path: {channel: [dy, dx, peak]}}
+    """
+    per_image = {}
+    for path in image_paths:
+        offsets = channel_offsets(np.asarray(load_level(path, level)), level, channels)
+        per_image[path] = {c: list(v) for c, v in offsets.items()}
+    median = {}
+    for c in channels:
+        usable = [v[:2] for v in (o[c] for o in per_image.values()) if v[2] >= MIN_PEAK]
+        median[c] = np.median(usable, axis=0).tolist() if usable else [0.0, 0.0]
+    return median, per_image
+
+## ================= CACHE ================= ##
+def offsets_path(objective_folder):
+    """Cached offsets of one magnification folder (e.g. ".../63x")"""
+    return os.path.join(cache_dir(objective_folder, REGISTRATION_KIND), "offsets.json")
+
+def build_offsets(objective_folder, force=False):
+    """
+    Estimate and cache the channel offsets of a magnification folder, unless
+    a cache newer than every image in it already exists.
+
+    Returns:
+        {channel: (dy, dx)} median offsets in full-resolution px
+    """
+    path = offsets_path(objective_folder)
+    image_paths = [os.path.join(folder, f)
+                   for folder, filenames in walk_image_folders(objective_folder)
+                   for f in filenames]
+    if (not force and os.path.exists(path) and image_paths
+            and os.path.getmtime(path) >= max(os.path.getmtime(image_file(p)) for p in image_paths)):
+        with open(path) as f:
+            cached = json.load(f)
+        return {int(c): tuple(v) for c, v in cached["median"].items()}
+
+    median, per_image = estimate_offsets(image_paths)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({
+            "level": REGISTRATION_LEVEL,
+            "median": {str(c): v for c, v in median.items()},
+            "per_image": {os.path.relpath(p, objective_folder): {str(c): v for c, v in o.items()}
+                          for p, o in per_image.items()},
+        }, f, indent=1)
+    os.replace(tmp, path)
+    return {c: tuple(v) for c, v in median.items()}
+
+## ================= SHIFTING ================= ##
+def shift_integer(plane, dy, dx):
+    """Shift a 2D plane by whole pixels, filling the uncovered border with 0"""
+    out = np.zeros_like(plane)
+    h, w = plane.shape
+    src_y, dst_y = (slice(0, h - dy), slice(dy, h)) if dy >= 0 else (slice(-dy, h), slice(0, h + dy))
+    src_x, dst_x = (slice(0, w - dx), slice(dx, w)) if dx >= 0 else (slice(-dx, w), slice(0, w + dx))
+    out[dst_y, dst_x] = plane[src_y, src_x]
+    return out
+
+def shift_plane(plane, dy, dx):
+    """
+    Shift a 2D plane by (dy, dx) px. Offsets within MIN_SUBPIXEL_SHIFT of a
+    whole pixel use one slice copy; others blend four whole-pixel shifts.
+    """
+    ry, rx = round(dy), round(dx)
+    if abs(dy - ry) < MIN_SUBPIXEL_SHIFT and abs(dx - rx) < MIN_SUBPIXEL_SHIFT:
+        return shift_integer(plane, int(ry), int(rx))
+    y0, x0 = int(np.floor(dy)), int(np.floor(dx))
+    fy, fx = dy - y0, dx - x0
+    source = plane.astype(np.float32)
+    blended = ((1 - fy) * (1 - fx)) * shift_integer(source, y0, x0)
+    blended += ((1 - fy) * fx) * shift_integer(source, y0, x0 + 1)
+    blended += (fy * (1 - fx)) * shift_integer(source, y0 + 1, x0)
+    blended += (fy * fx) * shift_integer(source, y0 + 1, x0 + 1)
+    if np.issubdtype(plane.dtype, np.integer):
+        np.rint(blended, out=blended)
+    return blended.astype(plane.dtype)
+
+## ================= PREPROCESSING STEP ================= ##
+class ChannelRegistration:
+    """
+    Preprocessing step: shift the moving channels onto green by the cached
+    session offsets. Only the folder path is pickled; offsets are read (or
+    estimated) on first use in each process.
+
+    The step's name (which keys the result store) carries the offsets, e.g.
+    "reg0+0.52-1.25", so results computed before the offsets were
+    re-estimated are never served for the new ones.
+    """
+    def __init__(self, objective_folder):
+        self.objective_folder = objective_folder
+        self._offsets = None
+
+    @property
+    def name(self):
+        self._load_offsets()
+        return "reg" + "".join(f"{c}{dy:+.{OFFSET_DECIMALS}f}{dx:+.{OFFSET_DECIMALS}f}"
+                               for c, (dy, dx) in sorted(self._offsets.items()))
+
+    def _load_offsets(self):
+        # + 0.0 turns -0.0 into 0.0, so the same shift always gets the same name
+        self._offsets = {c: (round(dy, OFFSET_DECIMALS) + 0.0, round(dx, OFFSET_DECIMALS) + 0.0)
+                         for c, (dy, dx) in build_offsets(self.objective_folder).items()}
+
+    def __getstate__(self):
+        return {"objective_folder": self.objective_folder}
+
+    def __setstate__(self, state):
+        self.__init__(state["objective_folder"])
+
+    def __call__(self, img):
+        if self._offsets is None:
+            self._load_offsets()
+        out = img
+        for c, (dy, dx) in self._offsets.items():
+            if abs(dy) < MIN_SUBPIXEL_SHIFT and abs(dx) < MIN_SUBPIXEL_SHIFT:
+                continue
+            if out is img:
+                out = img.copy()
+            out[..., c] = shift_plane(img[..., c], dy, dx)
+        return out
+
+## ================= MAIN ================= ##
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estimate and cache per-objective channel offsets.")
+    parser.add_argument("folders", nargs="+", help="magnification folders (e.g. .../63x)")
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args(argv)
+
+    for folder in args.folders:
+        offsets = build_offsets(folder, args.force)
+        shifts = ", ".join(f"channel {c}: dy={dy:+.2f}, dx={dx:+.2f}" for c, (dy, dx) in offsets.items())
+        print(f"💾 {folder}: {shifts} (px, relative to green)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
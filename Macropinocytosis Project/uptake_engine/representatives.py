@@ -0,0 +1,159 @@
+"""
+Automatic "Representative Images" selection.
+
+Ranks the images of every condition by how close their stored ratio is to
+the condition's mean or median, after dropping outliers and QC failures,
+and exports the top-k per condition. Only the result store is read, so no
+image is decoded for the ranking; conditions that have never been analyzed
+are reported and skipped. Exported images are copies of the TIFFs, or, for
+a TIFF retired into its archive (see archive.py), a TIFF decoded from it.
+
+Usage (from the "Macropinocytosis Project" folder):
+    python -m uptake_engine.representatives "2026-01-15 Macropinocytosis KO Lines FITC Assay" \\
+        "2026-02-03 Macropinocytosis WT PELPi FITC 18-Hour Assay" -k 3 -o "Representative Images"
+"""
+import os
+import sys
+import csv
+import shutil
+import argparse
+import numpy as np
+from PIL import Image
+
+from .engine import DEFAULT_THRESHOLD, DEFAULT_BLACK_THRESHOLD, load_image
+from .cache import walk_image_folders
+from .results import load_results
+
+## ================= CONFIGURATION ================= ##
+DEFAULT_TOP_K = 3
+OUTLIER_CUTOFF = 3.5  # Modified z-score (Iglewicz & Hoaglin) above which an image is an outlier
+
+## ================= RANKING ================= ##
+def robust_outliers(values, cutoff=OUTLIER_CUTOFF):
+    """
+    Boolean mask of values whose MAD-based modified z-score exceeds cutoff.
+    When more than half the values are equal (MAD = 0, e.g. many zero-ratio
+    fields) the mean absolute deviation, scaled by 1.2533 to estimate the
+    same sigma, is used instead.
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) < 3:
+        return np.zeros(len(values), dtype=bool)
+    median = np.median(values)
+    deviations = np.abs(values - median)
+    mad = np.median(deviations)
+    if mad > 0:
+        return 0.6745 * deviations / mad > cutoff
+    meanad = np.mean(deviations)
+    if meanad == 0:
+        return np.zeros(len(values), dtype=bool)
+    return deviations / (1.2533 * meanad) > cutoff
+
+def rank_condition(rows, center="median", metric="ratio", outlier_cutoff=OUTLIER_CUTOFF):
+    """
+    Order the usable images of a condition by distance to its center.
+
+    Parameters:
+    - rows: per-image rows from the result store
+    - center: "median" or "mean" of the usable images
+    - metric: row key to rank on
+    - outlier_cutoff: modified z-score cutoff for dropping outliers
+
+    Returns:
+        list of (distance, row) sorted closest first
+    """
+    usable = [row for row in rows if row.get("qc_pass", True)]
+    if not usable:
+        return []
+    values = np.array([row[metric] for row in usable], dtype=float)
+    keep = ~robust_outliers(values, outlier_cutoff)
+    usable = [row for row, k in zip(usable, keep) if k]
+    values = values[keep]
+    target = np.median(values) if center == "median" else np.mean(values)
+    ranked = sorted(zip(np.abs(values - target), usable), key=lambda pair: pair[0])
+    return [(float(d), row) for d, row in ranked]
+
+def select_representatives(base_folders, k=DEFAULT_TOP_K, center="median", channel="green",
+                           threshold=DEFAULT_THRESHOLD, black_threshold=DEFAULT_BLACK_THRESHOLD,
+                           metric="ratio", outlier_cutoff=OUTLIER_CUTOFF):
+    """
+    Pick the top-k representative images of every condition under base_folders.
+
+    Returns:
+        dict mapping condition folder to a list of (distance, row); conditions
+        without stored results map to None
+    """
+    selection = {}
+    for base_folder in base_folders:
+        for folder, filenames in walk_image_folders(base_folder):
+            stored = load_results(folder, channel, threshold, black_threshold)
+            rows = [stored[f] for f in filenames if f in stored]
+            if not rows:
+                selection[folder] = None
+                continue
+            selection[folder] = rank_condition(rows, center, metric, outlier_cutoff)[:k]
+    return selection
+
+## ================= EXPORT ================= ##
+def export_image(image_path, destination):
+    """Copy one image into a folder, re-encoding it from its archive when the TIFF was retired"""
+    if os.path.exists(image_path):
+        shutil.copy2(image_path, destination)
+    else:
+        Image.fromarray(load_image(image_path)).save(
+            os.path.join(destination, os.path.basename(image_path)), compression="tiff_lzw")
+
+def export_representatives(selection, output_folder, root=None):
+    """
+    Copy the selected images into output_folder (mirroring the condition
+    folders relative to root) and write a representatives.csv index.
+
+    Returns:
+        path of the CSV index
+    """
+    if root is None:
+        root = os.path.commonpath([os.path.dirname(folder) for folder in selection]) if selection else ""
+    os.makedirs(output_folder, exist_ok=True)
+    index_path = os.path.join(output_folder, "representatives.csv")
+    with open(index_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["condition", "rank", "filename", "ratio", "distance"])
+        for folder, picks in selection.items():
+            if not picks:
+                continue
+            relative = os.path.relpath(folder, root)
+            destination = os.path.join(output_folder, relative)
+            os.makedirs(destination, exist_ok=True)
+            for rank, (distance, row) in enumerate(picks, start=1):
+                export_image(os.path.join(folder, row["filename"]), destination)
+                writer.writerow([relative, rank, row["filename"], f"{row['ratio']:.6f}", f"{distance:.6f}"])
+    return index_path
+
+## ================= MAIN ================= ##
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pick representative images from stored metrics.")
+    parser.add_argument("folders", nargs="+", help="experiment folders to search")
+    parser.add_argument("-k", type=int, default=DEFAULT_TOP_K)
+    parser.add_argument("--center", choices=["median", "mean"], default="median")
+    parser.add_argument("--channel", choices=["green", "yellow"], default="green")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--black-threshold", type=float, default=DEFAULT_BLACK_THRESHOLD)
+    parser.add_argument("-o", "--output", default=None, help="copy the picks into this folder")
+    args = parser.parse_args(argv)
+
+    selection = select_representatives(args.folders, args.k, args.center, args.channel,
+                                       args.threshold, args.black_threshold)
+    for folder, picks in selection.items():
+        if picks is None:
+            print(f"⚠️  No stored results (run the analysis first): {folder}")
+            continue
+        names = ", ".join(f"{row['filename']} ({row['ratio']:.4f})" for _, row in picks)
+        print(f"✓ {folder}: {names}")
+
+    if args.output:
+        index_path = export_representatives(selection, args.output)
+        print(f"💾 Representative images exported to: {args.output} ({index_path})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+from .engine import (load_image, analyze_image, stage_name, image_file,
+                     DEFAULT_THRESHOLD, DEFAULT_BLACK_THRESHOLD)
+from .cache import cache_dir
+from .dataset import folder_images
+from .pipeline import pipelined_map
+
+## ================= CONFIGURATION ================= ##
+RESULTS_KIND = "results"
+
+## ================= RESULT STORE ================= ##
+# One JSON file per (condition folder, channel, thresholds, preprocessing)
+# holding a row per image. Rows remember the size and mtime of the file they
+# were computed from, so only new or changed images are ever re-decoded, and
+# the names of the extra stages (see engine.analyze_image) whose fields they
+# hold. Image lists come from the experiment's dataset manifest when it has
+# one (see dataset.py) instead of a directory listing.
+
+def results_path(folder_path, channel="green", threshold=DEFAULT_THRESHOLD,
+                 black_threshold=DEFAULT_BLACK_THRESHOLD, preprocess=()):
+    steps = "".join(f"_{stage_name(step)}" for step in preprocess)
+    name = f"{channel}_t{threshold:g}_b{black_threshold:g}{steps}.json"
+    return os.path.join(cache_dir(folder_path, RESULTS_KIND), name)
+
+def file_signature(path):
+    """(size, mtime_ns) of an image's file, used to detect changed images"""
+    stat = os.stat(image_file(path))
+    return stat.st_size, stat.st_mtime_ns
+
+def load_results(folder_path, channel="green", threshold=DEFAULT_THRESHOLD,
+                 black_threshold=DEFAULT_BLACK_THRESHOLD, preprocess=()):
+    """Stored rows of a condition keyed by filename ({} when nothing is stored)"""
+    path = results_path(folder_path, channel, threshold, black_threshold, preprocess)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return {row["filename"]: row for row in json.load(f)}
+
+def save_results(folder_path, rows, channel="green", threshold=DEFAULT_THRESHOLD,
+                 black_threshold=DEFAULT_BLACK_THRESHOLD, preprocess=()):
+    """Write the rows of a condition (atomically, so readers never see half a file)"""
+    path = results_path(folder_path, channel, threshold, black_threshold, preprocess)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(rows, f, indent=1)
+    os.replace(tmp, path)
+
+def _make_row(path, img, channel, threshold, black_threshold, stages=(), preprocess=()):
+    size, mtime_ns = file_signature(path)
+    row = {"filename": os.path.basename(path), "size": size, "mtime_ns": mtime_ns,
+           "stages": [stage_name(stage) for stage in stages]}
+    row.update(analyze_image(img, channel, threshold, black_threshold, stages, path, preprocess))
+    return row
+
+def analyze_file(path, channel, threshold, black_threshold, stages=(), preprocess=()):
+    """Load and analyze one image into a result-store row (also used by shards.py)"""
+    return _make_row(path, load_image(path, preprocess), channel, threshold, black_threshold, stages,
+                     preprocess)
+
+def is_stale(row, path, stages=()):
+    """True when a stored row is missing, out of date or lacks a requested stage"""
+    if row is None or (row["size"], row["mtime_ns"]) != file_signature(path):
+        return True
+    return not set(stage_name(stage) for stage in stages) <= set(row.get("stages", []))
+
+def condition_results(folder_path, channel="green", threshold=DEFAULT_THRESHOLD,
+                      black_threshold=DEFAULT_BLACK_THRESHOLD, workers=1, stages=(),
+                      preprocess=(), decoders=0, pool=None):
+    """
+    Per-image results of a condition, computing only what is missing or stale.
+
+    Parameters:
+    - folder_path: condition folder containing the TIFF images
+    - channel / threshold / black_threshold: same as analyze_condition
+    - workers: processes used for the images that need decoding (None = one per CPU)
+    - stages: extra analysis stages (see engine.analyze_image); stored rows
+      that were computed without one of them are recomputed with exactly
+      the requested stages
+    - preprocess: preprocessing steps (see engine.load_image); results with
+      different preprocessing are stored separately
+    - decoders: when > 0, decode in this many separate processes and hand the
+      images to the `workers` compute processes through shared memory (see
+      pipeline.py) instead of decoding and computing in the same worker
+    - pool: an already running executor to compute in (e.g. the daemon's),
+      used instead of starting `workers` processes
+
+    Returns:
+        list of row dicts (filename, size, mtime_ns, signal_area, cell_area, ratio, ...)
+        in filename order
+    """
+    filenames = folder_images(folder_path)
+    stored = load_results(folder_path, channel, threshold, black_threshold, preprocess)
+
+    stale = []
+    for filename in filenames:
+        path = os.path.join(folder_path, filename)
+        if is_stale(stored.get(filename), path, stages):
+            stale.append(path)
+
+    if stale:
+        args = ([channel] * len(stale), [threshold] * len(stale),
+                [black_threshold] * len(stale), [stages] * len(stale), [preprocess] * len(stale))
+        if decoders and len(stale) > 1:
+            fresh = pipelined_map(stale, channel, threshold, black_threshold, stages, preprocess,
+                                  decoders, workers, make_row=_make_row)
+        elif pool is not None and len(stale) > 1:
+            fresh = list(pool.map(analyze_file, stale, *args))
+        elif workers == 1 or len(stale) == 1:
+            fresh = list(map(analyze_file, stale, *args))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                fresh = list(executor.map(analyze_file, stale, *args))
+        stored.update((row["filename"], row) for row in fresh)
+
+    rows = [stored[f] for f in filenames]
+    if stale or len(stored) != len(rows):
+        save_results(folder_path, rows, channel, threshold, black_threshold, preprocess)
+    return rows
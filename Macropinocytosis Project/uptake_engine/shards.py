@@ -0,0 +1,352 @@
+"""
+Sharded batch runs: split an experiment across nodes, merge the results.
+
+1. plan: the experiment's dataset manifest (dataset.py) lists every image
+   with its content hash; image i belongs to shard int(hash[:8], 16) % N,
+   so every node computes the same split from the manifest alone
+2. shard: a node analyzes only its images and writes
+   shard-KKK-of-NNN.json to a shared output folder: the settings, a digest
+   of the manifest, the per-image rows (as condition_results stores them)
+   and per-condition accumulators over the images that pass QC (n,
+   signal_area and cell_area sums, all integers, so they add exactly in any
+   order)
+3. merge: checks that all N shards are present and were computed with the
+   same settings and manifest, adds the accumulators, and sorts the rows by
+   (condition, filename). As in the analysis scripts, fields that fail
+   image QC are dropped (qc.apply_qc) unless the run was started with
+   --keep-failed-qc. Floating-point statistics (mean/SEM) are computed from
+   the remaining rows in that order, which is the order of a single-node
+   run, so the merged numbers are bit-identical to it. --figure draws the
+   scripts' figure (plots.create_beautiful_plot) per objective folder.
+   With --store the merged rows are written to each condition's result
+   store, so the analysis scripts, api.Experiment and the figures then read
+   them without decoding anything. Each row is re-stamped with the local
+   file's size and mtime after its content hash is checked against the
+   local copy, so nodes may read their own copies of the images.
+
+"local" runs the whole thing on one machine, with one process per shard
+standing in for the nodes.
+
+Usage (from the "Macropinocytosis Project" folder):
+    python -m uptake_engine.shards shard "<experiment>" --index 0 --count 4 --out /shared/run1
+    python -m uptake_engine.shards merge "<experiment>" /shared/run1 --store --figure merged.png
+    python -m uptake_engine.shards local "<experiment>" --count 3 --out /tmp/run1
+"""
+import os
+import sys
+import json
+import hashlib
+import argparse
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")  # Figures are only ever written to files
+import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
+
+from .engine import DEFAULT_THRESHOLD, DEFAULT_BLACK_THRESHOLD, stage_name
+from .results import analyze_file, save_results, file_signature
+from .dataset import load_manifest, update_manifest, recorded_hash, content_hash
+from .qc import apply_qc
+from .plots import create_beautiful_plot
+from .stages import STAGES, resolve_stages
+
+## ================= CONFIGURATION ================= ##
+SHARD_PATTERN = "shard-{index:03d}-of-{count:03d}.json"
+ACCUMULATORS = ("n", "signal_area", "cell_area")
+
+## ================= PLANNING ================= ##
+def manifest_images(manifest):
+    """[(condition folder, filename, hash)] of a dataset manifest, sorted"""
+    return sorted((folder, filename, entry["hash"])
+                  for folder, listing in manifest["folders"].items()
+                  for filename, entry in listing["files"].items())
+
+def manifest_digest(images):
+    """Digest of the image list, so shards of different datasets never merge"""
+    digest = hashlib.blake2b(digest_size=16)
+    for folder, filename, image_hash in images:
+        digest.update(f"{folder}\0{filename}\0{image_hash}\n".encode())
+    return digest.hexdigest()
+
+def shard_of(image_hash, count):
+    return int(image_hash[:8], 16) % count
+
+def shard_images(manifest, index, count):
+    """Images of one shard"""
+    return [image for image in manifest_images(manifest) if shard_of(image[2], count) == index]
+
+def shard_path(out_dir, index, count):
+    return os.path.join(out_dir, SHARD_PATTERN.format(index=index, count=count))
+
+## ================= SHARD ================= ##
+def run_shard(base_folder, index, count, out_dir, channel="green", threshold=DEFAULT_THRESHOLD,
+              black_threshold=DEFAULT_BLACK_THRESHOLD, stages=(), exclude_failed_qc=True):
+    """
+    Analyze the images of one shard and write its partial result file.
+
+    Parameters:
+    - base_folder: experiment folder (must have a dataset manifest)
+    - index / count: this shard and the number of shards
+    - stages: stage names (see stages.STAGES); image_qc is added when
+      excluding QC failures
+    - exclude_failed_qc: leave fields that fail image QC out of the
+      accumulators and, at the merge, the statistics
+
+    Each image is hashed before it is analyzed; a ValueError is raised when
+    the local file differs from its manifest entry, so a shard never stamps
+    a row with the hash of a file it did not decode.
+
+    Returns:
+        path of the shard file
+    """
+    manifest = load_manifest(base_folder)
+    if manifest is None:
+        raise FileNotFoundError(f"{base_folder} has no dataset manifest; run "
+                                f"`python -m uptake_engine.dataset` on it first")
+    stages = list(stages)
+    if exclude_failed_qc and "image_qc" not in stages:
+        stages.append("image_qc")
+    stage_functions = resolve_stages(stages)
+    images = manifest_images(manifest)
+    rows, accumulators = [], {}
+    for folder, filename, expected_hash in shard_images(manifest, index, count):
+        path = os.path.join(base_folder, folder, filename)
+        if content_hash(path) != expected_hash:
+            raise ValueError(f"{folder}/{filename} differs from the dataset manifest; refresh it "
+                             f"(`python -m uptake_engine.dataset`) and re-plan the shards")
+        row = analyze_file(path, channel, threshold, black_threshold, stage_functions)
+        rows.append({"folder": folder, "hash": expected_hash, **row})
+        acc = accumulators.setdefault(folder, dict.fromkeys(ACCUMULATORS, 0))
+        if exclude_failed_qc and not row.get("qc_pass", True):
+            continue
+        acc["n"] += 1
+        acc["signal_area"] += row["signal_area"]
+        acc["cell_area"] += row["cell_area"]
+
+    shard = {
+        "index": index, "count": count,
+        "settings": {"channel": channel, "threshold": threshold, "black_threshold": black_threshold,
+                     "stages": [stage_name(stage) for stage in stage_functions],
+                     "exclude_failed_qc": exclude_failed_qc},
+        "manifest": manifest_digest(images),
+        "rows": rows,
+        "accumulators": accumulators,
+    }
+    os.makedirs(out_dir, exist_ok=True)
+    path = shard_path(out_dir, index, count)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(shard, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+    return path
+
+## ================= MERGE ================= ##
+def load_shards(out_dir):
+    """All shard files of a run, checked to form one complete, consistent set"""
+    shards = []
+    for name in sorted(os.listdir(out_dir)):
+        if name.startswith("shard-") and name.endswith(".json"):
+            with open(os.path.join(out_dir, name)) as f:
+                shards.append(json.load(f))
+    if not shards:
+        raise FileNotFoundError(f"No shard files in {out_dir}")
+    count = shards[0]["count"]
+    found = sorted(shard["index"] for shard in shards if shard["count"] == count)
+    if found != list(range(count)) or len(shards) != count:
+        missing = sorted(set(range(count)) - set(found))
+        raise ValueError(f"{out_dir}: expected shards 0..{count - 1} of {count}, missing {missing} "
+                         f"(or shard files of another run)")
+    for shard in shards[1:]:
+        for key in ("settings", "manifest"):
+            if shard[key] != shards[0][key]:
+                raise ValueError(f"Shard {shard['index']} has different {key} than shard 0")
+    return shards
+
+def condition_statistics(rows, accumulators, metric="ratio"):
+    """
+    Group statistics of one condition: n, mean and SEM of the metric over
+    the rows (in filename order) and the pooled ratio of the accumulators.
+    """
+    values = [row[metric] for row in rows]
+    n = len(values)
+    return {
+        "n": n,
+        "mean": float(np.mean(values)) if n else 0.0,
+        "sem": float(np.std(values, ddof=1) / np.sqrt(n)) if n > 1 else 0.0,
+        "signal_area": accumulators["signal_area"],
+        "cell_area": accumulators["cell_area"],
+        "pooled_ratio": accumulators["signal_area"] / accumulators["cell_area"]
+                        if accumulators["cell_area"] else 0.0,
+    }
+
+def local_rows(base_folder, folder, rows):
+    """
+    Merged rows of one condition re-stamped with the local files' size and
+    mtime, so the result store takes them as fresh. Rows whose content hash
+    differs from the local copy (or whose image is missing here) are left
+    out; condition_results recomputes those.
+    """
+    stamped = []
+    for row in rows:
+        path = os.path.join(base_folder, folder, row["filename"])
+        try:
+            if recorded_hash(path) != row["hash"]:
+                print(f"⚠️  {folder}/{row['filename']}: local copy differs from the analyzed one, not stored")
+                continue
+            size, mtime_ns = file_signature(path)
+        except FileNotFoundError:
+            print(f"⚠️  {folder}/{row['filename']}: missing here, not stored")
+            continue
+        stamped.append({**row, "size": size, "mtime_ns": mtime_ns})
+    return stamped
+
+def merge_shards(out_dir, base_folder=None, store=False, metric="ratio"):
+    """
+    Merge a complete set of shard files.
+
+    Parameters:
+    - base_folder: experiment folder, needed with store=True
+    - store: write the merged rows to each condition's result store
+    - metric: per-image field the mean/SEM are computed on
+
+    Returns:
+        {condition folder: {"rows": all rows in filename order, "included":
+        the rows used for statistics (QC failures removed unless the run kept
+        them), "statistics": ...}}
+    """
+    shards = load_shards(out_dir)
+    settings = shards[0]["settings"]
+    rows, accumulators = {}, {}
+    for shard in shards:
+        for row in shard["rows"]:
+            rows.setdefault(row["folder"], []).append(row)
+        for folder, acc in shard["accumulators"].items():
+            total = accumulators.setdefault(folder, dict.fromkeys(ACCUMULATORS, 0))
+            for key in ACCUMULATORS:
+                total[key] += acc[key]
+
+    merged = {}
+    for folder in sorted(rows):
+        folder_rows = sorted(rows[folder], key=lambda row: row["filename"])
+        if store:
+            stored = [{k: v for k, v in row.items() if k not in ("folder", "hash")}
+                      for row in local_rows(base_folder, folder, folder_rows)]
+            save_results(os.path.join(base_folder, folder), stored, settings["channel"],
+                         settings["threshold"], settings["black_threshold"])
+        folder_rows = [{k: v for k, v in row.items() if k not in ("folder", "hash")} for row in folder_rows]
+        included = apply_qc(folder_rows, settings["exclude_failed_qc"], label=folder)
+        if len(included) != accumulators[folder]["n"]:
+            raise ValueError(f"{folder}: {len(included)} rows but accumulators count "
+                             f"{accumulators[folder]['n']}")
+        merged[folder] = {"rows": folder_rows, "included": included,
+                          "statistics": condition_statistics(included, accumulators[folder], metric)}
+    return merged
+
+def save_figures(merged, output, title="", metric="ratio", control=None):
+    """
+    The analysis scripts' figure (plots.create_beautiful_plot) of the merged
+    statistics, one per objective folder: output itself when the experiment
+    has one, else output with the folder's name appended to its stem.
+
+    Parameters:
+    - control: condition name compared against (default: the first one)
+
+    Returns:
+        paths of the written figures
+    """
+    objectives = {}
+    for folder, result in merged.items():
+        objectives.setdefault(os.path.dirname(folder), []).append((os.path.basename(folder), result))
+    stem, ext = os.path.splitext(output)
+    paths = []
+    for objective, conditions in sorted(objectives.items()):
+        labels = [label for label, _ in conditions]
+        all_scores = [[row[metric] for row in result["included"]] for _, result in conditions]
+        means = [result["statistics"]["mean"] for _, result in conditions]
+        sems = [result["statistics"]["sem"] for _, result in conditions]
+        colors = [f"C{i}" for i in range(len(labels))]
+        control_idx = labels.index(control) if control in labels else 0
+        fig = create_beautiful_plot(labels, means, sems, all_scores, colors,
+                                    " - ".join(part for part in (title, objective) if part),
+                                    control_idx, metric)
+        path = output if len(objectives) == 1 else f"{stem}-{objective.replace(os.sep, '-')}{ext}"
+        fig.savefig(path, dpi=300, bbox_inches="tight")
+        plt.close(fig)
+        paths.append(path)
+    return paths
+
+## ================= LOCAL RUN ================= ##
+def run_local(base_folder, count, out_dir, channel="green", threshold=DEFAULT_THRESHOLD,
+              black_threshold=DEFAULT_BLACK_THRESHOLD, stages=(), store=False, exclude_failed_qc=True,
+              metric="ratio"):
+    """Plan, run every shard in its own process and merge, on this machine"""
+    update_manifest(base_folder)
+    for name in os.listdir(out_dir) if os.path.isdir(out_dir) else []:
+        if name.startswith("shard-") and name.endswith(".json"):
+            os.remove(os.path.join(out_dir, name))  # Shards of an earlier run
+    with ProcessPoolExecutor(max_workers=count) as pool:
+        list(pool.map(run_shard, [base_folder] * count, range(count), [count] * count,
+                      [out_dir] * count, [channel] * count, [threshold] * count,
+                      [black_threshold] * count, [tuple(stages)] * count, [exclude_failed_qc] * count))
+    return merge_shards(out_dir, base_folder, store, metric)
+
+## ================= MAIN ================= ##
+def print_statistics(merged):
+    print("\n" + "="*96)
+    print("MERGED GROUP STATISTICS")
+    print("="*96)
+    print(f"{'Condition':<40}{'n':>5}{'Mean Ratio':>14}{'SEM':>12}{'Pooled Ratio':>15}")
+    print("-" * 96)
+    for folder, result in merged.items():
+        stats = result["statistics"]
+        print(f"{folder[-40:]:<40}{stats['n']:>5}{stats['mean']:>14.4f}{stats['sem']:>12.4f}"
+              f"{stats['pooled_ratio']:>15.4f}")
+    print("="*96 + "\n")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sharded batch analysis with a deterministic merge.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    shard_cmd = commands.add_parser("shard", help="analyze one shard (run on each node)")
+    merge_cmd = commands.add_parser("merge", help="merge the shard files of a run")
+    local_cmd = commands.add_parser("local", help="run every shard in a local process, then merge")
+    for command in (shard_cmd, merge_cmd, local_cmd):
+        command.add_argument("folder", help="experiment folder")
+    shard_cmd.add_argument("--index", type=int, required=True)
+    merge_cmd.add_argument("out", help="folder holding the shard files")
+    for command in (shard_cmd, local_cmd):
+        command.add_argument("--count", type=int, required=True, help="number of shards")
+        command.add_argument("--out", required=True, help="folder for the shard files")
+        command.add_argument("--channel", choices=["green", "yellow"], default="green")
+        command.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+        command.add_argument("--black-threshold", type=float, default=DEFAULT_BLACK_THRESHOLD)
+        command.add_argument("--stages", nargs="*", default=[], choices=sorted(STAGES))
+        command.add_argument("--keep-failed-qc", action="store_true",
+                             help="keep fields that fail image QC in the statistics")
+    for command in (merge_cmd, local_cmd):
+        command.add_argument("--store", action="store_true",
+                             help="write the merged rows to the conditions' result stores")
+        command.add_argument("--metric", default="ratio", help="per-image field of the statistics")
+        command.add_argument("--figure", help="write the scripts' figure here (one per objective folder)")
+        command.add_argument("--control", help="condition the figure compares against (default: the first)")
+    args = parser.parse_args(argv)
+
+    if args.command == "shard":
+        path = run_shard(args.folder, args.index, args.count, args.out, args.channel,
+                         args.threshold, args.black_threshold, args.stages, not args.keep_failed_qc)
+        print(f"💾 {path}")
+        return 0
+    if args.command == "merge":
+        merged = merge_shards(args.out, args.folder, args.store, args.metric)
+    else:
+        merged = run_local(args.folder, args.count, args.out, args.channel, args.threshold,
+                           args.black_threshold, args.stages, args.store, not args.keep_failed_qc,
+                           args.metric)
+    print_statistics(merged)
+    if args.figure:
+        title = os.path.basename(os.path.normpath(args.folder))
+        for path in save_figures(merged, args.figure, title, args.metric, args.control):
+            print(f"💾 {path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""
+Registry of the analysis stages (see engine.analyze_image) and preprocessing
+steps (see engine.load_image) by name, for jobs that name them in JSON or on
+the command line (daemon.py, shards.py).
+
+A preprocessing step is named by a spec: {"step": "background", "radius": 30},
+{"step": "flatfield", "objective_folder": ".../10x"} or
+{"step": "registration", "objective_folder": ".../10x"}; the other keys are
+the step's constructor arguments.
+"""
+from .background import BackgroundSubtraction
+from .colocalization import colocalization
+from .flatfield import FlatFieldCorrection
+from .intensity import intensity_distribution
+from .nuclei import nuclear_count
+from .puncta import puncta_detection
+from .qc import image_qc
+from .registration import ChannelRegistration
+from .segmentation import cell_segmentation
+from .units import physical_areas
+
+STAGES = {stage.__name__: stage for stage in (
+    colocalization, intensity_distribution, nuclear_count, puncta_detection,
+    image_qc, cell_segmentation, physical_areas)}
+
+# Per-image metrics by the stage that computes them (signal_area, cell_area and
+# ratio come from every analyze_image call)
+METRIC_STAGES = {
+    **dict.fromkeys(("pearson", "manders_m1", "manders_m2", "overlap_coefficient"), "colocalization"),
+    **dict.fromkeys(("mean_intensity", "integrated_intensity", "signal_integrated_intensity",
+                     "intensity_p50", "intensity_p90", "intensity_p99"), "intensity_distribution"),
+    **dict.fromkeys(("nuclei_count", "median_nucleus_area", "signal_per_nucleus",
+                     "cell_area_per_nucleus"), "nuclear_count"),
+    **dict.fromkeys(("puncta_count", "puncta_per_cell_area", "puncta_radius_mean",
+                     "puncta_intensity_mean"), "puncta_detection"),
+    **dict.fromkeys(("focus", "saturated_fraction", "foreground_fraction"), "image_qc"),
+    **dict.fromkeys(("n_cells", "median_cell_area", "mean_cell_ratio", "cell_ratio_cv"), "cell_segmentation"),
+    **dict.fromkeys(("green_area_um2", "yellow_area_um2", "cell_area_um2"), "physical_areas"),
+}
+
+def resolve_stages(names):
+    """Stage functions for a list of stage names"""
+    unknown = [name for name in names if name not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stages {unknown} (expected some of {sorted(STAGES)})")
+    return tuple(STAGES[name] for name in names)
+
+PREPROCESSING = {"background": BackgroundSubtraction, "flatfield": FlatFieldCorrection,
+                 "registration": ChannelRegistration}
+
+def resolve_preprocess(specs):
+    """Preprocessing steps for a list of step specs"""
+    steps = []
+    for spec in specs:
+        options = dict(spec)
+        name = options.pop("step", None)
+        if name not in PREPROCESSING:
+            raise ValueError(f"Unknown preprocessing step {name!r} (expected one of {sorted(PREPROCESSING)})")
+        steps.append(PREPROCESSING[name](**options))
+    return tuple(steps)
@@ -0,0 +1,95 @@
+"""
+Tiled, per-channel image archive format (see archive.py for building and
+verifying archives).
+
+An archive is a chunked .npy archive (.npz) written next to its TIFF as
+"<name>.tif.tiles.npz":
+
+- one member per (channel, tile): "c1_y2_x0" is the green tile in tile
+  row 2, tile column 0
+- every member is deflate-compressed on its own (zipfile), so np.load reads
+  and inflates only the members that are asked for
+- "shape", "tile" and "source_hash" (dataset.file_hash of the TIFF) record
+  the original; "pixel_hash" (tiles.pixel_hash of the decoded image) lets
+  an archive be checked once its TIFF is gone
+
+This module only depends on NumPy so that engine.load_image can read an
+image whose TIFF was retired into its archive.
+"""
+import hashlib
+import numpy as np
+
+## ================= CONFIGURATION ================= ##
+ARCHIVE_SUFFIX = ".tiles.npz"   # Appended to the TIFF's filename
+TILE_SIZE = 512                 # Tile edge (px); a 2432x2032 image is 5x4 tiles per channel
+
+## ================= FORMAT ================= ##
+def archive_path(image_path):
+    """Archive of one image, next to its TIFF"""
+    return image_path + ARCHIVE_SUFFIX
+
+def tile_key(channel, ty, tx):
+    return f"c{channel}_y{ty}_x{tx}"
+
+def encode_tiles(img, tile_size=TILE_SIZE):
+    """Members of the archive of one decoded (H, W) or (H, W, C) image"""
+    planes = img[..., np.newaxis] if img.ndim == 2 else img
+    members = {"shape": np.array(img.shape), "tile": np.array(tile_size)}
+    for c in range(planes.shape[2]):
+        plane = planes[..., c]
+        for ty, y in enumerate(range(0, plane.shape[0], tile_size)):
+            for tx, x in enumerate(range(0, plane.shape[1], tile_size)):
+                members[tile_key(c, ty, tx)] = np.ascontiguousarray(plane[y:y + tile_size, x:x + tile_size])
+    return members
+
+def pixel_hash(img):
+    """blake2b digest of a decoded image's shape, dtype and pixels, as hex"""
+    digest = hashlib.blake2b(f"{img.shape}{img.dtype.str}".encode(), digest_size=16)
+    digest.update(np.ascontiguousarray(img).tobytes())
+    return digest.hexdigest()
+
+def archive_pixel_hash(path):
+    """Pixel hash recorded in an archive (None for archives written before it was)"""
+    with np.load(path) as data:
+        return str(data["pixel_hash"]) if "pixel_hash" in data.files else None
+
+def archive_source_hash(path):
+    """Hash of the TIFF an archive was built from"""
+    with np.load(path) as data:
+        return str(data["source_hash"])
+
+def read_archive(path, channels=None, region=None):
+    """
+    Read the tiles of an archive that cover a region.
+
+    Parameters:
+    - channels: channel indices to read (None = all); the result has a
+      channel axis, in this order, unless the image has a single plane and
+      channels is None
+    - region: (y0, y1, x0, x1) in full-resolution pixels (None = whole image)
+
+    Returns:
+        (h, w, len(channels)) array, or (h, w) for a single-plane image
+    """
+    all_channels = channels is None
+    with np.load(path) as data:
+        shape = tuple(data["shape"])
+        tile = int(data["tile"])
+        n_channels = shape[2] if len(shape) == 3 else 1
+        channels = range(n_channels) if channels is None else channels
+        y0, y1, x0, x1 = region or (0, shape[0], 0, shape[1])
+        y1, x1 = min(y1, shape[0]), min(x1, shape[1])  # Clip like slicing would
+        out = None
+        for i, c in enumerate(channels):
+            for ty in range(y0 // tile, (y1 - 1) // tile + 1):
+                for tx in range(x0 // tile, (x1 - 1) // tile + 1):
+                    block = data[tile_key(c, ty, tx)]
+                    if out is None:
+                        out = np.empty((y1 - y0, x1 - x0, len(channels)), block.dtype)
+                    by, bx = ty * tile, tx * tile
+                    sy, sx = max(y0, by), max(x0, bx)
+                    ey, ex = min(y1, by + block.shape[0]), min(x1, bx + block.shape[1])
+                    out[sy - y0:ey - y0, sx - x0:ex - x0, i] = block[sy - by:ey - by, sx - bx:ex - bx]
+    if len(shape) == 2 and all_channels:
+        return out[..., 0]
+    return out
@@ -0,0 +1,174 @@
+"""
+Physical-unit (µm²) areas.
+
+All areas are counted in pixels, and a pixel covers 0.33 µm² at 10x but
+0.0083 µm² at 63x, so raw areas from different objectives cannot be compared
+or pooled. This module finds the pixel size of each image and converts the
+green, yellow and cell areas to µm².
+
+The pixel size comes from, in order:
+1. the Leica metadata of the image's own position (metadata.image_metadata:
+   "13.tif" is position "..._Pos013_ICC")
+2. any metadata in the condition folder taken with the same objective
+3. the camera calibration: the DimensionDescription of the 20x and 63x
+   metadata (6.987561e-04 m and 2.218273e-04 m over 2432 px) both give a
+   5.7464 µm camera pixel, so pixel size = 5.7464 µm / magnification, with
+   the magnification read from the folder name (e.g. "PELP1 10x")
+
+The 2026-01-15 KO lines have no MetaData folder, so they use (3). A folder
+that has metadata but none for an image gets a warning (once per folder)
+before falling back to (2).
+
+green_area_um2 and yellow_area_um2 are both counted at the job's single
+threshold (green > t, R + G > 2t), whichever channel the job selects: run
+the job per channel when the two channels need different thresholds.
+
+Usage (from the "Macropinocytosis Project" folder):
+    python -m uptake_engine.units "2026-01-15 Macropinocytosis KO Lines FITC Assay"
+"""
+import os
+import re
+import sys
+import argparse
+import numpy as np
+
+from .engine import DEFAULT_THRESHOLD, DEFAULT_BLACK_THRESHOLD
+from .metrics import green_mask, yellow_mask
+from .cache import walk_image_folders
+from .metadata import folder_metadata, image_metadata
+from .results import condition_results
+
+## ================= CONFIGURATION ================= ##
+CAMERA_PIXEL_SIZE_UM = 5.7464   # 2.218273e-04 m / 2432 px * 63 (identical at 20x)
+MAGNIFICATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*x\b", re.IGNORECASE)
+
+## ================= PIXEL SIZE ================= ##
+def magnification_from_path(path):
+    """Objective magnification named in the deepest path component that has one (None if none)"""
+    for part in reversed(os.path.normpath(path).split(os.sep)):
+        match = MAGNIFICATION_PATTERN.search(part)
+        if match:
+            return float(match.group(1))
+    return None
+
+_warned_folders = set()
+
+def pixel_size_um(image_path):
+    """
+    Edge length of one pixel of an image in µm.
+
+    Returns:
+        (pixel_size_um, source) with source "metadata", "objective" or
+        "calibration"; (None, None) when nothing identifies the objective
+    """
+    folder = os.path.dirname(image_path)
+    own = image_metadata(image_path)
+    if own is not None and own["pixel_size_x_um"]:
+        return own["pixel_size_x_um"], "metadata"
+    rows = [r for r in folder_metadata(folder) if r["pixel_size_x_um"]]
+    if rows and folder not in _warned_folders:
+        _warned_folders.add(folder)
+        print(f"⚠️  {folder}: no metadata for {os.path.basename(image_path)}'s position, "
+              f"using the objective's pixel size")
+    magnification = magnification_from_path(image_path)
+    for row in rows:
+        if magnification is None or row["magnification"] == magnification:
+            return row["pixel_size_x_um"], "objective"
+    if magnification:
+        return CAMERA_PIXEL_SIZE_UM / magnification, "calibration"
+    return None, None
+
+## ================= STAGE ================= ##
+def physical_areas(img, context):
+    """
+    analyze_image stage: green, yellow and cell areas in µm². Needs
+    context["path"] (set by condition_results) to find the pixel size.
+    Both signal areas use context["threshold"], also for the channel the job
+    did not select.
+    """
+    size, source = pixel_size_um(context["path"]) if context.get("path") else (None, None)
+    if size is None:
+        return {"pixel_size_um": None}
+    pixel_area = size * size
+    threshold = context["threshold"]
+    signal = context["signal_mask"]
+    green = signal if context["channel"] == "green" else green_mask(img, threshold)
+    yellow = signal if context["channel"] == "yellow" else yellow_mask(img, threshold)
+    return {
+        "pixel_size_um": size,
+        "pixel_size_source": source,
+        "green_area_um2": int(np.count_nonzero(green)) * pixel_area,
+        "yellow_area_um2": int(np.count_nonzero(yellow)) * pixel_area,
+        "cell_area_um2": int(np.count_nonzero(context["cell_mask"])) * pixel_area,
+    }
+
+## ================= CROSS-MAGNIFICATION COMPARISON ================= ##
+def condition_label(folder):
+    """Condition name with the magnification token removed ("PELP1 10x" -> "PELP1")"""
+    name = os.path.basename(os.path.normpath(folder))
+    return MAGNIFICATION_PATTERN.sub("", name).strip() or name
+
+def compare_magnifications(base_folder, channel="green", threshold=DEFAULT_THRESHOLD,
+                           black_threshold=DEFAULT_BLACK_THRESHOLD, workers=1):
+    """
+    Physical areas of every condition folder under an experiment, grouped by
+    condition across magnifications.
+
+    Returns:
+        {condition: {magnification: rows}}
+    """
+    groups = {}
+    for folder, _ in walk_image_folders(base_folder):
+        rows = condition_results(folder, channel, threshold, black_threshold, workers,
+                                 stages=(physical_areas,))
+        rows = [row for row in rows if row.get("pixel_size_um")]
+        if rows:
+            magnification = magnification_from_path(folder)
+            groups.setdefault(condition_label(folder), {})[magnification] = rows
+    return groups
+
+def print_magnification_table(groups, channel="green"):
+    """Per-magnification and pooled physical areas; pooling weights fields by µm², not pixels"""
+    signal_key = f"{channel}_area_um2"
+    print("\n" + "="*88)
+    print("CROSS-MAGNIFICATION COMPARISON (µm²)")
+    print("="*88)
+    print(f"{'Condition':<15}{'Mag':>8}{'n':>5}{'µm/px':>9}{'Cell µm²/Field':>18}"
+          f"{'Signal µm²/Field':>19}{'Signal/Cell':>14}")
+    print("-" * 88)
+    for label in sorted(groups):
+        pooled_signal = pooled_cell = 0.0
+        pooled_n = 0
+        for magnification in sorted(groups[label]):
+            rows = groups[label][magnification]
+            cell = np.array([row["cell_area_um2"] for row in rows])
+            signal = np.array([row[signal_key] for row in rows])
+            pooled_signal += signal.sum()
+            pooled_cell += cell.sum()
+            pooled_n += len(rows)
+            ratio = signal.sum() / cell.sum() if cell.sum() else 0
+            print(f"{label:<15}{magnification:>7g}x{len(rows):>5}{rows[0]['pixel_size_um']:>9.4f}"
+                  f"{cell.mean():>18.0f}{signal.mean():>19.0f}{ratio:>14.4f}")
+        ratio = pooled_signal / pooled_cell if pooled_cell else 0
+        print(f"{label:<15}{'pooled':>8}{pooled_n:>5}{'':>9}{'':>18}{'':>19}{ratio:>14.4f}")
+        print("-" * 88)
+    print("="*88 + "\n")
+
+## ================= MAIN ================= ##
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Physical-unit areas compared across magnifications.")
+    parser.add_argument("folders", nargs="+", help="experiment folders")
+    parser.add_argument("--channel", choices=["green", "yellow"], default="green")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--black-threshold", type=float, default=DEFAULT_BLACK_THRESHOLD)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    for folder in args.folders:
+        groups = compare_magnifications(folder, args.channel, args.threshold,
+                                        args.black_threshold, args.workers)
+        print_magnification_table(groups, args.channel)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Check the compiled kernels (kernels.py) against the NumPy code and time both.
+
+Exits with status 1 when a kernel disagrees with NumPy on any image. Without
+numba (or with UPTAKE_KERNELS=numpy) only the NumPy timings are printed.
+
+Usage (from the "Macropinocytosis Project" folder):
+    python -m uptake_engine.verify_kernels "2026-01-15 Macropinocytosis KO Lines FITC Assay/63x/PELP1 63x/1.tif"
+"""
+import sys
+import time
+import argparse
+import numpy as np
+
+from .engine import load_image, DEFAULT_THRESHOLD, DEFAULT_BLACK_THRESHOLD
+from .metrics import signal_mask, cell_mask
+from .colocalization import joint_histogram
+from .intensity import intensity_histogram
+from .kernels import (numba, ENABLED, KERNELS_ENV, use_kernels, fused_masks,
+                      joint_histogram_u8, signal_histogram_u8)
+
+## ================= TIMING ================= ##
+def _best_time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+## ================= MAIN ================= ##
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check and time the compiled kernels against NumPy.")
+    parser.add_argument("images", nargs="+")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--black-threshold", type=float, default=DEFAULT_BLACK_THRESHOLD)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if numba is None:
+        print("numba is not installed: the NumPy kernels are in use")
+    elif not ENABLED:
+        print(f"{KERNELS_ENV}=numpy: the NumPy kernels are in use")
+    status = 0
+    for path in args.images:
+        img = load_image(path)
+        print(f"\n{path} ({img.dtype}, {'x'.join(map(str, img.shape))})")
+        for channel in ("green", "yellow"):
+            reference = (signal_mask(img, channel, args.threshold), cell_mask(img, args.black_threshold))
+            numpy_time = _best_time(lambda: (signal_mask(img, channel, args.threshold),
+                                             cell_mask(img, args.black_threshold)), args.repeat)
+            line = f"  {channel:<7} masks  numpy {numpy_time * 1000:7.1f} ms"
+            if use_kernels(img):
+                signal, cells, _, _ = fused_masks(img, channel, args.threshold, args.black_threshold)
+                ok = np.array_equal(signal, reference[0]) and np.array_equal(cells, reference[1])
+                kernel_time = _best_time(lambda: fused_masks(img, channel, args.threshold,
+                                                             args.black_threshold), args.repeat)
+                line += f"  numba {kernel_time * 1000:7.1f} ms  {'✓' if ok else '✗ MISMATCH'}"
+                status = status or int(not ok)
+            print(line)
+        cells = reference[1]
+        if use_kernels(img):
+            checks = {
+                "joint histogram": (joint_histogram_u8(img, cells),
+                                    joint_histogram(img, cells, compiled=False)),
+                "green histogram": (signal_histogram_u8(img, cells, "green"),
+                                    intensity_histogram(img, cells, "green", compiled=False)[0]),
+                "yellow histogram": (signal_histogram_u8(img, cells, "yellow"),
+                                     intensity_histogram(img, cells, "yellow", compiled=False)[0]),
+            }
+            for name, (kernel, reference_counts) in checks.items():
+                ok = np.array_equal(kernel, reference_counts)
+                print(f"  {name:<17}{'✓' if ok else '✗ MISMATCH'}")
+                status = status or int(not ok)
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())